@@ -0,0 +1,31 @@
+"""product name trigram index
+
+/products/search 在 PostgreSQL 上使用的 pg_trgm 索引（SQLite 上不需要）。
+在此之前已经由 create_all 建过这个索引的数据库不会重复创建。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:52:10.118402
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_products_name_trgm')
@@ -0,0 +1,54 @@
+"""query shape indexes
+
+按实际查询形状建立的组合索引和部分索引:
+
+- 商品列表：上架商品按分类+ID、分类+价格、价格+ID（部分索引，WHERE is_active）
+- 订单列表：用户+创建时间、创建时间；订单明细按订单ID加载
+- 购物车：(user_id, product_id) 唯一，建索引前合并重复行（保留最后写入的一行）
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:05:41.520377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# 与模型中 Product.is_active == True 生成的条件一致，查询条件相同时部分索引才会被使用
+ACTIVE = {
+    'postgresql_where': sa.text('is_active = true'),
+    'sqlite_where': sa.text('is_active = 1'),
+}
+
+
+def upgrade() -> None:
+    op.create_index('ix_products_active_category_id', 'products', ['category_id', 'id'], **ACTIVE)
+    op.create_index('ix_products_active_category_price', 'products', ['category_id', 'price'], **ACTIVE)
+    op.create_index('ix_products_active_price', 'products', ['price', 'id'], **ACTIVE)
+
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'])
+    op.create_index('ix_orders_created_at', 'orders', ['created_at'])
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+
+    op.execute(
+        'DELETE FROM cart_items WHERE id NOT IN '
+        '(SELECT MAX(id) FROM cart_items GROUP BY user_id, product_id)'
+    )
+    op.create_index('uq_cart_items_user_product', 'cart_items', ['user_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_cart_items_user_product', table_name='cart_items')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_created_at', table_name='orders')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_index('ix_products_active_price', table_name='products')
+    op.drop_index('ix_products_active_category_price', table_name='products')
+    op.drop_index('ix_products_active_category_id', table_name='products')
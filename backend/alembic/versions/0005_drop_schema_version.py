@@ -0,0 +1,30 @@
+"""drop schema_version
+
+启动时改为比较 alembic_version 与最新迁移版本，不再需要结构指纹表。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 15:02:37.114520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_table('schema_version')
+
+
+def downgrade() -> None:
+    op.create_table('schema_version',
+    sa.Column('version', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('version')
+    )
@@ -0,0 +1,28 @@
+"""outbox completed handlers
+
+记录每个事件已经成功执行的处理函数，重试时只执行失败的处理函数。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 15:41:52.306187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('outbox_events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_handlers', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('outbox_events', schema=None) as batch_op:
+        batch_op.drop_column('completed_handlers')
@@ -0,0 +1,28 @@
+"""idempotency response headers
+
+保存幂等请求的完整响应头，重放时返回 Location、Set-Cookie 等原始响应头。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:02:14.518337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('response_headers', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('idempotency_keys', schema=None) as batch_op:
+        batch_op.drop_column('response_headers')
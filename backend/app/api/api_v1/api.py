@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import auth, users, products, categories, cart, orders
+from app.api.api_v1.endpoints import auth, users, products, categories, cart, orders, storefront, admin
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -8,4 +8,6 @@ api_router.include_router(users.router, prefix="/users", tags=["Users"])
 api_router.include_router(products.router, prefix="/products", tags=["Products"])
 api_router.include_router(categories.router, prefix="/categories", tags=["Categories"])
 api_router.include_router(cart.router, prefix="/cart", tags=["Cart"])
-api_router.include_router(orders.router, prefix="/orders", tags=["Orders"]) 
\ No newline at end of file
+api_router.include_router(orders.router, prefix="/orders", tags=["Orders"])
+api_router.include_router(storefront.router, prefix="/storefront", tags=["Storefront"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
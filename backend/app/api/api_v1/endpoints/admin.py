@@ -0,0 +1,206 @@
+import os
+from datetime import date
+from typing import Any, Optional
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.models.user import User
+from app.api.deps import get_current_active_admin
+from app.core.admission import admission_controller
+from app.core.profiling import ProfilerBusyError, cpu_profiler, memory_profiler
+from app.core.slow_query import slow_query_log
+from app.utils.outbox import outbox_stats
+from app.utils.sales_rollup import analytics_range, category_sales, daily_sales, product_sales
+
+router = APIRouter()
+
+
+@router.get("/outbox")
+def read_outbox_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get outbox queue depth and lag (Admin only)
+    """
+    return outbox_stats(db)
+
+
+def _analytics_range(start: Optional[date], end: Optional[date]):
+    try:
+        return analytics_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/analytics/sales")
+def read_sales_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get daily revenue, units and order counts from the sales rollups (Admin only)
+    """
+    return daily_sales(db, *_analytics_range(start, end))
+
+
+@router.get("/analytics/products")
+def read_product_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sort_by: str = Query("revenue", regex="^(revenue|units|orders)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get the top selling products in a date range from the sales rollups (Admin only)
+    """
+    return product_sales(db, *_analytics_range(start, end), sort_by=sort_by, limit=limit)
+
+
+@router.get("/analytics/categories")
+def read_category_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    sort_by: str = Query("revenue", regex="^(revenue|units|orders)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get sales per category in a date range from the sales rollups (Admin only)
+    """
+    return category_sales(db, *_analytics_range(start, end), sort_by=sort_by)
+
+
+@router.get("/admission")
+def read_admission_stats(
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get admission control state: in-flight requests, pool wait and shed count (Admin only)
+    """
+    return admission_controller.stats()
+
+
+@router.get("/slow-queries")
+def read_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort_by: str = Query("total_ms", regex="^(total_ms|max_ms|count)$"),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Get the slowest query shapes with their routes and EXPLAIN plans (Admin only)
+    """
+    return slow_query_log.top(limit=limit, sort_by=sort_by)
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries(
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Reset the slow query log (Admin only)
+    """
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+
+def pinned_worker(
+    pid: Optional[int] = Query(
+        None, description="Only run on this worker; the request is rejected by any other worker"
+    ),
+) -> int:
+    """
+    分析器的状态（tracemalloc、采样线程）只存在于单个进程内；
+    多worker部署时 start/snapshot/stop 必须落在同一个worker上，
+    因此先不带pid调用一次拿到应答的pid，之后的请求都带上它，落到其他worker时返回409（客户端重试即可）。
+    单worker（--workers 1）部署时无需pid
+    """
+    current = os.getpid()
+    if pid is not None and pid != current:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Profiling is pinned to worker {pid}, this request reached worker {current}; retry",
+            headers={"X-Worker-Pid": str(current)},
+        )
+    return current
+
+
+@router.get("/profile/cpu", response_class=PlainTextResponse)
+async def profile_cpu(
+    seconds: float = Query(10, gt=0, le=120),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    include_idle: bool = False,
+    worker_pid: int = Depends(pinned_worker),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Sample all threads of this worker for N seconds and return collapsed stacks for flamegraphs (Admin only)
+    """
+    # 采样会占用一个线程直到结束：使用单独的限流器，不占默认线程池（同步端点共用的40个名额）；
+    # 同一时间只有一个分析任务由 cpu_profiler 自身的锁保证
+    try:
+        collapsed = await anyio.to_thread.run_sync(
+            cpu_profiler.profile, seconds, interval_ms / 1000, include_idle, limiter=anyio.CapacityLimiter(1)
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return PlainTextResponse(
+        collapsed,
+        headers={
+            "Content-Disposition": 'attachment; filename="cpu-profile.collapsed"',
+            "X-Worker-Pid": str(worker_pid),
+        },
+    )
+
+
+@router.post("/profile/memory/start")
+def start_memory_profile(
+    frames: int = Query(10, ge=1, le=50),
+    worker_pid: int = Depends(pinned_worker),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Start tracing allocations with tracemalloc on this worker (Admin only)
+
+    Pass the returned pid to the snapshot and stop calls so they reach the same worker.
+    """
+    memory_profiler.start(frames)
+    return {"message": "Memory profiling started", "pid": worker_pid}
+
+
+@router.post("/profile/memory/snapshot")
+def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=200),
+    group_by: str = Query("lineno", regex="^(lineno|filename|traceback)$"),
+    worker_pid: int = Depends(pinned_worker),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Take a tracemalloc snapshot and report growth since the previous snapshot (Admin only)
+    """
+    if not memory_profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Memory profiling is not running on worker {worker_pid}",
+        )
+    return memory_profiler.snapshot(limit=limit, group_by=group_by)
+
+
+@router.post("/profile/memory/stop")
+def stop_memory_profile(
+    worker_pid: int = Depends(pinned_worker),
+    current_user: User = Depends(get_current_active_admin),
+) -> Any:
+    """
+    Stop tracing allocations and drop stored snapshots (Admin only)
+    """
+    memory_profiler.stop()
+    return {"message": "Memory profiling stopped", "pid": worker_pid}
\ No newline at end of file
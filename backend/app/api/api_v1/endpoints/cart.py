@@ -4,14 +4,40 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
-from app.models.product import CartItem, Product
+from app.models.product import Product
 from app.models.user import User
-from app.schemas.product import CartItemWithProduct, CartItemCreate, CartItemUpdate
+from app.schemas.product import (
+    CartItemWithProduct, CartItemCreate, CartItemUpdate, CartBulkUpdate, CartWithTotals
+)
 from app.api.deps import get_current_active_user
+from app.utils.cart_store import CartLine, cart_store
+from app.utils.pricing import calculate_totals
 
 router = APIRouter()
 
 
+def attach_products(db: Session, lines: List[CartLine]) -> List[CartLine]:
+    """一条查询加载购物车中所有商品"""
+    if not lines:
+        return lines
+    products = {
+        product.id: product
+        for product in db.query(Product).filter(
+            Product.id.in_({line.product_id for line in lines})
+        ).all()
+    }
+    for line in lines:
+        line.product = products.get(line.product_id)
+    return [line for line in lines if line.product is not None]
+
+
+def get_cart_with_totals(db: Session, user_id: int) -> dict:
+    """加载购物车并计算金额"""
+    cart_items = attach_products(db, cart_store.get_items(db, user_id))
+    subtotal = sum(item.product.price * item.quantity for item in cart_items)
+    return {"items": cart_items, **calculate_totals(subtotal)}
+
+
 @router.get("/", response_model=List[CartItemWithProduct])
 def read_cart_items(
     db: Session = Depends(get_db),
@@ -20,8 +46,60 @@ def read_cart_items(
     """
     Get current user's shopping cart
     """
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
-    return cart_items
+    return attach_products(db, cart_store.get_items(db, current_user.id))
+
+
+@router.get("/summary", response_model=CartWithTotals)
+def read_cart_summary(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Get current user's shopping cart with server-computed totals
+    """
+    return get_cart_with_totals(db, current_user.id)
+
+
+@router.patch("/", response_model=CartWithTotals)
+def bulk_update_cart(
+    *,
+    db: Session = Depends(get_db),
+    cart_in: CartBulkUpdate,
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """
+    Set quantities and remove items in one transaction
+    """
+    # 同一商品出现多次时以最后一次为准
+    upserts = {item.product_id: item.quantity for item in cart_in.upserts}
+    deletes = set(cart_in.deletes) - set(upserts)
+
+    # 一次查询获取所有涉及的商品
+    products = {}
+    if upserts:
+        products = {
+            product.id: product
+            for product in db.query(Product).filter(
+                Product.id.in_(upserts),
+                Product.is_active == True
+            ).all()
+        }
+
+    for product_id, quantity in upserts.items():
+        product = products.get(product_id)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product ID {product_id} not found or not available",
+            )
+        if product.stock < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Product '{product.name}' insufficient stock",
+            )
+
+    cart_store.apply(db, current_user.id, upserts, deletes)
+    return get_cart_with_totals(db, current_user.id)
 
 
 @router.post("/", response_model=CartItemWithProduct)
@@ -39,51 +117,34 @@ def add_cart_item(
         Product.id == item_in.product_id,
         Product.is_active == True
     ).first()
-    
+
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found or not available",
         )
-    
+
     # Check if stock is sufficient
     if product.stock < item_in.quantity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock",
         )
-    
-    # Check if item already exists in cart
-    existing_item = db.query(CartItem).filter(
-        CartItem.user_id == current_user.id,
-        CartItem.product_id == item_in.product_id
-    ).first()
-    
+
+    # If item already exists in cart, add to its quantity
+    existing_item = cart_store.get_item_by_product(db, current_user.id, item_in.product_id)
+    new_quantity = item_in.quantity
     if existing_item:
-        # If item exists, update quantity
-        new_quantity = existing_item.quantity + item_in.quantity
+        new_quantity += existing_item.quantity
         if new_quantity > product.stock:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Insufficient stock",
             )
-        
-        existing_item.quantity = new_quantity
-        db.add(existing_item)
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
-    else:
-        # If item doesn't exist, add new item
-        cart_item = CartItem(
-            user_id=current_user.id,
-            product_id=item_in.product_id,
-            quantity=item_in.quantity
-        )
-        db.add(cart_item)
-        db.commit()
-        db.refresh(cart_item)
-        return cart_item
+
+    cart_item = cart_store.set_quantity(db, current_user.id, item_in.product_id, new_quantity)
+    cart_item.product = product
+    return cart_item
 
 
 @router.put("/{cart_item_id}", response_model=CartItemWithProduct)
@@ -97,41 +158,36 @@ def update_cart_item(
     """
     Update shopping cart item quantity
     """
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
-    
+    cart_item = cart_store.get_item(db, current_user.id, cart_item_id)
+
     if not cart_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart item not found",
         )
-    
+
     # Check if product exists and is available
     product = db.query(Product).filter(
         Product.id == cart_item.product_id,
         Product.is_active == True
     ).first()
-    
+
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found or not available",
         )
-    
+
     # Check if stock is sufficient
     if product.stock < item_in.quantity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Insufficient stock",
         )
-    
+
     # Update quantity
-    cart_item.quantity = item_in.quantity
-    db.add(cart_item)
-    db.commit()
-    db.refresh(cart_item)
+    cart_item = cart_store.set_quantity(db, current_user.id, product.id, item_in.quantity)
+    cart_item.product = product
     return cart_item
 
 
@@ -145,19 +201,15 @@ def remove_cart_item(
     """
     Remove item from shopping cart
     """
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
-    
+    cart_item = cart_store.get_item(db, current_user.id, cart_item_id)
+
     if not cart_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart item not found",
         )
-    
-    db.delete(cart_item)
-    db.commit()
+
+    cart_store.remove(db, current_user.id, cart_item.product_id)
     return {"message": "Item removed from cart"}
 
 
@@ -169,6 +221,5 @@ def clear_cart(
     """
     Clear shopping cart
     """
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
-    db.commit()
-    return {"message": "Cart cleared"} 
\ No newline at end of file
+    cart_store.clear(db, current_user.id)
+    return {"message": "Cart cleared"}
@@ -8,6 +8,8 @@ from app.models.product import Category
 from app.models.user import User
 from app.schemas.product import Category as CategorySchema, CategoryCreate, CategoryUpdate
 from app.api.deps import get_current_active_user, get_current_active_admin
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.storefront_cache import storefront_cache
 
 router = APIRouter()
 
@@ -69,6 +71,8 @@ def create_category(
     db.add(category)
     db.commit()
     db.refresh(category)
+    storefront_cache.invalidate()
+    catalog_snapshot.invalidate()
     return category
 
 
@@ -107,6 +111,8 @@ def update_category(
     db.add(category)
     db.commit()
     db.refresh(category)
+    storefront_cache.invalidate()
+    catalog_snapshot.invalidate()
     return category
 
 
@@ -139,4 +145,6 @@ def delete_category(
     db.add(category)
     db.commit()
     db.refresh(category)
+    storefront_cache.invalidate()
+    catalog_snapshot.invalidate()
     return category 
\ No newline at end of file
@@ -1,19 +1,39 @@
-import uuid
-from typing import Any, List
+from datetime import datetime, timezone
+from typing import Any, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.db.session import get_db
 from app.models.order import Order, OrderItem, OrderStatus
-from app.models.product import Product, CartItem
+from app.models.product import Product
 from app.models.user import User
 from app.schemas.order import Order as OrderSchema, OrderCreate, OrderWithItems
 from app.api.deps import get_current_active_user, get_current_active_admin
+from app.utils.cart_store import cart_store
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.order_number import generate_order_number
+from app.utils.outbox import enqueue
+from app.utils.pricing import calculate_totals
+from app.utils.sales_rollup import record_order, record_status_change
 
 router = APIRouter()
 
 
+def enqueue_order_event(db: Session, event_type: str, order: Order, user: Optional[User]) -> None:
+    """写入订单事件到发件箱（不提交）"""
+    enqueue(db, event_type, {
+        "event": event_type,
+        "order_id": order.id,
+        "order_number": order.order_number,
+        "status": order.status.value,
+        "total_amount": order.total_amount,
+        "email": user.email if user else None,
+        "name": (user.full_name or user.email) if user else None,
+    })
+
+
 @router.get("/", response_model=List[OrderSchema])
 def read_orders(
     db: Session = Depends(get_db),
@@ -45,7 +65,9 @@ def read_order(
     """
     Get order details by ID
     """
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = db.query(Order).options(
+        selectinload(Order.items).joinedload(OrderItem.product)
+    ).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,34 +94,44 @@ def create_order(
     """
     创建新订单
     """
-    # 计算订单总金额
-    total_amount = 0
+    # 一次查询获取所有订单商品
+    quantities = {}
+    for item in order_in.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    products = {}
+    if quantities:
+        products = {
+            product.id: product
+            for product in db.query(Product).filter(
+                Product.id.in_(quantities),
+                Product.is_active == True
+            ).all()
+        }
+
+    subtotal = 0
     order_items = []
-    
+
     for item in order_in.items:
         # 检查商品是否存在且可用
-        product = db.query(Product).filter(
-            Product.id == item.product_id,
-            Product.is_active == True
-        ).first()
-        
+        product = products.get(item.product_id)
+
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product ID {item.product_id} not found or not available",
             )
-        
-        # 检查库存是否足够
-        if product.stock < item.quantity:
+
+        # 检查库存是否足够（同一商品出现多次时按总数量检查）
+        if product.stock < quantities[product.id]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Product '{product.name}' insufficient stock",
             )
-        
+
         # 计算项目总价
         item_total = product.price * item.quantity
-        total_amount += item_total
-        
+        subtotal += item_total
+
         # 创建订单项
         order_items.append({
             "product_id": product.id,
@@ -107,14 +139,15 @@ def create_order(
             "unit_price": product.price,
             "total_price": item_total
         })
-    
-    # 添加运费和税费
-    shipping_fee = 0 if total_amount >= 100 else 10  # 订单满$100免运费
-    tax = total_amount * 0.1  # 10% 税
-    total_amount += shipping_fee + tax
-    
+
+    # 添加运费和税费（与购物车使用相同的计算逻辑）
+    totals = calculate_totals(subtotal)
+    shipping_fee = totals["shipping_fee"]
+    tax = totals["tax"]
+    total_amount = totals["total"]
+
     # 生成订单号
-    order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+    order_number = generate_order_number()
     
     # 创建订单
     order = Order(
@@ -130,32 +163,55 @@ def create_order(
         shipping_country=order_in.shipping_country,
         shipping_fee=shipping_fee,
         tax=tax,
-        notes=order_in.notes
+        notes=order_in.notes,
+        # 在应用中确定创建时间，销售汇总按这个时间的日期累加
+        created_at=datetime.now(timezone.utc),
     )
     
+    # 先flush获取订单ID，订单、订单项和库存变更在同一个事务中提交
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    db.flush()
     
-    # 创建订单项
-    for item_data in order_items:
-        order_item = OrderItem(
-            order_id=order.id,
-            **item_data
+    # 批量创建订单项（一条executemany，不需要逐行返回ID）
+    db.execute(insert(OrderItem), [{"order_id": order.id, **item_data} for item_data in order_items])
+
+    # 一条UPDATE减少所有商品的库存（在数据库中扣减，不覆盖并发修改）。
+    # 上面的库存检查之后其他订单可能已经扣减了库存，所以在UPDATE中再次检查，
+    # 更新的行数少于商品数说明有商品库存不足或已下架，整个订单回滚
+    stock_needed = case(quantities, value=Product.id)
+    result = db.execute(
+        update(Product)
+        .where(Product.id.in_(quantities), Product.is_active == True, Product.stock >= stock_needed)
+        .values(stock=Product.stock - stock_needed)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(quantities):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient stock for one or more products",
         )
-        db.add(order_item)
-        
-        # 减少商品库存
-        product = db.query(Product).filter(Product.id == item_data["product_id"]).first()
-        product.stock -= item_data["quantity"]
-        db.add(product)
     
     # 清空用户购物车
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
+    cart_store.checkout(db, current_user.id)
+
+    # 订单确认通知与订单在同一个事务中写入发件箱，由后台worker发送
+    enqueue_order_event(db, "order.created", order, current_user)
+
+    # 销售汇总与订单在同一个事务中更新（放在提交前最后执行，缩短汇总行的锁定时间）
+    record_order(db, order, [
+        (item_data["product_id"], products[item_data["product_id"]].category_id, item_data["quantity"], item_data["total_price"])
+        for item_data in order_items
+    ])
     
+    order_id = order.id
     db.commit()
-    db.refresh(order)
-    return order
+    catalog_snapshot.adjust_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+
+    # 一次性加载订单项及其商品用于响应，避免序列化时逐个懒加载
+    return db.query(Order).options(
+        selectinload(Order.items).joinedload(OrderItem.product)
+    ).filter(Order.id == order_id).one()
 
 
 @router.put("/{order_id}/status", response_model=OrderSchema)
@@ -177,8 +233,11 @@ def update_order_status(
         )
     
     # 更新订单状态
+    old_status = order.status
     order.status = status
     db.add(order)
+    enqueue_order_event(db, "order.status_changed", order, order.user)
+    record_status_change(db, order, old_status)
     db.commit()
     db.refresh(order)
     return order
@@ -218,13 +277,22 @@ def cancel_order(
     # 取消订单
     order.status = OrderStatus.CANCELLED
     db.add(order)
+    enqueue_order_event(db, "order.status_changed", order, order.user)
     
     # 恢复商品库存
+    restored = {}
+    lines = []
     for item in order.items:
         product = db.query(Product).filter(Product.id == item.product_id).first()
         if product:
             product.stock += item.quantity
             db.add(product)
+            restored[product.id] = restored.get(product.id, 0) + item.quantity
+        lines.append((item.product_id, product.category_id if product else None, item.quantity, item.total_price))
+
+    # 从销售汇总中移出
+    record_order(db, order, lines, sign=-1, cancelled=1)
     
     db.commit()
+    catalog_snapshot.adjust_stock(restored)
     return {"message": "Order cancelled"} 
\ No newline at end of file
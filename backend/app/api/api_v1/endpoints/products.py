@@ -1,32 +1,38 @@
 from typing import Any, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, File, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, func, or_, select, true
+from sqlalchemy.orm import Session, joinedload
 
-from app.db.session import get_db
-from app.models.product import Product
+from app.db.session import get_db, get_lazy_db
+from app.core.config import settings
+from app.models.product import Category, Product
 from app.models.user import User
-from app.schemas.product import Product as ProductSchema, ProductCreate, ProductUpdate, ProductWithCategory
+from app.schemas.product import Product as ProductSchema, ProductCreate, ProductFacets, ProductSuggestion, ProductUpdate, ProductWithCategory
 from app.api.deps import get_current_active_user, get_current_active_admin
+from app.utils.catalog_index import ProductSort, format_facets
+from app.utils.catalog_snapshot import catalog_snapshot, units_sold_subquery
 from app.utils.image_utils import image_manager
+from app.utils.suggest_index import normalize_text, suggestion_sort_key
+from app.utils.trigram_index import TrigramIndex, build_trigram_arrays
+from app.utils.storefront_cache import storefront_cache
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[ProductWithCategory])
-def read_products(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
+def query_products(
+    db: Session,
     category_id: Optional[int] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-) -> Any:
-    """
-    Get product list
-    """
-    query = db.query(Product)
+    in_stock: bool = False,
+    brand: Optional[str] = None,
+    sort: ProductSort = ProductSort.id,
+):
+    """商品列表的数据库查询（快照不可用时使用），排序与快照索引一致"""
+    # 分类随商品一起加载，避免序列化时每个商品一条查询
+    query = db.query(Product).options(joinedload(Product.category))
     
     # Apply filters
     if category_id:
@@ -40,30 +46,279 @@ def read_products(
     
     if max_price is not None:
         query = query.filter(Product.price <= max_price)
+
+    if in_stock:
+        query = query.filter(Product.stock > 0)
+
+    if brand is not None:
+        query = query.filter(Product.brand == brand)
     
     # Only return active products
     query = query.filter(Product.is_active == True)
     
-    # Sort and paginate
-    products = query.order_by(Product.id).offset(skip).limit(limit).all()
-    return products
+    # Sort (ties by id)
+    if sort == ProductSort.price_asc:
+        return query.order_by(Product.price, Product.id)
+    if sort == ProductSort.price_desc:
+        return query.order_by(Product.price.desc(), Product.id)
+    if sort == ProductSort.newest:
+        return query.order_by(Product.created_at.desc(), Product.id.desc())
+    if sort == ProductSort.best_selling:
+        units_sold = units_sold_subquery()
+        return query.outerjoin(units_sold, units_sold.c.product_id == Product.id).order_by(
+            func.coalesce(units_sold.c.units_sold, 0).desc(), Product.id
+        )
+    return query.order_by(Product.id)
+
+
+@router.get("/", response_model=List[ProductWithCategory])
+def read_products(
+    db: Session = Depends(get_lazy_db),
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    brand: Optional[str] = None,
+    sort: ProductSort = ProductSort.id,
+) -> Any:
+    """
+    Get product list
+    """
+    filters = dict(
+        category_id=category_id, search=search, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, brand=brand, sort=sort,
+    )
+    snapshot = catalog_snapshot.current()
+    # ILIKE 通配符只在数据库查询中支持
+    if snapshot is not None and not (search and ("%" in search or "_" in search)):
+        return snapshot.list_products(skip=skip, limit=limit, **filters)
+
+    # Paginate
+    return query_products(db, **filters).offset(skip).limit(limit).all()
+
+
+def query_facets(
+    db: Session,
+    price_edges: List[float],
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    brand: Optional[str] = None,
+) -> dict:
+    """
+    分面计数的数据库查询（快照不可用时使用）
+
+    按（品牌, 分类, 价格区间, 是否在价格筛选范围内）一次分组查询，
+    再在内存中按"不应用自身维度筛选"的规则汇总，结果与快照索引一致。
+    """
+    bucket = case(
+        *[(Product.price >= edge, index) for index, edge in reversed(list(enumerate(price_edges)))],
+        else_=-1,
+    )
+    price_conditions = []
+    if min_price is not None:
+        price_conditions.append(Product.price >= min_price)
+    if max_price is not None:
+        price_conditions.append(Product.price <= max_price)
+    in_range = case((and_(true(), *price_conditions), 1), else_=0)
+
+    query = db.query(Product.brand, Product.category_id, bucket, in_range, func.count()).filter(Product.is_active == True)
+    if search:
+        query = query.filter(Product.name.ilike(f"%{search}%"))
+    if in_stock:
+        query = query.filter(Product.stock > 0)
+    rows = query.group_by(Product.brand, Product.category_id, bucket, in_range).all()
+
+    counts = {"total": 0, "brands": {}, "categories": {}, "prices": [0] * len(price_edges)}
+    for row_brand, row_category, row_bucket, row_in_range, count in rows:
+        brand_ok = brand is None or row_brand == brand
+        category_ok = not category_id or row_category == category_id
+        if brand_ok and category_ok and row_in_range:
+            counts["total"] += count
+        if category_ok and row_in_range and row_brand is not None:
+            counts["brands"][row_brand] = counts["brands"].get(row_brand, 0) + count
+        if brand_ok and row_in_range and row_category is not None:
+            counts["categories"][row_category] = counts["categories"].get(row_category, 0) + count
+        if brand_ok and category_ok and row_bucket >= 0:
+            counts["prices"][row_bucket] += count
+    category_names = dict(db.query(Category.id, Category.name).all())
+    return format_facets(counts, category_names, price_edges)
+
+
+@router.get("/facets", response_model=ProductFacets)
+def read_product_facets(
+    db: Session = Depends(get_lazy_db),
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    brand: Optional[str] = None,
+) -> Any:
+    """
+    Get brand, category and price bucket counts for the current product filters
+    """
+    filters = dict(
+        category_id=category_id, search=search, min_price=min_price, max_price=max_price,
+        in_stock=in_stock, brand=brand,
+    )
+    price_edges = settings.PRODUCT_FACET_PRICE_BUCKETS
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None and not (search and ("%" in search or "_" in search)):
+        return snapshot.facets(price_edges, **filters)
+    return query_facets(db, price_edges, **filters)
+
+
+def query_suggestions(db: Session, prefix: str, limit: int) -> List[dict]:
+    """
+    搜索建议的数据库查询（快照不可用时使用）
+
+    与快照的建议索引规则相同：按单词开头匹配，热度为在售商品的销量加商品数，
+    商品名称忽略大小写合并，以销量最高、其次ID最小的商品为代表。
+    """
+    prefix = normalize_text(prefix)
+    if not prefix:
+        return []
+    pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def word_prefix(column):
+        lowered = func.lower(column)
+        return or_(lowered.like(f"{pattern}%", escape="\\"), lowered.like(f"% {pattern}%", escape="\\"))
+
+    units_sold = units_sold_subquery()
+    sold = func.coalesce(units_sold.c.units_sold, 0)
+    score = func.sum(sold + 1)
+
+    def active_products(*columns):
+        return (
+            db.query(*columns).select_from(Product)
+            .outerjoin(units_sold, units_sold.c.product_id == Product.id)
+            .filter(Product.is_active == True)
+        )
+
+    terms = []
+    name_key = func.lower(Product.name)
+    groups = (
+        active_products(name_key, score).filter(word_prefix(Product.name))
+        .group_by(name_key).order_by(score.desc(), name_key).limit(limit).all()
+    )
+    if groups:
+        representatives = {}
+        rows = (
+            active_products(name_key, Product.id, Product.name).filter(name_key.in_([key for key, _ in groups]))
+            .order_by(sold.desc(), Product.id).all()
+        )
+        for key, product_id, name in rows:
+            representatives.setdefault(key, (product_id, name))
+        terms += [("product", representatives[key][1], representatives[key][0], total) for key, total in groups]
+
+    brand_key = func.lower(Product.brand)
+    terms += [
+        ("brand", brand, None, total)
+        for brand, total in active_products(Product.brand, score)
+        .filter(Product.brand.isnot(None), word_prefix(Product.brand))
+        .group_by(Product.brand).order_by(score.desc(), brand_key).limit(limit)
+    ]
+    terms += [
+        ("category", name, category_id, total)
+        for category_id, name, total in active_products(Category.id, Category.name, score)
+        .join(Category, Category.id == Product.category_id)
+        .filter(Category.is_active == True, word_prefix(Category.name))
+        .group_by(Category.id, Category.name).order_by(score.desc(), func.lower(Category.name)).limit(limit)
+    ]
+    terms = sorted(((kind, text, ref, int(total), normalize_text(text)) for kind, text, ref, total in terms), key=suggestion_sort_key)
+    return [{"text": text, "kind": kind, "id": ref} for kind, text, ref, _, _ in terms[:limit]]
+
+
+@router.get("/suggest", response_model=List[ProductSuggestion])
+def suggest_products(
+    db: Session = Depends(get_lazy_db),
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+) -> Any:
+    """
+    Autocomplete product names, brands and category names by word prefix, most popular first
+    """
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        return snapshot.suggestions.suggest(q, limit)
+    return query_suggestions(db, q, limit)
+
+
+def query_fuzzy_products(db: Session, query: str, skip: int, limit: int) -> List[Product]:
+    """
+    模糊搜索的数据库查询（快照不可用时使用）
+
+    PostgreSQL 使用 pg_trgm 的 word_similarity 和名称上的 GIN 三元组索引；
+    其他数据库读取在售商品名称，在进程内建立三元组索引计算（与快照相同的评分）。
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # 阈值只对当前事务有效，%> 运算符可以使用 GIN 索引
+        db.execute(select(func.set_config(
+            "pg_trgm.word_similarity_threshold", str(settings.PRODUCT_SEARCH_MIN_SIMILARITY), True,
+        )))
+        return (
+            db.query(Product).options(joinedload(Product.category))
+            .filter(Product.is_active == True, Product.name.op("%>")(query))
+            .order_by(
+                func.word_similarity(query, Product.name).desc(), func.similarity(query, Product.name).desc(), Product.id,
+            )
+            .offset(skip).limit(limit).all()
+        )
+
+    rows = db.query(Product.id, Product.name).filter(Product.is_active == True).order_by(Product.id).all()
+    index = TrigramIndex(**build_trigram_arrays([name for _, name in rows]))
+    positions = index.search(query, settings.PRODUCT_SEARCH_MIN_SIMILARITY, settings.PRODUCT_SEARCH_MAX_CANDIDATES)
+    product_ids = [rows[position].id for position in positions[max(skip, 0):max(skip, 0) + limit].tolist()]
+    products = {
+        product.id: product
+        for product in db.query(Product).options(joinedload(Product.category)).filter(Product.id.in_(product_ids))
+    } if product_ids else {}
+    return [products[product_id] for product_id in product_ids]
+
+
+@router.get("/search", response_model=List[ProductWithCategory])
+def search_products(
+    db: Session = Depends(get_lazy_db),
+    q: str = Query(..., min_length=1, max_length=100),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+) -> Any:
+    """
+    Typo-tolerant product search by name, most similar first
+    """
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        return snapshot.search_products(q, skip=skip, limit=limit)
+    return query_fuzzy_products(db, q, skip, limit)
 
 
 @router.get("/{product_id}", response_model=ProductWithCategory)
 def read_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_lazy_db),
 ) -> Any:
     """
     Get product details by ID
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        product = snapshot.get_product(product_id)
+        is_active = product is not None and product["is_active"]
+    else:
+        product = db.query(Product).options(joinedload(Product.category)).filter(Product.id == product_id).first()
+        is_active = product is not None and product.is_active
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found",
         )
-    if not product.is_active:
+    if not is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not available",
@@ -85,6 +340,8 @@ def create_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    storefront_cache.invalidate()
+    catalog_snapshot.apply_product(ProductSchema.from_orm(product).dict())
     return product
 
 
@@ -114,6 +371,8 @@ def update_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    storefront_cache.invalidate()
+    catalog_snapshot.apply_product(ProductSchema.from_orm(product).dict())
     return product
 
 
@@ -139,6 +398,8 @@ def delete_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    storefront_cache.invalidate()
+    catalog_snapshot.apply_product(ProductSchema.from_orm(product).dict())
     return product
 
 
@@ -0,0 +1,27 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Header, Response
+
+from app.schemas.storefront import StorefrontHome
+from app.utils.storefront_cache import storefront_cache
+
+router = APIRouter()
+
+
+@router.get("/home", response_model=StorefrontHome)
+def read_storefront_home(
+    if_none_match: Optional[str] = Header(None),
+) -> Any:
+    """
+    Get aggregated home page data (categories, top products per category, featured products)
+    """
+    snapshot = storefront_cache.get()
+    # 商品修改后各worker在 check_seconds 秒内更新快照，浏览器缓存时间不超过它，过期后用ETag重新验证
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"public, max-age={int(storefront_cache.check_seconds)}",
+    }
+    if if_none_match == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    # 直接返回预先序列化好的JSON，不再经过response_model校验
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
@@ -0,0 +1,155 @@
+import json
+import math
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+
+CRITICAL = "critical"
+NORMAL = "normal"
+LOW = "low"
+
+
+def classify_request(method: str, path: str, query_string: bytes) -> str:
+    """
+    请求优先级
+
+    critical: 下单、购物车和登录，过载时也不拒绝；
+    low: 管理后台列表和深度分页，过载时最先拒绝；
+    其余为 normal。
+    """
+    api = settings.API_V1_STR
+    if path.startswith((f"{api}/cart", f"{api}/auth")):
+        return CRITICAL
+    if path.startswith(f"{api}/orders") and method != "GET":
+        return CRITICAL
+    if path.startswith((f"{api}/admin", f"{api}/users")) and method == "GET":
+        return LOW
+    if method == "GET" and query_string:
+        skip = parse_qs(query_string.decode("latin-1")).get("skip")
+        try:
+            if skip and int(skip[0]) >= settings.ADMISSION_DEEP_PAGE_SKIP:
+                return LOW
+        except ValueError:
+            pass
+    return NORMAL
+
+
+class AdmissionController:
+    """
+    跟踪正在处理的数据库请求数和连接池等待时间，判断当前过载程度
+
+    过载等级 1 拒绝 low，等级 2 同时拒绝 normal，critical 始终放行。
+    另外 low 请求同时处理的数量有单独上限，避免慢查询占满连接池。
+    """
+
+    def __init__(self, max_inflight: int, wait_threshold: float, max_low_inflight: int, decay_seconds: float = 5.0):
+        self.max_inflight = max_inflight
+        self.wait_threshold = wait_threshold
+        self.max_low_inflight = max_low_inflight
+        self.decay_seconds = decay_seconds
+        self.inflight = 0
+        self.low_inflight = 0
+        self.shed_count = 0
+        self._wait_ewma = 0.0
+        self._wait_updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_pool_wait(self, seconds: float) -> None:
+        """记录一次从连接池获取连接的等待时间"""
+        with self._lock:
+            self._wait_ewma = self._decayed_wait() * 0.8 + seconds * 0.2
+            self._wait_updated = time.monotonic()
+
+    def _decayed_wait(self) -> float:
+        # 没有新样本时（例如流量都被拒绝）等待时间随时间衰减，避免一直处于过载状态
+        elapsed = time.monotonic() - self._wait_updated
+        return self._wait_ewma * math.exp(-elapsed / self.decay_seconds)
+
+    @property
+    def pool_wait(self) -> float:
+        with self._lock:
+            return self._decayed_wait()
+
+    def overload_level(self) -> int:
+        wait = self.pool_wait
+        if self.inflight >= self.max_inflight * 1.5 or wait >= self.wait_threshold * 2:
+            return 2
+        if self.inflight >= self.max_inflight or wait >= self.wait_threshold:
+            return 1
+        return 0
+
+    def admit(self, priority: str) -> bool:
+        """判断是否接受请求，接受时计入正在处理的请求数，处理完后需调用 exit"""
+        level = 0 if priority == CRITICAL else self.overload_level()
+        with self._lock:
+            if priority == LOW:
+                admitted = level == 0 and self.low_inflight < self.max_low_inflight
+            else:
+                admitted = priority == CRITICAL or level < 2
+            if not admitted:
+                self.shed_count += 1
+                return False
+            self.inflight += 1
+            if priority == LOW:
+                self.low_inflight += 1
+            return True
+
+    def exit(self, priority: str) -> None:
+        with self._lock:
+            self.inflight -= 1
+            if priority == LOW:
+                self.low_inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "low_priority_inflight": self.low_inflight,
+            "pool_wait_seconds": self.pool_wait,
+            "overload_level": self.overload_level(),
+            "shed_total": self.shed_count,
+        }
+
+
+# 全局准入控制实例
+admission_controller = AdmissionController(
+    max_inflight=settings.ADMISSION_MAX_INFLIGHT,
+    wait_threshold=settings.ADMISSION_POOL_WAIT_THRESHOLD,
+    max_low_inflight=settings.ADMISSION_MAX_LOW_INFLIGHT,
+)
+
+
+class AdmissionControlMiddleware:
+    """数据库过载时按优先级快速返回503，保证下单和购物车请求可用"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+        self.retry_after = str(settings.ADMISSION_RETRY_AFTER).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(settings.API_V1_STR):
+            await self.app(scope, receive, send)
+            return
+
+        priority = classify_request(scope["method"], scope["path"], scope.get("query_string", b""))
+        if not self.controller.admit(priority):
+            body = json.dumps({"detail": "Service temporarily overloaded, please retry"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", self.retry_after),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.exit(priority)
@@ -28,6 +28,19 @@ class Settings(BaseSettings):
     
     # 数据库设置
     SQLALCHEMY_DATABASE_URI: str = os.getenv("DATABASE_URL", "sqlite:///./cypetstore.db")
+    # 应用启动时执行建表和初始数据检查（已迁移到最新版本时只需一条查询）
+    INIT_DB_ON_STARTUP: bool = os.getenv("INIT_DB_ON_STARTUP", "false").lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+
+    # 准入控制：正在处理的请求数或连接池等待时间超过阈值时拒绝低优先级请求
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_INFLIGHT: int = int(os.getenv("ADMISSION_MAX_INFLIGHT", 30))
+    ADMISSION_POOL_WAIT_THRESHOLD: float = float(os.getenv("ADMISSION_POOL_WAIT_THRESHOLD", 0.2))
+    ADMISSION_MAX_LOW_INFLIGHT: int = int(os.getenv("ADMISSION_MAX_LOW_INFLIGHT", 2))
+    ADMISSION_DEEP_PAGE_SKIP: int = int(os.getenv("ADMISSION_DEEP_PAGE_SKIP", 1000))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", 2))
     
     # 邮件设置
     SMTP_TLS: bool = os.getenv("SMTP_TLS", "true").lower() == "true"
@@ -37,6 +50,23 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: Optional[str] = os.getenv("SMTP_PASSWORD")
     EMAILS_FROM_EMAIL: Optional[EmailStr] = os.getenv("EMAILS_FROM_EMAIL")
     EMAILS_FROM_NAME: Optional[str] = os.getenv("EMAILS_FROM_NAME")
+    SMTP_POOL_SIZE: int = int(os.getenv("SMTP_POOL_SIZE", 4))
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 500))
+    # 按收件人域名限速（每秒邮件数），未列出的域名使用默认值，0表示不限速
+    SMTP_DOMAIN_RATE_LIMITS: str = os.getenv(
+        "SMTP_DOMAIN_RATE_LIMITS", "gmail.com=20,outlook.com=10,hotmail.com=10,yahoo.com=10"
+    )
+    SMTP_DEFAULT_RATE_LIMIT: float = float(os.getenv("SMTP_DEFAULT_RATE_LIMIT", 50))
+    
+    # 订单事件Webhook（可选）
+    ORDER_WEBHOOK_URL: Optional[str] = os.getenv("ORDER_WEBHOOK_URL")
+
+    # 发件箱worker设置
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+    OUTBOX_POLL_SECONDS: float = float(os.getenv("OUTBOX_POLL_SECONDS", 2))
+    # 领取的事件在这段时间内没有处理完（worker崩溃）时会被重新领取
+    OUTBOX_LEASE_SECONDS: float = float(os.getenv("OUTBOX_LEASE_SECONDS", 300))
     
     # 管理员设置
     ADMIN_EMAIL: EmailStr = os.getenv("ADMIN_EMAIL", "admin@example.com")
@@ -46,6 +76,74 @@ class Settings(BaseSettings):
     UPLOAD_FOLDER: str = os.getenv("UPLOAD_FOLDER", "static/uploads")
     MAX_CONTENT_LENGTH: int = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
     ALLOWED_EXTENSIONS: List[str] = os.getenv("ALLOWED_EXTENSIONS", "jpg,jpeg,png,gif").split(",")
+
+    # 购物车存储设置: sql / memory / redis
+    CART_STORE_BACKEND: str = os.getenv("CART_STORE_BACKEND", "sql")
+    CART_TTL_SECONDS: int = int(os.getenv("CART_TTL_SECONDS", 30 * 24 * 3600))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # 限流设置: memory / redis
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_DEFAULT_RATE: float = float(os.getenv("RATE_LIMIT_DEFAULT_RATE", 50))
+    RATE_LIMIT_DEFAULT_BURST: int = int(os.getenv("RATE_LIMIT_DEFAULT_BURST", 100))
+    # 按IP限流时使用的客户端地址：默认使用连接的对端地址（serve.py 在对端属于 FORWARDED_ALLOW_IPS 时
+    # 已经用 X-Forwarded-For 替换）。代理地址不固定、无法列入 FORWARDED_ALLOW_IPS 时设为 true，
+    # 直接读取 X-Forwarded-For；只有请求一定经过代理时才能开启，否则客户端可以伪造IP
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    # 客户端和应用之间追加 X-Forwarded-For 的代理层数，取从右数第N个地址（左边的地址可由客户端伪造）
+    RATE_LIMIT_PROXY_HOPS: int = int(os.getenv("RATE_LIMIT_PROXY_HOPS", 1))
+
+    # 幂等键设置
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+    IDEMPOTENCY_LOCK_SECONDS: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+    IDEMPOTENCY_SWEEP_SECONDS: float = float(os.getenv("IDEMPOTENCY_SWEEP_SECONDS", 300))
+    IDEMPOTENCY_PATHS: List[str] = os.getenv("IDEMPOTENCY_PATHS", "/api/v1/orders,/api/v1/cart").split(",")
+
+    # 首页聚合缓存设置
+    STOREFRONT_PRODUCTS_PER_CATEGORY: int = int(os.getenv("STOREFRONT_PRODUCTS_PER_CATEGORY", 8))
+    STOREFRONT_FEATURED_LIMIT: int = int(os.getenv("STOREFRONT_FEATURED_LIMIT", 8))
+    STOREFRONT_REFRESH_SECONDS: float = float(os.getenv("STOREFRONT_REFRESH_SECONDS", 60))
+    # 多worker时通过这个文件通知其他进程首页数据已变化，后台线程每 STOREFRONT_CHECK_SECONDS 秒检查一次
+    STOREFRONT_VERSION_PATH: str = os.getenv("STOREFRONT_VERSION_PATH", "./storefront.version")
+    STOREFRONT_CHECK_SECONDS: float = float(os.getenv("STOREFRONT_CHECK_SECONDS", 1))
+
+    # 商品目录快照（各worker进程内存映射同一个文件，商品列表和详情不查询数据库）
+    CATALOG_SNAPSHOT_ENABLED: bool = os.getenv("CATALOG_SNAPSHOT_ENABLED", "true").lower() == "true"
+    CATALOG_SNAPSHOT_PATH: str = os.getenv("CATALOG_SNAPSHOT_PATH", "./catalog.snapshot")
+    CATALOG_SNAPSHOT_REFRESH_SECONDS: float = float(os.getenv("CATALOG_SNAPSHOT_REFRESH_SECONDS", 60))
+    CATALOG_SNAPSHOT_CHECK_SECONDS: float = float(os.getenv("CATALOG_SNAPSHOT_CHECK_SECONDS", 1))
+    # 商品分面：价格区间的分界点，以及按筛选条件缓存的结果数
+    PRODUCT_FACET_PRICE_BUCKETS: List[float] = [
+        float(edge) for edge in os.getenv("PRODUCT_FACET_PRICE_BUCKETS", "0,10,25,50,100,200").split(",")
+    ]
+    PRODUCT_FACET_CACHE_SIZE: int = int(os.getenv("PRODUCT_FACET_CACHE_SIZE", 1024))
+    # 搜索建议：最多保留的商品名称数（按热度），限制索引占用的内存
+    PRODUCT_SUGGEST_MAX_TERMS: int = int(os.getenv("PRODUCT_SUGGEST_MAX_TERMS", 200000))
+    # 模糊搜索：最低相似度（查询的三元组在名称中出现的比例），以及每次查询最多评估的候选商品数
+    PRODUCT_SEARCH_MIN_SIMILARITY: float = float(os.getenv("PRODUCT_SEARCH_MIN_SIMILARITY", 0.5))
+    PRODUCT_SEARCH_MAX_CANDIDATES: int = int(os.getenv("PRODUCT_SEARCH_MAX_CANDIDATES", 10000))
+
+    # 销售汇总：每日汇总和分类汇总按订单ID分成的行数（减少并发下单的行锁竞争），以及报表的默认和最大天数
+    SALES_ROLLUP_SHARDS: int = int(os.getenv("SALES_ROLLUP_SHARDS", 16))
+    SALES_ANALYTICS_DEFAULT_DAYS: int = int(os.getenv("SALES_ANALYTICS_DEFAULT_DAYS", 30))
+    SALES_ANALYTICS_MAX_DAYS: int = int(os.getenv("SALES_ANALYTICS_MAX_DAYS", 366))
+
+    # 监控指标设置
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # 多个worker进程时各进程写入快照的目录，部署前应清空（单进程时留空）
+    METRICS_DIR: str = os.getenv("METRICS_DIR", "")
+
+    # 慢查询日志设置
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+    SLOW_QUERY_LOG_SIZE: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", 200))
+    SLOW_QUERY_EXPLAIN: bool = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+
+    # 链路追踪设置（span 以 OTLP/JSON 格式写到标准输出或文件，不需要 Collector）
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", 0.1))
+    TRACING_EXPORT_TARGET: str = os.getenv("TRACING_EXPORT_TARGET", "stdout")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "aus-pet-store-api")
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,346 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.utils.security import verify_access_token
+
+logger = logging.getLogger(__name__)
+
+# (状态码, 响应头, 响应体)；响应头不含 Content-Length，发送时按响应体重新计算
+StoredResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def request_fingerprint(method: str, path: str, query_string: bytes, body: bytes) -> str:
+    """请求指纹：相同的键只能用于方法、路径、查询参数和请求体都相同的请求"""
+    return hashlib.sha256(b"\n".join([method.encode(), path.encode(), query_string, body])).hexdigest()
+
+
+def stored_response(record: IdempotencyKey) -> StoredResponse:
+    """从已完成的记录还原响应"""
+    if record.response_headers is not None:
+        headers = [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in json.loads(record.response_headers)
+        ]
+    else:
+        # 0007 迁移之前保存的记录只有 Content-Type
+        content_type = record.response_content_type
+        headers = [(b"content-type", content_type.encode("latin-1"))] if content_type else []
+    return record.response_status, headers, record.response_body or b""
+
+
+class IdempotencyStore:
+    """幂等键的数据库存取以及过期清理"""
+
+    def __init__(self, ttl_seconds: int, lock_seconds: int, sweep_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.sweep_seconds = sweep_seconds
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def claim(self, scope: str, key: str, method: str, path: str, request_hash: str) -> Optional[IdempotencyKey]:
+        """
+        尝试认领幂等键
+
+        认领成功返回None；键已存在时返回已有记录（已分离的对象）。
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            for _ in range(2):
+                db.add(IdempotencyKey(
+                    scope=scope,
+                    key=key,
+                    method=method,
+                    path=path,
+                    request_hash=request_hash,
+                    status="in_progress",
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.lock_seconds),
+                ))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    db.rollback()
+                existing = db.query(IdempotencyKey).filter(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key
+                ).first()
+                if existing is None:
+                    continue
+                if existing.expires_at > now:
+                    db.expunge(existing)
+                    return existing
+                # 已过期（包括中断的处理中记录），删除后重新认领
+                db.delete(existing)
+                db.commit()
+            raise RuntimeError("Could not claim idempotency key")
+        finally:
+            db.close()
+
+    def get(self, scope: str, key: str) -> Optional[IdempotencyKey]:
+        db = SessionLocal()
+        try:
+            record = db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key
+            ).first()
+            if record is not None:
+                db.expunge(record)
+            return record
+        finally:
+            db.close()
+
+    def complete(self, scope: str, key: str, response: StoredResponse) -> None:
+        db = SessionLocal()
+        try:
+            status_code, headers, body = response
+            content_type = next((value for name, value in headers if name.lower() == b"content-type"), None)
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key
+            ).update({
+                "status": "completed",
+                "response_status": status_code,
+                "response_content_type": content_type.decode("latin-1") if content_type else None,
+                "response_headers": json.dumps(
+                    [[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers]
+                ),
+                "response_body": body,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+            })
+            db.commit()
+        finally:
+            db.close()
+
+    def release(self, scope: str, key: str) -> None:
+        """请求失败时释放幂等键，允许客户端重试"""
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress"
+            ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def sweep(self) -> int:
+        """删除过期记录"""
+        db = SessionLocal()
+        try:
+            deleted = db.query(IdempotencyKey).filter(
+                IdempotencyKey.expires_at < datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.sweep_seconds):
+            try:
+                deleted = self.sweep()
+                if deleted:
+                    logger.info("Removed %d expired idempotency keys", deleted)
+            except Exception:
+                logger.exception("Failed to sweep idempotency keys")
+
+    def start(self) -> None:
+        """启动过期清理线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="idempotency-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+# 全局幂等键存储实例
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+    sweep_seconds=settings.IDEMPOTENCY_SWEEP_SECONDS,
+)
+
+
+class IdempotencyMiddleware:
+    """
+    处理带 Idempotency-Key 请求头的写请求
+
+    首次请求的响应保存到 idempotency_keys 表，相同键的重试直接返回保存的响应；
+    并发的重复请求等待正在处理的请求完成，不会再次执行。
+    """
+
+    def __init__(self, app, store: IdempotencyStore = idempotency_store, paths=None, wait_seconds: float = 30):
+        self.app = app
+        self.store = store
+        self.paths = tuple(paths or settings.IDEMPOTENCY_PATHS)
+        self.wait_seconds = wait_seconds
+        # 本进程内正在处理的键 -> (请求指纹, 结果)，用于合并并发的重复请求
+        self._inflight: Dict[Tuple[str, str], Tuple[str, asyncio.Future]] = {}
+
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _scope_for(self, scope) -> Optional[str]:
+        authorization = self._header(scope, b"authorization") or ""
+        if not authorization.lower().startswith("bearer "):
+            return None
+        token_data = verify_access_token(authorization[7:])
+        if not token_data or not token_data.sub:
+            return None
+        return f"user:{token_data.sub}"
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in MUTATING_METHODS
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = self._header(scope, b"idempotency-key")
+        owner = self._scope_for(scope) if key else None
+        if not key or not owner:
+            await self.app(scope, receive, send)
+            return
+
+        # 读取完整请求体，用于计算指纹并重放给下游
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        request_hash = request_fingerprint(scope["method"], scope["path"], scope.get("query_string", b""), body)
+
+        inflight_key = (owner, key)
+        inflight = self._inflight.get(inflight_key)
+        if inflight is not None:
+            # 同一进程内的并发重复请求：与数据库中的记录一样先比较指纹，再等待原请求的结果
+            inflight_hash, future = inflight
+            if inflight_hash != request_hash:
+                await self._send_error(send, 422, "Idempotency-Key was already used for a different request")
+                return
+            try:
+                response = await asyncio.wait_for(asyncio.shield(future), self.wait_seconds)
+            except Exception:
+                await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await self._send_stored(send, response, replayed=True)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = (request_hash, future)
+        try:
+            await self._handle(scope, send, owner, key, request_hash, body, future)
+        finally:
+            self._inflight.pop(inflight_key, None)
+            if not future.done():
+                future.set_exception(RuntimeError("Request failed"))
+                # 避免没有等待者时出现 "exception was never retrieved" 警告
+                future.exception()
+
+    async def _handle(self, scope, send, owner, key, request_hash, body, future) -> None:
+        existing = await run_in_threadpool(
+            self.store.claim, owner, key, scope["method"], scope["path"], request_hash
+        )
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                await self._send_error(send, 422, "Idempotency-Key was already used for a different request")
+                return
+            if existing.status != "completed":
+                # 其他进程正在处理：轮询直到完成
+                existing = await self._wait_for_completion(owner, key)
+                if existing is None:
+                    await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                    return
+            response = stored_response(existing)
+            future.set_result(response)
+            await self._send_stored(send, response, replayed=True)
+            return
+
+        async def replay_receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status_code = 500
+        response_headers = []
+        response_chunks = []
+
+        async def capture_send(message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 保存全部响应头（Location、Set-Cookie等），重放时原样返回
+                response_headers = [
+                    (bytes(name), bytes(value))
+                    for name, value in message.get("headers", [])
+                    if name.lower() != b"content-length"
+                ]
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(self.store.release, owner, key)
+            raise
+
+        if status_code >= 500:
+            # 服务器错误不保存，允许客户端重试
+            await run_in_threadpool(self.store.release, owner, key)
+            return
+        response = (status_code, response_headers, b"".join(response_chunks))
+        await run_in_threadpool(self.store.complete, owner, key, response)
+        future.set_result(response)
+
+    async def _wait_for_completion(self, owner: str, key: str) -> Optional[IdempotencyKey]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            record = await run_in_threadpool(self.store.get, owner, key)
+            if record is None:
+                return None
+            if record.status == "completed":
+                return record
+        return None
+
+    @staticmethod
+    async def _send_stored(send, response: StoredResponse, replayed: bool) -> None:
+        status_code, stored_headers, body = response
+        headers = [(b"content-length", str(len(body)).encode())]
+        headers.extend(stored_headers)
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @classmethod
+    async def _send_error(cls, send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await cls._send_stored(send, (status_code, [(b"content-type", b"application/json")], body), replayed=False)
@@ -0,0 +1,493 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有跨进程文件锁，不合并已退出进程的文件（多进程服务只在 POSIX 上运行）
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000)
+
+
+class _ThreadShards:
+    """
+    每个线程一份独立的计数数组，写入时无需加锁
+
+    只有线程第一次写入时才加锁登记，读取（抓取指标）时把所有线程的值相加。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all: List[Dict[int, List[float]]] = []
+        self._lock = threading.Lock()
+
+    def current(self) -> Dict[int, List[float]]:
+        values = getattr(self._local, "values", None)
+        if values is None:
+            values = {}
+            self._local.values = values
+            with self._lock:
+                self._all.append(values)
+        return values
+
+    def total(self, slot: int, width: int) -> List[float]:
+        result = [0.0] * width
+        with self._lock:
+            shards = list(self._all)
+        for shard in shards:
+            values = shard.get(slot)
+            if values:
+                for i, value in enumerate(values):
+                    result[i] += value
+        return result
+
+
+_shards = _ThreadShards()
+_next_slot = iter(range(1 << 62))
+
+
+class _Child:
+    """某个指标在一组标签值下的数据"""
+
+    def __init__(self, width: int):
+        self.slot = next(_next_slot)
+        self.width = width
+
+    def _values(self) -> List[float]:
+        shard = _shards.current()
+        values = shard.get(self.slot)
+        if values is None:
+            values = shard[self.slot] = [0.0] * self.width
+        return values
+
+    def inc(self, amount: float = 1) -> None:
+        self._values()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._values()[0] -= amount
+
+    def total(self) -> List[float]:
+        return _shards.total(self.slot, self.width)
+
+
+class _HistogramChild(_Child):
+    def __init__(self, buckets: Sequence[float]):
+        # 各桶计数（含+Inf） + 总和 + 次数
+        super().__init__(len(buckets) + 3)
+        self.buckets = buckets
+
+    def observe(self, value: float) -> None:
+        values = self._values()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _Child] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> _Child:
+        return _Child(1)
+
+    def labels(self, *values) -> _Child:
+        """获取（必要时创建）一组标签值对应的数据，应在启动时预先注册常用组合"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        return {json.dumps(key): child.total() for key, child in self._children.items()}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self) -> _Child:
+        return _HistogramChild(self.buckets)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        # 抓取时才计算的指标（例如连接池状态）
+        self.collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, List[float]]]:
+        for collector in self.collectors:
+            collector()
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Total HTTP requests", ["method", "route", "status"]))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"]))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed", ["method", "route"]))
+http_response_size_bytes = registry.register(Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=SIZE_BUCKETS))
+db_statements_total = registry.register(Counter(
+    "db_statements_total", "SQL statements executed", ["route"]))
+db_statement_seconds_total = registry.register(Counter(
+    "db_statement_seconds_total", "Time spent executing SQL statements", ["route"]))
+db_pool_connections = registry.register(Gauge(
+    "db_pool_connections", "Database connection pool state", ["state"]))
+cache_requests_total = registry.register(Counter(
+    "cache_requests_total", "Cache lookups", ["cache", "result"]))
+image_processing_seconds = registry.register(Histogram(
+    "image_processing_seconds", "Image processing time", ["operation"]))
+
+
+class RequestStats:
+    """当前请求的统计信息（通过contextvar传递到线程池中执行的数据库操作）"""
+
+    __slots__ = ("route", "statements", "statement_seconds")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.statements = 0
+        self.statement_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def pop_timer(exception_context, name: str) -> None:
+    """handle_error 中弹出 before_cursor_execute 压入 conn.info[name] 的开始时间"""
+    conn = exception_context.connection
+    # 没有执行上下文说明出错的不是语句（例如连接或提交失败），没有压入开始时间
+    if conn is None or exception_context.execution_context is None:
+        return
+    started = conn.info.get(name)
+    if started:
+        started.pop()
+
+
+def install_db_metrics(engine) -> None:
+    """统计每个路由执行的SQL数量和耗时，以及连接池状态"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.statement_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # 执行出错时不会触发 after_cursor_execute，弹出这条语句的开始时间，避免连接上的计时栈错位
+        pop_timer(exception_context, "metrics_started")
+
+    checked_out = db_pool_connections.labels("checked_out")
+    idle = db_pool_connections.labels("idle")
+    overflow = db_pool_connections.labels("overflow")
+
+    def collect_pool():
+        # 按差值调整，使各线程分片之和等于连接池当前状态
+        pool = engine.pool
+        for child, value in (
+            (checked_out, getattr(pool, "checkedout", lambda: 0)()),
+            (idle, getattr(pool, "checkedin", lambda: 0)()),
+            (overflow, max(0, getattr(pool, "overflow", lambda: 0)())),
+        ):
+            child.inc(value - child.total()[0])
+
+    registry.collectors.append(collect_pool)
+
+
+_routes: list = []
+
+
+def register_routes(routes: Iterable) -> None:
+    """启动时登记应用路由，并预先注册每个路由的标签组合"""
+    _routes[:] = list(routes)
+    route_template.cache_clear()
+    for route in _routes:
+        path = getattr(route, "path", None)
+        if not path:
+            continue
+        for method in getattr(route, "methods", None) or ():
+            http_request_duration_seconds.labels(method, path)
+            http_requests_in_flight.labels(method, path)
+            http_response_size_bytes.labels(method, path)
+            http_requests_total.labels(method, path, "200")
+        db_statements_total.labels(path)
+        db_statement_seconds_total.labels(path)
+
+
+@lru_cache(maxsize=4096)
+def route_template(method: str, path: str) -> str:
+    """把请求路径映射为路由模板（如 /api/v1/products/{product_id}）作为标签"""
+    scope = {"type": "http", "method": method, "path": path}
+    partial = None
+    for route in _routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    # 未匹配的路径统一归类，避免标签数量无限增长
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """记录每个路由的请求数、延迟、正在处理数、响应大小和SQL统计"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(method, scope["path"])
+        stats = RequestStats(route)
+        token = current_request.set(stats)
+        in_flight = http_requests_in_flight.labels(method, route)
+        in_flight.inc()
+        status_code = 500
+        response_size = 0
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            current_request.reset(token)
+            http_request_duration_seconds.labels(method, route).observe(time.perf_counter() - started)
+            http_response_size_bytes.labels(method, route).observe(response_size)
+            http_requests_total.labels(method, route, status_code).inc()
+            if stats.statements:
+                db_statements_total.labels(route).inc(stats.statements)
+                db_statement_seconds_total.labels(route).inc(stats.statement_seconds)
+
+
+class MultiProcessStore:
+    """
+    多个worker进程的指标汇总
+
+    每个进程定期把自己的快照写入 METRICS_DIR/metrics_<pid>.json，
+    抓取时读取所有文件合并：计数器和直方图累加，仪表盘只累加仍在运行的进程。
+    已退出进程的计数器和直方图合并到 metrics_exited.json 后删除它的文件，
+    worker 反复重启（--max-requests）时文件数量不会增长。
+    """
+
+    EXITED_FILE = "metrics_exited.json"
+
+    def __init__(self, directory: str, flush_seconds: float = 5):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def flush(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Dict[str, List[float]]]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _merge(merged: Dict[str, Dict[str, List[float]]], snapshot: Dict[str, Dict[str, List[float]]], gauges: bool) -> None:
+        for name, children in snapshot.items():
+            metric = registry.metrics.get(name)
+            if metric is None or (metric.kind == "gauge" and not gauges):
+                continue
+            target = merged.setdefault(name, {})
+            for key, values in children.items():
+                current = target.get(key)
+                target[key] = values if current is None else [a + b for a, b in zip(current, values)]
+
+    def _pids(self) -> Dict[int, str]:
+        pids = {}
+        for filename in os.listdir(self.directory):
+            if filename.startswith("metrics_") and filename.endswith(".json"):
+                try:
+                    pids[int(filename[len("metrics_"):-len(".json")])] = os.path.join(self.directory, filename)
+                except ValueError:
+                    continue
+        return pids
+
+    def compact(self) -> int:
+        """把已退出进程的文件合并到 metrics_exited.json 并删除，返回合并的进程数"""
+        if fcntl is None:
+            return 0
+        dead = {pid: path for pid, path in self._pids().items() if not self._alive(pid)}
+        if not dead:
+            return 0
+        # 多个 worker 同时抓取时只有一个合并，避免重复累加
+        with open(os.path.join(self.directory, "metrics.lock"), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            exited_path = os.path.join(self.directory, self.EXITED_FILE)
+            exited = self._read(exited_path) or {}
+            merged = []
+            for pid, path in dead.items():
+                # 加锁之前可能已被其他进程合并
+                snapshot = self._read(path) if os.path.exists(path) else None
+                if snapshot is not None:
+                    self._merge(exited, snapshot, gauges=False)
+                    merged.append(path)
+            if merged:
+                tmp = f"{exited_path}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(exited, f)
+                os.replace(tmp, exited_path)
+            for path in dead.values():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return len(merged)
+
+    def collect(self) -> Dict[str, Dict[str, List[float]]]:
+        self.flush()
+        self.compact()
+        merged: Dict[str, Dict[str, List[float]]] = {}
+        exited = self._read(os.path.join(self.directory, self.EXITED_FILE))
+        if exited:
+            self._merge(merged, exited, gauges=False)
+        for pid, path in self._pids().items():
+            snapshot = self._read(path)
+            if snapshot is not None:
+                # 读取之后才退出的进程：仪表盘不计入
+                self._merge(merged, snapshot, gauges=self._alive(pid))
+        return merged
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+multiprocess_store = MultiProcessStore(settings.METRICS_DIR) if settings.METRICS_DIR else None
+
+
+def _escape_label_value(value) -> str:
+    """Prometheus文本格式的标签值转义：反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_metrics() -> str:
+    """生成Prometheus文本格式"""
+    snapshot = multiprocess_store.collect() if multiprocess_store else registry.snapshot()
+    lines = []
+    for name, metric in registry.metrics.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, values in sorted(snapshot.get(name, {}).items()):
+            labels = json.loads(key)
+            if metric.kind == "histogram":
+                cumulative = 0.0
+                for bound, count in zip(list(metric.buckets) + ["+Inf"], values[:-2]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format_number(bound)
+                    lines.append(f"{name}_bucket{_format_labels(metric.labelnames, labels, ('le', le))} {_format_number(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(metric.labelnames, labels)} {_format_number(values[-2])}")
+                lines.append(f"{name}_count{_format_labels(metric.labelnames, labels)} {_format_number(values[-1])}")
+            else:
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels)} {_format_number(values[0])}")
+    return "\n".join(lines) + "\n"
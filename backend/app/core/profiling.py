@@ -0,0 +1,136 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+class ProfilerBusyError(RuntimeError):
+    pass
+
+
+# 栈顶位于这些文件时认为线程处于空闲等待（锁、队列、事件循环 select）
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class SamplingProfiler:
+    """
+    采样式CPU分析
+
+    在 duration 秒内每隔 interval 秒读取一次进程内所有线程的调用栈（sys._current_frames），
+    结果为 collapsed stack 格式（"线程;函数;函数 次数"），可直接交给 flamegraph.pl / speedscope。
+    只在调用 profile 期间有开销，同一时间只允许一个分析任务。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+    def profile(self, duration: float, interval: float = 0.005, include_idle: bool = False) -> str:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A CPU profile is already running")
+        try:
+            own_thread = threading.get_ident()
+            thread_names = {}
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    if not include_idle and os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    if thread_id not in thread_names:
+                        thread_names = {t.ident: t.name for t in threading.enumerate()}
+                    stack.append(thread_names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+
+class MemoryProfiler:
+    """
+    基于 tracemalloc 的内存分析
+
+    start 之后才开始记录分配（有明显开销），每次 snapshot 与上一次快照对比，
+    返回增长最多的位置；stop 停止记录并释放快照。
+    """
+
+    _IGNORED = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = None
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._previous = None
+
+    @staticmethod
+    def _stat(stat) -> Dict[str, Any]:
+        return {
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+
+    @staticmethod
+    def _diff(stat) -> Dict[str, Any]:
+        return {
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+        }
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                raise RuntimeError("Memory profiling is not running")
+            snapshot = tracemalloc.take_snapshot().filter_traces(self._IGNORED)
+            current, peak = tracemalloc.get_traced_memory()
+            result: Dict[str, Any] = {
+                "pid": os.getpid(),
+                "traced_current_kb": round(current / 1024, 1),
+                "traced_peak_kb": round(peak / 1024, 1),
+                "top": [self._stat(stat) for stat in snapshot.statistics(group_by)[:limit]],
+                "growth": None,
+            }
+            if self._previous is not None:
+                diff: List = snapshot.compare_to(self._previous, group_by)
+                result["growth"] = [self._diff(stat) for stat in diff[:limit] if stat.size_diff > 0]
+            self._previous = snapshot
+            return result
+
+
+# 全局分析器实例
+cpu_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,212 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+from app.utils.security import verify_access_token
+
+
+class RateLimitPolicy:
+    """
+    单条限流规则（令牌桶）
+
+    rate 为每秒补充的令牌数，burst 为桶容量；
+    key 为 "user" 时已登录用户按用户ID计数，否则按客户端IP计数。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        rate: float,
+        burst: int,
+        methods: Iterable[str] = ("GET", "POST", "PUT", "PATCH", "DELETE"),
+        key: str = "user",
+        query_param: Optional[str] = None,
+    ):
+        self.name = name
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.methods = set(methods)
+        self.key = key
+        self.query_param = query_param
+
+    def matches(self, method: str, path: str, query_string: bytes) -> bool:
+        if method not in self.methods or not path.startswith(self.path):
+            return False
+        if self.query_param:
+            return bool(parse_qs(query_string.decode("latin-1")).get(self.query_param))
+        return True
+
+
+def default_policies() -> List[RateLimitPolicy]:
+    """默认规则，按顺序匹配第一条"""
+    api = settings.API_V1_STR
+    return [
+        # 防止撞库：登录和注册按IP严格限制（每分钟10次）
+        RateLimitPolicy("login", f"{api}/auth/login", rate=10 / 60, burst=10, methods=["POST"], key="ip"),
+        RateLimitPolicy("register", f"{api}/auth/register", rate=5 / 60, burst=5, methods=["POST"], key="ip"),
+        # 带搜索词的商品查询会扫描全表
+        RateLimitPolicy("product_search", f"{api}/products", rate=2, burst=10, methods=["GET"], query_param="search"),
+        RateLimitPolicy("catalog", f"{api}/products", rate=20, burst=40, methods=["GET"]),
+        RateLimitPolicy("api", api, rate=settings.RATE_LIMIT_DEFAULT_RATE, burst=settings.RATE_LIMIT_DEFAULT_BURST),
+    ]
+
+
+class MemoryRateLimitBackend:
+    """进程内令牌桶，键数量有上限，超出时淘汰最久未使用的键"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float, float]:
+        """取一个令牌，返回（是否允许, 剩余令牌数, 需要等待的秒数）"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, tokens, retry_after
+
+
+class RedisRateLimitBackend:
+    """多个进程/节点共享的令牌桶（Lua脚本保证原子性）"""
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, key_prefix: str = "ratelimit:"):
+        self.client = client
+        self.key_prefix = key_prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float, float]:
+        allowed, tokens = self._script(keys=[self.key_prefix + key], args=[rate, burst, time.time()])
+        tokens = float(tokens)
+        allowed = bool(int(allowed))
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, tokens, retry_after
+
+
+def create_rate_limit_backend(backend: str):
+    if backend == "memory":
+        return MemoryRateLimitBackend()
+    if backend == "redis":
+        # 仅在使用Redis后端时才需要安装redis包
+        import redis
+        return RedisRateLimitBackend(redis.Redis.from_url(settings.REDIS_URL))
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+@lru_cache(maxsize=4096)
+def _user_id_from_token(token: str) -> Optional[str]:
+    # 只用于选择限流键，缓存同一令牌的解码结果
+    token_data = verify_access_token(token)
+    return token_data.sub if token_data else None
+
+
+class RateLimitMiddleware:
+    """
+    按规则限流，超出时直接返回429
+
+    在路由、数据库会话和密码校验之前执行，被拒绝的请求几乎没有开销。
+    """
+
+    def __init__(self, app, backend=None, policies: Optional[List[RateLimitPolicy]] = None):
+        self.app = app
+        self.backend = backend
+        self.policies = policies
+        self.trust_proxy = settings.RATE_LIMIT_TRUST_PROXY
+        self.proxy_hops = max(1, settings.RATE_LIMIT_PROXY_HOPS)
+
+    def _client_ip(self, scope) -> str:
+        if self.trust_proxy:
+            # 多个 X-Forwarded-For 请求头按顺序合并；每层代理在末尾追加它看到的对端地址
+            forwarded = [
+                address.strip()
+                for name, value in scope.get("headers", [])
+                if name == b"x-forwarded-for"
+                for address in value.decode("latin-1").split(",")
+                if address.strip()
+            ]
+            if forwarded:
+                return forwarded[-min(self.proxy_hops, len(forwarded))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def _key(self, scope, policy: RateLimitPolicy) -> str:
+        if policy.key == "user":
+            for name, value in scope.get("headers", []):
+                if name == b"authorization":
+                    authorization = value.decode("latin-1")
+                    if authorization.lower().startswith("bearer "):
+                        user_id = _user_id_from_token(authorization[7:])
+                        if user_id:
+                            return f"{policy.name}:user:{user_id}"
+                    break
+        return f"{policy.name}:ip:{self._client_ip(scope)}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.policies is None:
+            self.policies = default_policies()
+        if self.backend is None:
+            self.backend = create_rate_limit_backend(settings.RATE_LIMIT_BACKEND)
+
+        method = scope["method"]
+        path = scope["path"]
+        query_string = scope.get("query_string", b"")
+        policy = next((p for p in self.policies if p.matches(method, path, query_string)), None)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, remaining, retry_after = self.backend.take(self._key(scope, policy), policy.rate, policy.burst)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                (b"x-ratelimit-limit", str(policy.burst).encode()),
+                (b"x-ratelimit-remaining", str(int(remaining)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import current_request, pop_timer
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\$?\?|%\(\w+\)s|:\w+)"
+_IN_LIST_RE = re.compile(rf"\bIN\s*\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """去掉字面量、合并 IN 列表和空白，使同一形状的查询归为一类"""
+    sql = _STRING_RE.sub("?", statement)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def parameter_shape(parameters: Any, executemany: bool) -> Any:
+    """只记录参数的类型，不记录值（避免日志中出现用户数据）"""
+    if executemany:
+        rows = list(parameters or ())
+        return {"rows": len(rows), "row": parameter_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SlowQuery:
+    """同一形状慢查询的汇总"""
+
+    def __init__(self, fingerprint: str, sql: str, params: Any):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.params = params
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.routes: Dict[str, int] = {}
+        self.first_seen = datetime.now(timezone.utc)
+        self.last_seen = self.first_seen
+        self.plan: Optional[List[str]] = None
+
+    def record(self, elapsed_ms: float, route: str) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.routes[route] = self.routes.get(route, 0) + 1
+        self.last_seen = datetime.now(timezone.utc)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "params": self.params,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "routes": self.routes,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    """
+    慢查询日志
+
+    通过引擎事件为每条SQL计时，超过阈值的按规范化后的SQL去重汇总，
+    最多保留 capacity 种形状（淘汰最久未出现的）。
+    新出现的 SELECT 形状会在后台线程中用独立连接执行 EXPLAIN 获取执行计划，
+    不占用请求的连接和事务。
+    """
+
+    def __init__(self, threshold_ms: float, capacity: int = 200, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.capacity = capacity
+        self.explain = explain
+        self._entries: "OrderedDict[str, SlowQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._explain_queue: "queue.Queue" = queue.Queue(maxsize=100)
+        self._engine = None
+        self._thread: Optional[threading.Thread] = None
+
+    def install(self, engine) -> None:
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+        if elapsed_ms < self.threshold_ms or threading.current_thread() is self._thread:
+            return
+        self.record(statement, parameters, executemany, elapsed_ms)
+
+    def _handle_error(self, exception_context):
+        pop_timer(exception_context, "slow_query_started")
+
+    def record(self, statement: str, parameters: Any, executemany: bool, elapsed_ms: float) -> None:
+        sql = normalize_sql(statement)
+        fingerprint = hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+        stats = current_request.get()
+        route = stats.route if stats is not None else "background"
+        with self._lock:
+            entry = self._entries.pop(fingerprint, None)
+            is_new = entry is None
+            if is_new:
+                entry = SlowQuery(fingerprint, sql, parameter_shape(parameters, executemany))
+            entry.record(elapsed_ms, route)
+            self._entries[fingerprint] = entry
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed_ms, route, sql)
+        if is_new and self.explain and not executemany and sql.split(" ", 1)[0].upper() in ("SELECT", "WITH"):
+            self._queue_explain(entry, statement, parameters)
+
+    def _queue_explain(self, entry: SlowQuery, statement: str, parameters: Any) -> None:
+        self._ensure_thread()
+        try:
+            self._explain_queue.put_nowait((entry, statement, parameters))
+        except queue.Full:
+            pass
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_explains, name="slow-query-explain", daemon=True)
+            self._thread.start()
+
+    def _explain_prefix(self) -> str:
+        return "EXPLAIN QUERY PLAN " if self._engine.dialect.name == "sqlite" else "EXPLAIN "
+
+    def _run_explains(self) -> None:
+        while True:
+            entry, statement, parameters = self._explain_queue.get()
+            try:
+                with self._engine.connect() as conn:
+                    rows = conn.exec_driver_sql(self._explain_prefix() + statement, parameters).fetchall()
+                entry.plan = [" ".join(str(column) for column in row) for row in rows]
+            except Exception as exc:
+                entry.plan = [f"EXPLAIN failed: {exc}"]
+
+    def top(self, limit: int = 20, sort_by: str = "total_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries.values())
+        entries.sort(key=lambda entry: getattr(entry, sort_by), reverse=True)
+        return [entry.to_dict() for entry in entries[:limit]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局慢查询日志
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    capacity=settings.SLOW_QUERY_LOG_SIZE,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+)
@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# OpenTelemetry span kind / status code
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """一个计时区间，字段与 OpenTelemetry 的 span 一致"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, kind: int = KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.status = STATUS_UNSET
+        self.message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.message = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if not self.end_ns:
+            self.end_ns = time.time_ns()
+            tracer.exporter.export(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attribute_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.message} if self.message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """
+    后台线程批量导出 span
+
+    每批写一行 OTLP/JSON（resourceSpans），可以直接交给 OpenTelemetry Collector 的
+    文件接收器，也可以用 jq 查看。target 为 "stdout" 或文件路径。
+    队列满时丢弃 span，不阻塞请求。
+    """
+
+    def __init__(self, target: str = "stdout", batch_size: int = 256, flush_seconds: float = 2, max_queue: int = 10000):
+        self.target = target
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def export(self, span: Span) -> None:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def _drain(self, timeout: float) -> List[Span]:
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Span]) -> None:
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [span.to_otlp() for span in batch]}],
+        }]}, separators=(",", ":"))
+        if self.target == "stdout":
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        else:
+            with open(self.target, "a") as f:
+                f.write(line + "\n")
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(self.flush_seconds)
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Failed to export %d spans", len(batch))
+
+    def flush(self) -> None:
+        batch = self._drain(0)
+        while batch:
+            self._write(batch)
+            batch = self._drain(0)
+
+
+class Tracer:
+    """
+    基于请求头的采样：根 span 按 sample_ratio 采样，
+    带 traceparent 的请求沿用上游的采样决定；未采样的请求不创建任何 span。
+    """
+
+    def __init__(self, enabled: bool, sample_ratio: float, exporter: SpanExporter):
+        self.enabled = enabled
+        self.sample_ratio = sample_ratio
+        self.exporter = exporter
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """开始一个请求的根 span，不采样时返回 None"""
+        if not self.enabled:
+            return None
+        match = _TRACEPARENT_RE.match(traceparent or "")
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            if not int(flags, 16) & 1:
+                return None
+        else:
+            if random.random() >= self.sample_ratio:
+                return None
+            trace_id, parent_id = "%032x" % random.getrandbits(128), None
+        return Span(name, trace_id, parent_id, KIND_SERVER, attributes)
+
+    def start_span(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """在当前 span 下开始子 span（需自行调用 end），当前请求未采样时返回 None"""
+        parent = current_span.get()
+        if parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+        """子 span 上下文管理器，内部创建的 span 以它为父节点"""
+        span = self.start_span(name, kind, attributes)
+        if span is None:
+            yield None
+            return
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            current_span.reset(token)
+            span.end()
+
+
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_ratio=settings.TRACING_SAMPLE_RATIO,
+    exporter=SpanExporter(settings.TRACING_EXPORT_TARGET),
+)
+
+
+def install_db_tracing(engine) -> None:
+    """每条SQL和每次提交各一个 span"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span("db.query", KIND_CLIENT, {
+            "db.system": engine.dialect.name,
+            "db.statement": statement,
+        })
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info["trace_spans"].pop()
+        if span is not None:
+            span.set_attribute("db.rows", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            span = spans.pop()
+            if span is not None:
+                span.record_exception(context.original_exception)
+                span.end()
+
+    @event.listens_for(Session, "before_commit")
+    def _before_commit(session):
+        session.info["trace_commit_span"] = tracer.start_span("db.commit", KIND_CLIENT, {"db.system": engine.dialect.name})
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        span = session.info.pop("trace_commit_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session):
+        span = session.info.pop("trace_commit_span", None)
+        if span is not None:
+            span.status = STATUS_ERROR
+            span.message = "rolled back"
+            span.end()
+
+
+def instrument_serialization() -> None:
+    """为 FastAPI 的响应模型校验和序列化（fastapi.routing.serialize_response）增加 span"""
+    import fastapi.routing
+
+    serialize_response = fastapi.routing.serialize_response
+    if getattr(serialize_response, "_traced", False):
+        return
+
+    async def traced_serialize_response(*args, **kwargs):
+        with tracer.span("serialize_response"):
+            return await serialize_response(*args, **kwargs)
+
+    traced_serialize_response._traced = True
+    fastapi.routing.serialize_response = traced_serialize_response
+
+
+class TracingMiddleware:
+    """为每个采样的请求创建根 span，并在响应头中返回 traceparent 便于关联日志"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1").strip()
+                break
+        method = scope["method"]
+        route = route_template(method, scope["path"])
+        span = tracer.start_trace(f"{method} {route}", traceparent, {
+            "http.method": method,
+            "http.route": route,
+            "http.target": scope["path"],
+        })
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    span.status = STATUS_ERROR
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", span.traceparent.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            span.record_exception(exc)
+            raise
+        finally:
+            current_span.reset(token)
+            span.end()
@@ -1,4 +1,14 @@
 import logging
+import os
+from functools import lru_cache
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.db.session import Base, engine
@@ -6,14 +16,72 @@ from app.core.config import settings
 from app.models.user import User
 from app.models.product import Product, Category
 from app.models.order import Order, OrderItem
+from app.models.idempotency import IdempotencyKey
+from app.models.outbox import OutboxEvent
+from app.models.sales import SalesDaily, SalesDailyCategory, SalesDailyProduct
 from app.utils.security import get_password_hash
 
 logger = logging.getLogger(__name__)
 
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "alembic.ini")
+# 引入迁移之前 create_all 建出的表结构对应的版本
+BASELINE_REVISION = "0001"
+
+
+def upgrade_database(bind: Engine = engine) -> None:
+    """
+    把数据库迁移到最新版本（alembic upgrade head）
+
+    没有迁移记录但已经有表的数据库是引入迁移之前用 create_all 建的，先标记为基线版本再升级。
+    """
+    with bind.begin() as connection:
+        config = Config(ALEMBIC_INI)
+        config.attributes["connection"] = connection
+        if MigrationContext.configure(connection).get_current_revision() is None and inspect(connection).has_table("products"):
+            logger.info("Stamping existing database as migration %s", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+
+def reset_database(bind: Engine = engine) -> None:
+    """
+    删除所有表，之后 init_db 从头执行迁移
+
+    除了模型中的表，还删除迁移版本表和模型中已经没有的旧表（只删模型表时迁移版本仍是最新，
+    upgrade head 不会重新建表）。
+    """
+    # 先按模型删除，PostgreSQL 上同时删除枚举类型
+    Base.metadata.drop_all(bind=bind)
+    remaining = MetaData()
+    remaining.reflect(bind=bind)
+    remaining.drop_all(bind=bind)
+
+
+@lru_cache(maxsize=1)
+def migration_head() -> str:
+    """最新的迁移版本（读取迁移脚本，不访问数据库）"""
+    return ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+
+
+def is_schema_current(db: Session) -> bool:
+    """数据库已经迁移到最新版本时返回True（一条查询）"""
+    try:
+        return db.execute(text("SELECT version_num FROM alembic_version")).scalar() == migration_head()
+    except SQLAlchemyError:
+        # 版本表不存在（新数据库或引入迁移之前的数据库）
+        db.rollback()
+        return False
+
+
 # Initialize database tables
-def init_db(db: Session) -> None:
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+def init_db(db: Session, force: bool = False) -> None:
+    # 已经迁移到最新版本说明初始化过，跳过迁移和初始数据检查（冷启动时只执行一条查询）
+    if not force and is_schema_current(db):
+        logger.info("Database schema is current, skipping initialization")
+        return
+
+    # 建表和结构变更都通过迁移完成
+    upgrade_database()
     
     # Check if admin user already exists
     admin_user = db.query(User).filter(User.email == settings.ADMIN_EMAIL).first()
@@ -128,4 +196,4 @@ def init_db(db: Session) -> None:
         ]
         db.add_all(products)
         db.commit()
-        logger.info("Sample products created") 
\ No newline at end of file
+        logger.info("Sample products created")
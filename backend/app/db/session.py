@@ -1,15 +1,38 @@
+import time
+
+from fastapi import HTTPException, status
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from app.core.admission import admission_controller
 from app.core.config import settings
+from app.core.metrics import install_db_metrics
+from app.core.slow_query import slow_query_log
+from app.core.tracing import install_db_tracing, tracer
+
+# 连接池设置（内存SQLite使用单连接池，不支持这些参数）
+pool_options = {}
+if ":memory:" not in settings.SQLALCHEMY_DATABASE_URI:
+    pool_options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
 
 # 创建SQLAlchemy引擎
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     connect_args={"check_same_thread": False} if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite") else {},
+    **pool_options,
 )
 
+# SQL执行次数/耗时和连接池状态指标
+install_db_metrics(engine)
+slow_query_log.install(engine)
+install_db_tracing(engine)
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -18,8 +41,30 @@ Base = declarative_base()
 
 # 依赖项函数，用于获取数据库会话
 def get_db():
+    db = SessionLocal()
+    try:
+        # 立即获取连接并记录连接池等待时间，供准入控制判断数据库是否过载
+        with tracer.span("get_db"):
+            started = time.perf_counter()
+            try:
+                db.connection()
+            except PoolTimeoutError:
+                admission_controller.record_pool_wait(settings.DB_POOL_TIMEOUT)
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Database is busy, please retry",
+                    headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER)},
+                )
+            admission_controller.record_pool_wait(time.perf_counter() - started)
+        yield db
+    finally:
+        db.close()
+
+
+# 可能不访问数据库的只读接口使用：不预先获取连接，只在执行查询时才占用连接池
+def get_lazy_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,404 @@
+"""
+大规模模拟数据生成
+
+按配置的数量生成商品、用户、订单/订单项和购物车，用于压测和查询计划分析。
+所有数据由 seed 决定（同样的参数生成完全相同的数据），每张表使用独立的随机数序列，
+修改某张表的数量不会影响其他表的内容。
+写入使用 Core 批量 insert，PostgreSQL（psycopg2）上使用 COPY。
+"""
+
+import csv
+import io
+import itertools
+import logging
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Engine
+
+from app.models.order import Order, OrderItem, OrderStatus, PaymentMethod
+from app.models.product import CartItem, Category, Product
+from app.models.user import User
+from app.utils.pricing import calculate_totals
+from app.utils.security import get_password_hash
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_PASSWORD = "synthetic"
+# 固定的结束日期，保证不同日期运行生成的数据一致
+DEFAULT_END_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+CATEGORIES = [
+    ("Dog Supplies", "dog", ["Dry Food", "Wet Food", "Chew Toy", "Lead", "Harness", "Bed", "Collar", "Treats", "Shampoo", "Crate"]),
+    ("Cat Supplies", "cat", ["Dry Food", "Wet Food", "Scratching Post", "Litter", "Litter Tray", "Bed", "Wand Toy", "Treats", "Carrier", "Brush"]),
+    ("Small Pet Supplies", "small-pet", ["Hutch", "Bedding", "Pellets", "Hay", "Water Bottle", "Exercise Wheel", "Hide House", "Treats"]),
+    ("Bird Supplies", "bird", ["Seed Mix", "Cage", "Perch", "Cuttlebone", "Swing", "Bath", "Millet Spray"]),
+    ("Fish & Aquarium", "fish", ["Flake Food", "Aquarium", "Filter", "Heater", "Gravel", "Air Pump", "Water Conditioner"]),
+    ("Reptile Supplies", "reptile", ["Heat Lamp", "Terrarium", "Substrate", "UVB Tube", "Live Food Tub", "Basking Rock"]),
+]
+BRANDS = [
+    "Acme Pet", "PawPal", "Whiskers & Co", "Barkly", "Nibbles", "Outback Paws", "Furry Friends", "TailWag",
+    "Pet Pantry", "Happy Hound", "Meow Mix", "Pure Pet", "Aussie Tails", "Snuggle Pet", "Trusty Pet", "WildCraft",
+    "Koala Pet", "Southern Cross Pet", "GreenPaw", "VetPlus",
+]
+ADJECTIVES = [
+    "Premium", "Organic", "Grain-Free", "Deluxe", "Eco", "Classic", "Ultra", "Natural", "Large", "Small",
+    "Heavy Duty", "Soft", "Interactive", "Senior", "Puppy", "Kitten", "Adult", "Hypoallergenic", "Travel", "Compact",
+]
+SIZES = ["", "", "1kg", "2.5kg", "5kg", "10kg", "S", "M", "L", "XL", "500g", "Twin Pack", "3 Pack"]
+SENTENCES = [
+    "Made with high-quality materials for everyday use.",
+    "Suitable for pets of all ages and sizes.",
+    "Vet recommended and proudly designed in Australia.",
+    "Easy to clean and built to last.",
+    "Packed with essential vitamins and minerals.",
+    "Keeps your pet happy, healthy and entertained.",
+    "Lightweight design that is perfect for travel.",
+    "Gentle formula for sensitive pets.",
+    "Free from artificial colours and preservatives.",
+    "Backed by a 12 month satisfaction guarantee.",
+]
+FIRST_NAMES = [
+    "Olivia", "Jack", "Charlotte", "Noah", "Amelia", "William", "Isla", "Oliver", "Mia", "Leo", "Ava", "Henry",
+    "Grace", "Thomas", "Chloe", "Lucas", "Ruby", "James", "Zoe", "Ethan", "Wei", "Priya", "Mohammed", "Sofia",
+]
+LAST_NAMES = [
+    "Smith", "Jones", "Williams", "Brown", "Wilson", "Taylor", "Nguyen", "Johnson", "Martin", "White", "Anderson",
+    "Walker", "Thompson", "Chen", "Lee", "Kelly", "Ryan", "Patel", "Singh", "Harris",
+]
+CITIES = [
+    ("Sydney", "NSW", "2000"), ("Melbourne", "VIC", "3000"), ("Brisbane", "QLD", "4000"), ("Perth", "WA", "6000"),
+    ("Adelaide", "SA", "5000"), ("Hobart", "TAS", "7000"), ("Canberra", "ACT", "2600"), ("Darwin", "NT", "0800"),
+    ("Newcastle", "NSW", "2300"), ("Geelong", "VIC", "3220"), ("Gold Coast", "QLD", "4217"),
+]
+STREETS = ["George St", "High St", "Church St", "Victoria Rd", "Station St", "Park Rd", "King St", "Beach Rd"]
+
+
+class SyntheticConfig:
+    def __init__(
+        self,
+        products: int = 100_000,
+        users: int = 10_000,
+        orders: int = 100_000,
+        carts: int = 2_000,
+        max_items_per_order: int = 5,
+        days: int = 365,
+        popularity_skew: float = 0.9,
+        seed: int = 42,
+        batch_size: int = 10_000,
+        end_date: datetime = DEFAULT_END_DATE,
+    ):
+        self.products = products
+        self.users = users
+        self.orders = orders
+        self.carts = carts
+        self.max_items_per_order = max_items_per_order
+        self.days = days
+        self.popularity_skew = popularity_skew
+        self.seed = seed
+        self.batch_size = batch_size
+        self.end_date = end_date
+
+
+class ZipfSampler:
+    """
+    按 Zipf 分布抽取 [first_id, first_id + n) 中的ID
+
+    排名到ID的映射是随机打乱的，热门商品不会集中在ID较小的一端。
+    """
+
+    def __init__(self, n: int, skew: float, first_id: int, rng: random.Random):
+        weights = (1 / (rank ** skew) for rank in range(1, n + 1))
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+        self.ids = list(range(first_id, first_id + n))
+        rng.shuffle(self.ids)
+
+    def sample(self, rng: random.Random) -> int:
+        index = bisect_left(self.cumulative, rng.random() * self.total)
+        return self.ids[min(index, len(self.ids) - 1)]
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkWriter:
+    """批量写入：PostgreSQL（psycopg2）使用 COPY，其他数据库使用 executemany"""
+
+    def __init__(self, engine: Engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.use_copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+    def _copy(self, conn, table, columns: Sequence[str], batch: List[Dict[str, Any]]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([r"\N" if row[c] is None else row[c] for c in columns])
+        buffer.seek(0)
+        cursor = conn.connection.dbapi_connection.cursor()
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+    def write_batch(self, conn, table, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        if self.use_copy:
+            self._copy(conn, table, list(batch[0].keys()), batch)
+        else:
+            conn.execute(insert(table), batch)
+
+    def prepare(self, conn) -> None:
+        if self.engine.dialect.name == "sqlite":
+            # 导入期间不等待fsync
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+
+    def write(self, table, rows: Iterable[Dict[str, Any]], label: str) -> int:
+        started = time.perf_counter()
+        count = 0
+        with self.engine.begin() as conn:
+            self.prepare(conn)
+            for batch in _batches(rows, self.batch_size):
+                self.write_batch(conn, table, batch)
+                count += len(batch)
+                if count % (self.batch_size * 10) == 0:
+                    logger.info("%s: %d rows", label, count)
+        elapsed = time.perf_counter() - started
+        logger.info("%s: %d rows in %.1fs (%.0f rows/s)", label, count, elapsed, count / elapsed if elapsed else 0)
+        return count
+
+    def reset_sequences(self, tables) -> None:
+        """COPY/显式ID写入后同步 PostgreSQL 的自增序列"""
+        if self.engine.dialect.name != "postgresql":
+            return
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))"
+                ))
+
+
+class SyntheticDataGenerator:
+    def __init__(self, engine: Engine, config: SyntheticConfig):
+        self.engine = engine
+        self.config = config
+        self.writer = BulkWriter(engine, config.batch_size)
+        self.product_prices: List[float] = []
+        self.first_product_id = 1
+        self.first_user_id = 1
+
+    def _rng(self, table: str) -> random.Random:
+        # 每张表独立的随机数序列
+        return random.Random(f"{self.config.seed}:{table}")
+
+    def _next_id(self, table) -> int:
+        with self.engine.connect() as conn:
+            return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+    def ensure_categories(self) -> List[int]:
+        """补齐模拟数据使用的分类，返回按 CATEGORIES 顺序的分类ID"""
+        table = Category.__table__
+        with self.engine.begin() as conn:
+            existing = dict(conn.execute(select(table.c.slug, table.c.id)).all())
+            missing = [
+                {"name": name, "slug": slug, "description": f"Everything for your {slug.replace('-', ' ')}", "is_active": True}
+                for name, slug, _ in CATEGORIES if slug not in existing
+            ]
+            if missing:
+                conn.execute(insert(table), missing)
+                existing = dict(conn.execute(select(table.c.slug, table.c.id)).all())
+        return [existing[slug] for _, slug, _ in CATEGORIES]
+
+    def _product_rows(self, category_ids: List[int]) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("products")
+        created = self.config.end_date - timedelta(days=self.config.days)
+        for offset in range(self.config.products):
+            category_index = rng.randrange(len(CATEGORIES))
+            nouns = CATEGORIES[category_index][2]
+            brand = rng.choice(BRANDS)
+            name = " ".join(part for part in (brand, rng.choice(ADJECTIVES), rng.choice(nouns), rng.choice(SIZES)) if part)
+            # 价格呈长尾分布（大部分商品较便宜），以 .99 结尾
+            price = round(int(min(998.0, rng.lognormvariate(3.3, 0.8))) + 0.99, 2)
+            self.product_prices.append(price)
+            yield {
+                "id": self.first_product_id + offset,
+                "name": name,
+                "description": " ".join(rng.sample(SENTENCES, 3)),
+                "price": price,
+                "stock": 0 if rng.random() < 0.05 else rng.randint(1, 500),
+                "image": None,
+                "is_active": rng.random() >= 0.03,
+                "category_id": category_ids[category_index],
+                "brand": brand,
+                "weight": round(rng.uniform(0.05, 25), 2),
+                "dimensions": f"{rng.randint(5, 120)}x{rng.randint(5, 80)}x{rng.randint(2, 60)}cm",
+                "created_at": created + timedelta(seconds=rng.randrange(self.config.days * 86400)),
+            }
+
+    def _user_rows(self) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("users")
+        # bcrypt很慢，所有模拟用户共用同一个密码哈希
+        hashed_password = get_password_hash(SYNTHETIC_PASSWORD)
+        created = self.config.end_date - timedelta(days=self.config.days * 2)
+        for offset in range(self.config.users):
+            user_id = self.first_user_id + offset
+            city, state, postcode = rng.choice(CITIES)
+            yield {
+                "id": user_id,
+                "email": f"user{user_id}@synthetic.example.com",
+                "hashed_password": hashed_password,
+                "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "phone": f"04{rng.randrange(10 ** 8):08d}",
+                "address": f"{rng.randint(1, 300)} {rng.choice(STREETS)}",
+                "city": city,
+                "state": state,
+                "postcode": postcode,
+                "country": "Australia",
+                "is_active": True,
+                "is_admin": False,
+                "created_at": created + timedelta(seconds=rng.randrange(self.config.days * 86400)),
+            }
+
+    @staticmethod
+    def _status_for_age(age_days: float, rng: random.Random) -> str:
+        # 越早的订单越可能已经送达
+        if rng.random() < 0.04:
+            return OrderStatus.CANCELLED.name
+        if age_days > 14:
+            return OrderStatus.DELIVERED.name
+        if age_days > 5:
+            return rng.choice([OrderStatus.SHIPPED.name, OrderStatus.DELIVERED.name])
+        if age_days > 1:
+            return rng.choice([OrderStatus.PAID.name, OrderStatus.PROCESSING.name, OrderStatus.SHIPPED.name])
+        return rng.choice([OrderStatus.PENDING.name, OrderStatus.PAID.name])
+
+    def _order_rows(self, first_order_id: int, first_item_id: int, item_rows: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """生成订单，同时把订单项追加到 item_rows（由调用方按批写入）"""
+        config = self.config
+        rng = self._rng("orders")
+        products = ZipfSampler(config.products, config.popularity_skew, self.first_product_id, self._rng("product-popularity"))
+        # 下单频率也有偏斜：少数用户贡献大量订单
+        users = ZipfSampler(config.users, 0.6, self.first_user_id, self._rng("user-activity"))
+        payment_methods = [m.name for m in PaymentMethod]
+        span_seconds = config.days * 86400
+        item_id = first_item_id
+        for offset in range(config.orders):
+            order_id = first_order_id + offset
+            # 订单量随时间增长
+            age_seconds = span_seconds * (1 - rng.random() ** 0.7)
+            created_at = config.end_date - timedelta(seconds=age_seconds)
+            subtotal = 0.0
+            seen = set()
+            for _ in range(rng.randint(1, config.max_items_per_order)):
+                product_id = products.sample(rng)
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                quantity = 1 if rng.random() < 0.7 else rng.randint(2, 4)
+                unit_price = self.product_prices[product_id - self.first_product_id]
+                total_price = round(unit_price * quantity, 2)
+                subtotal += total_price
+                item_rows.append({
+                    "id": item_id,
+                    "order_id": order_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "total_price": total_price,
+                    "created_at": created_at,
+                })
+                item_id += 1
+            totals = calculate_totals(subtotal)
+            city, state, postcode = rng.choice(CITIES)
+            yield {
+                "id": order_id,
+                "user_id": users.sample(rng),
+                "order_number": f"SYN{order_id:021d}",
+                "status": self._status_for_age(age_seconds / 86400, rng),
+                "total_amount": totals["total"],
+                "payment_method": rng.choice(payment_methods),
+                "payment_id": None,
+                "shipping_address": f"{rng.randint(1, 300)} {rng.choice(STREETS)}",
+                "shipping_city": city,
+                "shipping_state": state,
+                "shipping_postcode": postcode,
+                "shipping_country": "Australia",
+                "shipping_fee": totals["shipping_fee"],
+                "tax": totals["tax"],
+                "notes": None,
+                "created_at": created_at,
+            }
+
+    def _cart_rows(self, first_cart_id: int) -> Iterator[Dict[str, Any]]:
+        rng = self._rng("carts")
+        config = self.config
+        products = ZipfSampler(config.products, config.popularity_skew, self.first_product_id, self._rng("product-popularity"))
+        cart_id = first_cart_id
+        for user_offset in rng.sample(range(config.users), min(config.carts, config.users)):
+            seen = set()
+            for _ in range(rng.randint(1, 6)):
+                product_id = products.sample(rng)
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                yield {
+                    "id": cart_id,
+                    "user_id": self.first_user_id + user_offset,
+                    "product_id": product_id,
+                    "quantity": rng.randint(1, 3),
+                    "created_at": config.end_date - timedelta(seconds=rng.randrange(7 * 86400)),
+                }
+                cart_id += 1
+
+    def _write_orders(self) -> None:
+        orders_table, items_table = Order.__table__, OrderItem.__table__
+        first_order_id, first_item_id = self._next_id(orders_table), self._next_id(items_table)
+        item_rows: List[Dict[str, Any]] = []
+        orders = self._order_rows(first_order_id, first_item_id, item_rows)
+        started = time.perf_counter()
+        order_count = item_count = 0
+        # 订单和订单项交替按批写入，内存中最多保留一批
+        for batch in _batches(orders, self.config.batch_size):
+            with self.engine.begin() as conn:
+                self.writer.prepare(conn)
+                self.writer.write_batch(conn, orders_table, batch)
+                self.writer.write_batch(conn, items_table, item_rows)
+            order_count += len(batch)
+            item_count += len(item_rows)
+            item_rows.clear()
+            if order_count % (self.config.batch_size * 10) == 0:
+                logger.info("orders: %d orders, %d items", order_count, item_count)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "orders: %d orders and %d items in %.1fs (%.0f rows/s)",
+            order_count, item_count, elapsed, (order_count + item_count) / elapsed if elapsed else 0,
+        )
+
+    def run(self) -> None:
+        config = self.config
+        category_ids = self.ensure_categories()
+        self.first_product_id = self._next_id(Product.__table__)
+        self.first_user_id = self._next_id(User.__table__)
+        self.writer.write(Product.__table__, self._product_rows(category_ids), "products")
+        self.writer.write(User.__table__, self._user_rows(), "users")
+        if config.orders and config.users and config.products:
+            self._write_orders()
+        if config.carts and config.users and config.products:
+            self.writer.write(CartItem.__table__, self._cart_rows(self._next_id(CartItem.__table__)), "cart_items")
+        self.writer.reset_sequences([Product.__table__, User.__table__, Order.__table__, OrderItem.__table__, CartItem.__table__])
+        if self.engine.dialect.name == "postgresql":
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("ANALYZE")
@@ -1,4 +1,8 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
@@ -6,14 +10,76 @@ import os
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.core.admission import AdmissionControlMiddleware
+from app.core.idempotency import IdempotencyMiddleware, idempotency_store
+from app.core.metrics import MetricsMiddleware, multiprocess_store, register_routes, render_metrics
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.tracing import TracingMiddleware, instrument_serialization
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.storefront_cache import storefront_cache
+
+logger = logging.getLogger(__name__)
+
+
+def initialize_database() -> None:
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        init_db(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 导入模块时不做数据库和文件系统操作，所有启动副作用都在这里执行
+    if settings.INIT_DB_ON_STARTUP:
+        await run_in_threadpool(initialize_database)
+    register_routes(app.router.routes)
+    if multiprocess_store:
+        multiprocess_store.start()
+    storefront_cache.start()
+    catalog_snapshot.start()
+    idempotency_store.start()
+    yield
+    storefront_cache.stop()
+    catalog_snapshot.stop()
+    idempotency_store.stop()
+    if multiprocess_store:
+        multiprocess_store.stop()
+        multiprocess_store.flush()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Australian Pet Store API",
     version="1.0.0",
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
+# Idempotency-Key support for order and cart writes (inside CORS so replays keep CORS headers)
+app.add_middleware(IdempotencyMiddleware)
+
+# Shed low-priority traffic with 503 while the database is saturated
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Rate limiting runs before idempotency, routing and DB access so rejections stay cheap
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
+# Metrics wrap everything below so rejected (429/503) requests are counted too
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Sampled request tracing (spans for dependencies, SQL, image processing and serialization)
+if settings.TRACING_ENABLED:
+    instrument_serialization()
+    app.add_middleware(TracingMiddleware)
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,15 +112,19 @@ class CORSStaticFiles(StarletteStaticFiles):
         await super().__call__(scope, receive, send_wrapper)
 
 static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "static"))
-print(f"Looking for static files at: {static_dir}")
-print(f"Directory exists: {os.path.exists(static_dir)}")
-if os.path.exists(static_dir):
+if os.path.isdir(static_dir):
     app.mount("/static", CORSStaticFiles(directory=static_dir), name="static")
-    print("Static files mounted successfully with CORS support")
+else:
+    logger.warning("Static directory %s not found, /static is not mounted", static_dir)
+
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Australian Pet Store API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
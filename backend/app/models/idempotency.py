@@ -0,0 +1,28 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Text, UniqueConstraint
+
+from app.db.session import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("scope", "key", name="uq_idempotency_keys_scope_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 键的作用域（按用户隔离），例如 user:42
+    scope = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    method = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    # in_progress / completed
+    status = Column(String, nullable=False, default="in_progress")
+    response_status = Column(Integer)
+    response_content_type = Column(String)
+    # 完整的响应头（JSON数组 [[名称, 值], ...]，不含 Content-Length），重放时原样返回
+    response_headers = Column(Text)
+    response_body = Column(LargeBinary)
+    # 均为UTC时间；处理中的记录过期表示原请求已中断，可被重新认领
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Text, DateTime, Enum
+from sqlalchemy import Boolean, Column, Float, ForeignKey, Index, Integer, String, Text, DateTime, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -23,6 +23,10 @@ class PaymentMethod(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # 用户的订单列表按创建时间倒序分页
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -39,7 +43,8 @@ class Order(Base):
     shipping_fee = Column(Float, default=0)
     tax = Column(Float, default=0)
     notes = Column(Text)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 管理员的订单列表按创建时间倒序分页
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # 关系
@@ -51,7 +56,7 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, default=1)
     unit_price = Column(Float, nullable=False)
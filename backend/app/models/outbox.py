@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.db.session import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    # JSON格式的事件内容
+    payload = Column(Text, nullable=False)
+    # pending / processing / done / failed
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    # JSON格式的已成功执行的处理函数名称列表，重试时跳过
+    completed_handlers = Column(Text)
+    # 均为UTC时间
+    created_at = Column(DateTime, nullable=False)
+    # 下次重试时间；processing 状态下是领取的过期时间
+    next_attempt_at = Column(DateTime, nullable=False, index=True)
+    processed_at = Column(DateTime)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, Text, DateTime
+from sqlalchemy import DDL, Boolean, Column, Float, ForeignKey, Index, Integer, String, Text, DateTime, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -23,6 +23,12 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # 模糊搜索使用的三元组索引（只在 PostgreSQL 上创建，需要 pg_trgm 扩展）
+        Index(
+            "ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
@@ -44,8 +50,32 @@ class Product(Base):
     cart_items = relationship("CartItem", back_populates="product")
 
 
+# 商品列表只查询上架商品，按分类筛选、按ID分页或再加价格区间，下架商品不进入这些部分索引
+Index(
+    "ix_products_active_category_id", Product.category_id, Product.id,
+    postgresql_where=Product.is_active == True, sqlite_where=Product.is_active == True,
+)
+Index(
+    "ix_products_active_category_price", Product.category_id, Product.price,
+    postgresql_where=Product.is_active == True, sqlite_where=Product.is_active == True,
+)
+Index(
+    "ix_products_active_price", Product.price, Product.id,
+    postgresql_where=Product.is_active == True, sqlite_where=Product.is_active == True,
+)
+
+event.listen(
+    Product.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # 每个用户每种商品一行，同时用于按用户查询购物车
+        Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
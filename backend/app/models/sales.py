@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Date, Float, Integer
+
+from app.db.session import Base
+
+# 销售汇总表：下单、取消和修改订单状态时在同一个事务中增量更新，按订单创建日期（UTC）汇总，
+# 不包含已取消的订单。后台报表只读这些表，不扫描订单历史。
+# 每天一行的汇总会被所有订单同时更新，按订单ID分成多行（shard）避免行锁竞争，读取时求和。
+
+
+class SalesDaily(Base):
+    """每日汇总"""
+
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    # 订单总金额（含运费和税）
+    revenue = Column(Float, nullable=False, default=0)
+    cancelled_orders = Column(Integer, nullable=False, default=0)
+
+
+class SalesDailyCategory(Base):
+    """每日按分类汇总（商品的当前分类，0 表示没有分类）"""
+
+    __tablename__ = "sales_daily_category"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    # 包含该分类商品的订单数
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    # 订单项金额（不含运费和税）
+    revenue = Column(Float, nullable=False, default=0)
+
+
+class SalesDailyProduct(Base):
+    """每日按商品汇总"""
+
+    __tablename__ = "sales_daily_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
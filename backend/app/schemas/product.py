@@ -133,4 +133,64 @@ class CartItem(CartItemInDBBase):
 
 # 返回给API的购物车项目属性（包含产品信息）
 class CartItemWithProduct(CartItem):
-    product: Product 
\ No newline at end of file
+    product: Product 
+
+# 批量更新购物车时的单个商品（数量为最终数量，不是增量）
+class CartItemUpsert(BaseModel):
+    product_id: int
+    quantity: int = Field(ge=1)
+
+
+# 批量更新购物车
+class CartBulkUpdate(BaseModel):
+    upserts: List[CartItemUpsert] = []
+    # 要移除的商品ID
+    deletes: List[int] = []
+
+
+# 购物车金额（由服务端统一计算）
+class CartTotals(BaseModel):
+    subtotal: float
+    shipping_fee: float
+    tax: float
+    total: float
+
+
+# 返回给API的购物车（包含商品和金额）
+class CartWithTotals(CartTotals):
+    items: List[CartItemWithProduct]
+
+
+# 商品筛选分面：品牌计数
+class BrandFacet(BaseModel):
+    brand: str
+    count: int
+
+
+# 商品筛选分面：分类计数
+class CategoryFacet(BaseModel):
+    category_id: int
+    name: Optional[str] = None
+    count: int
+
+
+# 商品筛选分面：价格区间计数（max 为空表示没有上限）
+class PriceBucketFacet(BaseModel):
+    min: float
+    max: Optional[float] = None
+    count: int
+
+
+# 商品列表的分面计数（每个维度的计数不应用该维度自身的筛选条件）
+class ProductFacets(BaseModel):
+    total: int
+    brands: List[BrandFacet]
+    categories: List[CategoryFacet]
+    prices: List[PriceBucketFacet]
+
+
+# 搜索建议：kind 为 product / brand / category，id 为商品或分类ID（品牌没有ID）
+class ProductSuggestion(BaseModel):
+    text: str
+    kind: str
+    id: Optional[int] = None
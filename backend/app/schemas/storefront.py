@@ -0,0 +1,17 @@
+from typing import List
+from datetime import datetime
+from pydantic import BaseModel
+
+from app.schemas.product import Category, ProductWithCategory
+
+
+# 首页分类区块（分类 + 该分类下的热门商品）
+class StorefrontCategory(Category):
+    products: List[ProductWithCategory] = []
+
+
+# 首页聚合数据
+class StorefrontHome(BaseModel):
+    categories: List[StorefrontCategory]
+    featured: List[ProductWithCategory]
+    generated_at: datetime
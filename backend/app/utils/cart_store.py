@@ -0,0 +1,311 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.product import CartItem, Product
+
+
+class CartLine:
+    """购物车中的一行（与存储后端无关）"""
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        product_id: int,
+        quantity: int,
+        created_at: datetime,
+        updated_at: Optional[datetime] = None,
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.product_id = product_id
+        self.quantity = quantity
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.product: Optional[Product] = None
+
+
+class CartStore:
+    """
+    购物车存储接口
+
+    item_id 由各实现自行定义：SQL实现为 cart_items.id，键值实现为商品ID。
+    """
+
+    def get_items(self, db: Session, user_id: int) -> List[CartLine]:
+        raise NotImplementedError
+
+    def get_item(self, db: Session, user_id: int, item_id: int) -> Optional[CartLine]:
+        raise NotImplementedError
+
+    def apply(self, db: Session, user_id: int, upserts: Dict[int, int], deletes: Iterable[int] = ()) -> None:
+        """批量设置商品数量并移除商品（按商品ID）"""
+        raise NotImplementedError
+
+    def clear(self, db: Session, user_id: int) -> None:
+        raise NotImplementedError
+
+    def checkout(self, db: Session, user_id: int) -> None:
+        """下单时调用，订单事务提交成功后购物车才会被清空"""
+        raise NotImplementedError
+
+    def get_item_by_product(self, db: Session, user_id: int, product_id: int) -> Optional[CartLine]:
+        for line in self.get_items(db, user_id):
+            if line.product_id == product_id:
+                return line
+        return None
+
+    def set_quantity(self, db: Session, user_id: int, product_id: int, quantity: int) -> CartLine:
+        self.apply(db, user_id, {product_id: quantity})
+        return self.get_item_by_product(db, user_id, product_id)
+
+    def remove(self, db: Session, user_id: int, product_id: int) -> None:
+        self.apply(db, user_id, {}, [product_id])
+
+
+class SQLCartStore(CartStore):
+    """使用 cart_items 表的实现"""
+
+    @staticmethod
+    def _to_line(item: CartItem) -> CartLine:
+        return CartLine(item.id, item.user_id, item.product_id, item.quantity, item.created_at, item.updated_at)
+
+    def get_items(self, db: Session, user_id: int) -> List[CartLine]:
+        items = db.query(CartItem).filter(CartItem.user_id == user_id).order_by(CartItem.id).all()
+        return [self._to_line(item) for item in items]
+
+    def get_item(self, db: Session, user_id: int, item_id: int) -> Optional[CartLine]:
+        item = db.query(CartItem).filter(
+            CartItem.id == item_id,
+            CartItem.user_id == user_id
+        ).first()
+        return self._to_line(item) if item else None
+
+    def get_item_by_product(self, db: Session, user_id: int, product_id: int) -> Optional[CartLine]:
+        item = db.query(CartItem).filter(
+            CartItem.user_id == user_id,
+            CartItem.product_id == product_id
+        ).first()
+        return self._to_line(item) if item else None
+
+    def apply(self, db: Session, user_id: int, upserts: Dict[int, int], deletes: Iterable[int] = ()) -> None:
+        deletes = list(deletes)
+        for attempt in range(2):
+            existing_items = {
+                item.product_id: item
+                for item in db.query(CartItem).filter(CartItem.user_id == user_id).all()
+            }
+            for product_id, quantity in upserts.items():
+                item = existing_items.get(product_id)
+                if item:
+                    item.quantity = quantity
+                else:
+                    db.add(CartItem(user_id=user_id, product_id=product_id, quantity=quantity))
+            for product_id in deletes:
+                item = existing_items.get(product_id)
+                if item:
+                    db.delete(item)
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                # 并发请求先插入了同一商品（user_id, product_id 唯一），重新读取后改为更新
+                db.rollback()
+                if attempt:
+                    raise
+
+    def clear(self, db: Session, user_id: int) -> None:
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+        db.commit()
+
+    def checkout(self, db: Session, user_id: int) -> None:
+        # 与订单在同一个事务中删除，由调用方提交
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+
+
+class MemoryKVClient:
+    """进程内的键值存储，实现购物车用到的Redis哈希命令子集（单节点部署使用）"""
+
+    # 过期的键在访问时删除；没有再访问的键按这个间隔（秒）统一清理
+    PURGE_INTERVAL = 60
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, str]] = {}
+        # 键 -> 过期时间（time.monotonic()）
+        self._expires: Dict[str, float] = {}
+        self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+        self._lock = threading.RLock()
+
+    def _live(self, key: str) -> Optional[Dict[str, str]]:
+        """返回未过期的哈希（调用方持有锁）"""
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + self.PURGE_INTERVAL
+            for expired in [k for k, deadline in self._expires.items() if deadline <= now]:
+                self._data.pop(expired, None)
+                del self._expires[expired]
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= now:
+            self._data.pop(key, None)
+            del self._expires[key]
+        return self._data.get(key)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._live(key) or {})
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        with self._lock:
+            return (self._live(key) or {}).get(field)
+
+    def hset(self, key: str, mapping: Dict[str, str]) -> None:
+        with self._lock:
+            if self._live(key) is None:
+                self._data[key] = {}
+            self._data[key].update(mapping)
+
+    def hdel(self, key: str, *fields: str) -> None:
+        with self._lock:
+            values = self._live(key)
+            if values is None:
+                return
+            for field in fields:
+                values.pop(field, None)
+            if not values:
+                self.delete(key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def expire(self, key: str, seconds: float) -> None:
+        with self._lock:
+            if self._live(key) is not None:
+                self._expires[key] = time.monotonic() + seconds
+
+    def ttl(self, key: str) -> float:
+        """剩余秒数；键不存在时返回-2，没有过期时间时返回-1（与Redis相同）"""
+        with self._lock:
+            if self._live(key) is None:
+                return -2
+            deadline = self._expires.get(key)
+            return deadline - time.monotonic() if deadline is not None else -1
+
+    def transaction(self, func, *watches) -> None:
+        """与 redis.Redis.transaction 相同的调用方式：在存储的锁内执行，读取和写入之间不会有其他修改"""
+        with self._lock:
+            func(_MemoryPipeline(self))
+
+
+class _MemoryPipeline:
+    """MemoryKVClient.transaction 中的管道：命令直接执行，multi() 不做任何事"""
+
+    def __init__(self, client: MemoryKVClient):
+        self._client = client
+
+    def multi(self) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class KeyValueCartStore(CartStore):
+    """
+    基于键值存储的实现：每个用户一个哈希 cart:{user_id}，字段为商品ID。
+
+    购物车不写入数据库，下单时订单项是唯一落库的记录。
+    """
+
+    def __init__(self, client, ttl_seconds: int = 30 * 24 * 3600, key_prefix: str = "cart:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def _to_line(self, user_id: int, product_id, value) -> CartLine:
+        data = json.loads(self._decode(value))
+        product_id = int(self._decode(product_id))
+        return CartLine(
+            id=product_id,
+            user_id=user_id,
+            product_id=product_id,
+            quantity=data["q"],
+            created_at=datetime.fromtimestamp(data["c"], timezone.utc),
+            updated_at=datetime.fromtimestamp(data["u"], timezone.utc) if data.get("u") else None,
+        )
+
+    def get_items(self, db: Session, user_id: int) -> List[CartLine]:
+        values = self.client.hgetall(self._key(user_id))
+        lines = [self._to_line(user_id, field, value) for field, value in values.items()]
+        lines.sort(key=lambda line: line.created_at)
+        return lines
+
+    def get_item(self, db: Session, user_id: int, item_id: int) -> Optional[CartLine]:
+        value = self.client.hget(self._key(user_id), str(item_id))
+        return self._to_line(user_id, item_id, value) if value is not None else None
+
+    def get_item_by_product(self, db: Session, user_id: int, product_id: int) -> Optional[CartLine]:
+        return self.get_item(db, user_id, product_id)
+
+    def apply(self, db: Session, user_id: int, upserts: Dict[int, int], deletes: Iterable[int] = ()) -> None:
+        key = self._key(user_id)
+        deletes = [str(product_id) for product_id in deletes]
+
+        def update(pipe) -> None:
+            # WATCH 之后读取已有商品的加入时间，MULTI 之后的写入在键被其他请求修改时整体放弃并重新执行
+            existing = pipe.hgetall(key) if upserts else {}
+            now = time.time()
+            mapping = {}
+            for product_id, quantity in upserts.items():
+                field = str(product_id)
+                current = existing.get(field, existing.get(field.encode("utf-8")))
+                created = json.loads(self._decode(current))["c"] if current is not None else now
+                mapping[field] = json.dumps({"q": quantity, "c": created, "u": now if current is not None else None})
+            pipe.multi()
+            if deletes:
+                pipe.hdel(key, *deletes)
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+                pipe.expire(key, self.ttl_seconds)
+
+        self.client.transaction(update, key)
+
+    def clear(self, db: Session, user_id: int) -> None:
+        self.client.delete(self._key(user_id))
+
+    def checkout(self, db: Session, user_id: int) -> None:
+        # 订单事务提交成功后再清空，失败时购物车保持不变
+        event.listen(db, "after_commit", lambda session: self.clear(session, user_id), once=True)
+
+
+def create_cart_store(backend: str) -> CartStore:
+    """根据配置创建购物车存储"""
+    if backend == "sql":
+        return SQLCartStore()
+    if backend == "memory":
+        return KeyValueCartStore(MemoryKVClient(), ttl_seconds=settings.CART_TTL_SECONDS)
+    if backend == "redis":
+        # 仅在使用Redis后端时才需要安装redis包
+        import redis
+        return KeyValueCartStore(redis.Redis.from_url(settings.REDIS_URL), ttl_seconds=settings.CART_TTL_SECONDS)
+    raise ValueError(f"Unknown cart store backend: {backend}")
+
+
+# 全局购物车存储实例
+cart_store = create_cart_store(settings.CART_STORE_BACKEND)
@@ -0,0 +1,224 @@
+import threading
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class ProductSort(str, Enum):
+    """商品列表排序方式，并列时按商品ID"""
+
+    id = "id"
+    price_asc = "price_asc"
+    price_desc = "price_desc"
+    newest = "newest"
+    best_selling = "best_selling"
+
+
+# 索引使用的列（brand 为字典编码，-1 表示没有品牌）
+INDEX_COLUMNS = ("id", "price", "category_id", "stock", "is_active", "created_at", "units_sold", "brand")
+
+
+def format_facets(counts: dict, category_names: Dict[int, str], price_edges: List[float]) -> dict:
+    """把计数整理成 ProductFacets 的结构，按数量从多到少排列"""
+    return {
+        "total": counts["total"],
+        "brands": [
+            {"brand": brand, "count": count}
+            for brand, count in sorted(counts["brands"].items(), key=lambda item: (-item[1], item[0]))
+        ],
+        "categories": [
+            {"category_id": category_id, "name": category_names.get(category_id), "count": count}
+            for category_id, count in sorted(counts["categories"].items(), key=lambda item: (-item[1], item[0]))
+            if category_id
+        ],
+        "prices": [
+            {"min": edge, "max": price_edges[i + 1] if i + 1 < len(price_edges) else None, "count": count}
+            for i, (edge, count) in enumerate(zip(price_edges, counts["prices"]))
+        ],
+    }
+
+
+def sort_orders(columns: Dict[str, np.ndarray]) -> Dict[ProductSort, np.ndarray]:
+    """计算每种排序的行号排列（np.lexsort 以最后一个键为主键）"""
+    ids = columns["id"]
+    return {
+        ProductSort.id: np.argsort(ids, kind="stable").astype(np.int32),
+        ProductSort.price_asc: np.lexsort((ids, columns["price"])).astype(np.int32),
+        ProductSort.price_desc: np.lexsort((ids, -columns["price"])).astype(np.int32),
+        ProductSort.newest: np.lexsort((-ids, -columns["created_at"])).astype(np.int32),
+        ProductSort.best_selling: np.lexsort((ids, -columns["units_sold"])).astype(np.int32),
+    }
+
+
+class CatalogIndex:
+    """
+    商品列表的列式索引
+
+    筛选条件组合成布尔掩码，排序使用预先计算好的行号排列，
+    一次查询是 order[mask[order]]，不需要逐行比较或每次排序。
+    列和排列可以直接引用快照文件的内存映射；商品写入后第一次修改某列时才复制该列。
+    """
+
+    # 分页查询时第一次检查的行数
+    FIRST_CHUNK = 4096
+
+    def __init__(self, columns: Dict[str, np.ndarray], brands: List[str], orders: Dict[ProductSort, np.ndarray] = None):
+        self._columns = columns
+        self._brands = list(brands)
+        self._brand_codes = {brand: code for code, brand in enumerate(self._brands)}
+        self._orders = orders if orders is not None else sort_orders(columns)
+        self._lock = threading.Lock()
+        # 每次修改加一，用作查询结果缓存键的一部分
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._columns["id"])
+
+    def column(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def query(
+        self,
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        brand: Optional[str] = None,
+        sort: ProductSort = ProductSort.id,
+        mask: Optional[np.ndarray] = None,
+        stop: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        返回满足条件的行号，按指定方式排序（mask 为调用方计算的其他条件）
+
+        指定 stop 时只保证返回前 stop 个结果：按排序顺序分块检查，块大小逐次加倍，
+        分页靠前且条件不严格时只需要读取很少的行。
+        """
+        columns, orders = self._columns, self._orders
+        brand_code = None
+        if brand is not None:
+            brand_code = self._brand_codes.get(brand)
+            if brand_code is None:
+                return np.empty(0, dtype=np.int32)
+
+        def matches(positions) -> np.ndarray:
+            result = columns["is_active"][positions] != 0
+            if mask is not None:
+                result &= mask[positions]
+            if category_id:
+                result &= columns["category_id"][positions] == category_id
+            if min_price is not None:
+                result &= columns["price"][positions] >= min_price
+            if max_price is not None:
+                result &= columns["price"][positions] <= max_price
+            if in_stock:
+                result &= columns["stock"][positions] > 0
+            if brand_code is not None:
+                result &= columns["brand"][positions] == brand_code
+            return result
+
+        order = orders[sort]
+        if stop is None:
+            return order[matches(slice(None))[order]]
+
+        parts, found, start, size = [], 0, 0, self.FIRST_CHUNK
+        while start < len(order) and found < stop:
+            chunk = order[start:start + size]
+            hits = chunk[matches(chunk)]
+            parts.append(hits)
+            found += len(hits)
+            start += size
+            size *= 2
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+
+    def facets(
+        self,
+        price_edges: List[float],
+        category_id: Optional[int] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        brand: Optional[str] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> dict:
+        """
+        品牌、分类、价格区间的计数
+
+        每个维度的计数应用其他维度的筛选条件但不应用自身的条件，
+        这样选中一个品牌后仍能看到其他品牌各有多少商品。
+        """
+        columns = self._columns
+        base = columns["is_active"] != 0
+        if mask is not None:
+            base &= mask
+        if in_stock:
+            base &= columns["stock"] > 0
+
+        brand_match = category_match = price_match = None
+        if brand is not None:
+            code = self._brand_codes.get(brand, -2)
+            brand_match = columns["brand"] == code
+        if category_id:
+            category_match = columns["category_id"] == category_id
+        if min_price is not None or max_price is not None:
+            prices = columns["price"]
+            price_match = np.ones(len(prices), dtype=bool)
+            if min_price is not None:
+                price_match &= prices >= min_price
+            if max_price is not None:
+                price_match &= prices <= max_price
+
+        def combine(*masks):
+            result = base.copy()
+            for other in masks:
+                if other is not None:
+                    result &= other
+            return result
+
+        # 品牌编码从 -1（没有品牌）开始，整体加一后用 bincount 一次计数
+        brand_counts = np.bincount(columns["brand"][combine(category_match, price_match)] + 1, minlength=len(self._brands) + 1)
+        category_ids, category_counts = np.unique(
+            columns["category_id"][combine(brand_match, price_match)], return_counts=True,
+        )
+        buckets = np.searchsorted(price_edges, columns["price"][combine(brand_match, category_match)], side="right") - 1
+        bucket_counts = np.bincount(buckets[buckets >= 0], minlength=len(price_edges))
+        return {
+            "total": int(np.count_nonzero(combine(brand_match, category_match, price_match))),
+            "brands": {self._brands[code]: int(count) for code, count in enumerate(brand_counts[1:]) if count},
+            "categories": {int(category): int(count) for category, count in zip(category_ids, category_counts)},
+            "prices": [int(count) for count in bucket_counts],
+        }
+
+    def _encode_brand(self, brand: Optional[str]) -> int:
+        if brand is None:
+            return -1
+        code = self._brand_codes.get(brand)
+        if code is None:
+            code = len(self._brands)
+            self._brands.append(brand)
+            self._brand_codes[brand] = code
+        return code
+
+    def update(self, position: int, values: Dict[str, Any]) -> None:
+        """修改一行（position 等于当前行数时追加），values 为 INDEX_COLUMNS 中的部分列"""
+        with self._lock:
+            values = dict(values)
+            if "brand" in values:
+                values["brand"] = self._encode_brand(values["brand"])
+            columns = dict(self._columns)
+            if position == len(self):
+                for name, column in columns.items():
+                    columns[name] = np.append(column, np.array([values.get(name) or 0], dtype=column.dtype))
+            else:
+                for name, value in values.items():
+                    column = columns[name]
+                    if not column.flags.writeable:
+                        column = column.copy()
+                    column[position] = value or 0
+                    columns[name] = column
+            self._columns = columns
+            self.generation += 1
+            # 只有影响排序的列变化时才重新计算排列
+            if position == len(self._orders[ProductSort.id]) or {"price", "created_at", "units_sold"} & set(values):
+                self._orders = sort_orders(columns)
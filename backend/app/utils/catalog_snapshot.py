@@ -0,0 +1,678 @@
+import bisect
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.metrics import cache_requests_total
+from app.db.session import SessionLocal
+from app.models.order import OrderItem
+from app.models.product import Category, Product
+from app.utils.catalog_index import INDEX_COLUMNS, CatalogIndex, ProductSort, format_facets, sort_orders
+from app.utils.suggest_index import SuggestIndex, build_suggestions, normalize_text
+from app.utils.trigram_index import TrigramIndex, build_trigram_arrays
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有跨进程文件锁，各进程可能各自重建一次
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+snapshot_hits = cache_requests_total.labels("catalog_snapshot", "hit")
+snapshot_misses = cache_requests_total.labels("catalog_snapshot", "miss")
+
+MAGIC = b"PCATSNAP"
+FORMAT_VERSION = 4
+EPOCH = datetime(1970, 1, 1)
+
+# 列名 -> 类型（array 类型码，"str" 为变长UTF-8字符串，"datetime" 为微秒时间戳，
+# "dict" 为字典编码的字符串：int32 编码加上头部中的取值列表）
+PRODUCT_COLUMNS = {
+    "id": "q",
+    "price": "d",
+    "stock": "q",
+    "is_active": "b",
+    "category_id": "q",
+    "weight": "d",
+    "created_at": "datetime",
+    "updated_at": "datetime",
+    "name": "str",
+    "description": "str",
+    "image": "str",
+    "brand": "dict",
+    "dimensions": "str",
+    "units_sold": "q",
+}
+CATEGORY_COLUMNS = {
+    "id": "q",
+    "is_active": "b",
+    "created_at": "datetime",
+    "updated_at": "datetime",
+    "name": "str",
+    "slug": "str",
+    "description": "str",
+    "image": "str",
+}
+# 搜索建议词表，按 build_suggestions 的顺序排列（ref 为商品或分类ID）
+SUGGESTION_COLUMNS = {
+    "kind": "dict",
+    "text": "str",
+    "ref": "q",
+    "score": "q",
+}
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class _SnapshotWriter:
+    """按列写入：定长列为原始数组，字符串列为偏移数组加数据区，每列另有一个空值数组"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+        # 最近一张表的定长列，用于计算排序排列
+        self.arrays: Dict[str, np.ndarray] = {}
+
+    def _append(self, data: bytes) -> int:
+        # 各段按8字节对齐，读取时可以直接 cast 成对应类型
+        padding = -self.size % 8
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return offset
+
+    def _append_array(self, name: str, values: array) -> int:
+        self.arrays[name] = np.frombuffer(values, dtype=values.typecode)
+        return self._append(values.tobytes())
+
+    def add_table(self, columns: Dict[str, str], rows: List[tuple]) -> dict:
+        table = {"rows": len(rows), "columns": {}}
+        self.arrays = {}
+        for index, (name, kind) in enumerate(columns.items()):
+            values = [row[index] for row in rows]
+            nulls = bytes(value is None for value in values)
+            column = {"type": kind, "nulls": self._append(nulls)}
+            if kind == "str":
+                encoded = [(value or "").encode("utf-8") for value in values]
+                offsets = array("Q", [0])
+                for item in encoded:
+                    offsets.append(offsets[-1] + len(item))
+                column["offsets"] = self._append(offsets.tobytes())
+                column["data"] = self._append(b"".join(encoded))
+            elif kind == "datetime":
+                present = next((value for value in values if value is not None), None)
+                column["aware"] = bool(present is not None and present.tzinfo is not None)
+                column["values"] = self._append_array(
+                    name, array("q", (_to_micros(value) if value is not None else 0 for value in values))
+                )
+            elif kind == "dict":
+                column["dictionary"] = sorted({value for value in values if value is not None})
+                codes = {value: code for code, value in enumerate(column["dictionary"])}
+                column["values"] = self._append_array(
+                    name, array("i", (codes[value] if value is not None else -1 for value in values))
+                )
+            else:
+                column["values"] = self._append_array(
+                    name, array(kind, (value if value is not None else 0 for value in values))
+                )
+            table["columns"][name] = column
+        return table
+
+    def add_orders(self, table: dict) -> None:
+        """保存商品列表各排序方式的行号排列，worker 直接映射使用"""
+        orders = sort_orders(self.arrays)
+        table["orders"] = {sort.value: self._append(order.tobytes()) for sort, order in orders.items()}
+
+    def _add_arrays(self, arrays: Dict[str, np.ndarray]) -> dict:
+        return {
+            name: {"dtype": values.dtype.str, "count": len(values), "offset": self._append(values.tobytes())}
+            for name, values in arrays.items()
+        }
+
+    def add_suggestions(self, terms: list) -> dict:
+        """搜索建议词表和前缀索引的数组"""
+        terms, arrays = build_suggestions(terms)
+        table = self.add_table(SUGGESTION_COLUMNS, terms)
+        table["arrays"] = self._add_arrays(arrays)
+        return table
+
+    def add_trigrams(self, names: List[Optional[str]]) -> dict:
+        """商品名称的三元组倒排索引（行号与商品表相同）"""
+        return {"rows": 0, "columns": {}, "arrays": self._add_arrays(build_trigram_arrays(names))}
+
+
+def units_sold_subquery():
+    """每个商品的累计销量（商品ID、units_sold）"""
+    return select(
+        OrderItem.product_id, func.sum(OrderItem.quantity).label("units_sold")
+    ).group_by(OrderItem.product_id).subquery()
+
+
+def suggestion_terms(arrays: Dict[str, np.ndarray], brands: List[str], names: List[str], categories: List[Any]) -> list:
+    """
+    搜索建议词及热度（在售商品的销量加商品数）
+
+    arrays 为商品表的定长列，names 为对应行的商品名称。同名（忽略大小写）的商品合并成一个建议词，
+    以销量最高、其次ID最小的商品为代表；商品名称只保留热度最高的 PRODUCT_SUGGEST_MAX_TERMS 个，
+    索引大小不随商品数无限增长。
+    """
+    active = arrays["is_active"] != 0
+    units = arrays["units_sold"]
+    scores = np.where(active, units + 1, 0)
+    terms = []
+
+    brand_codes = arrays["brand"] + 1
+    brand_products = np.bincount(brand_codes, weights=active, minlength=len(brands) + 1)
+    brand_scores = np.bincount(brand_codes, weights=scores, minlength=len(brands) + 1)
+    for code, brand in enumerate(brands, start=1):
+        if brand_products[code]:
+            terms.append(("brand", brand, None, int(brand_scores[code])))
+
+    category_products = np.bincount(arrays["category_id"], weights=active)
+    category_scores = np.bincount(arrays["category_id"], weights=scores)
+    for category in categories:
+        if category.is_active and category.id < len(category_products) and category_products[category.id]:
+            terms.append(("category", category.name, category.id, int(category_scores[category.id])))
+
+    # 先按原始名称分组（每行一次字典查找），再只对不同的名称做规范化
+    ids = arrays["id"]
+    positions = np.lexsort((ids, -units))
+    positions = positions[active[positions]]
+    groups: Dict[str, int] = {}
+    group_ids = np.array([groups.setdefault(names[position] or "", len(groups)) for position in positions.tolist()], dtype=np.int64)
+    group_scores = np.bincount(group_ids, weights=scores[positions], minlength=len(groups))
+    # 分组编号按第一次出现的顺序分配，第一次出现的就是销量最高的商品
+    _, first = np.unique(group_ids, return_index=True)
+    products: Dict[str, list] = {}
+    for name, group, position in zip(groups, range(len(groups)), positions[first].tolist()):
+        lower = normalize_text(name)
+        if not lower:
+            continue
+        term = products.get(lower)
+        if term is None:
+            products[lower] = [name, int(ids[position]), int(group_scores[group]), lower]
+        else:
+            term[2] += int(group_scores[group])
+    top = sorted(products.values(), key=lambda term: (-term[2], term[3]))[:settings.PRODUCT_SUGGEST_MAX_TERMS]
+    terms.extend(("product", name, product_id, score) for name, product_id, score, _ in top)
+    return terms
+
+
+def write_snapshot(db, path: str) -> int:
+    """从数据库生成快照文件（先写临时文件再原子替换），返回快照版本号"""
+    version = time.time_ns()
+    units_sold = units_sold_subquery()
+    fields = {name: getattr(Product, name) for name in PRODUCT_COLUMNS if name != "units_sold"}
+    fields["units_sold"] = func.coalesce(units_sold.c.units_sold, 0)
+    products = db.execute(
+        select(*(fields[name] for name in PRODUCT_COLUMNS))
+        .outerjoin(units_sold, units_sold.c.product_id == Product.id)
+        .order_by(Product.id)
+    ).all()
+    categories = db.execute(
+        select(*(getattr(Category, name) for name in CATEGORY_COLUMNS)).order_by(Category.id)
+    ).all()
+
+    writer = _SnapshotWriter()
+    product_table = writer.add_table(PRODUCT_COLUMNS, products)
+    writer.add_orders(product_table)
+    names = [row.name for row in products]
+    terms = suggestion_terms(writer.arrays, product_table["columns"]["brand"]["dictionary"], names, categories)
+    directory = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "byteorder": sys.byteorder,
+        "tables": {
+            "products": product_table,
+            "categories": writer.add_table(CATEGORY_COLUMNS, categories),
+            "suggestions": writer.add_suggestions(terms),
+            "trigrams": writer.add_trigrams(names),
+        },
+    }
+    header = json.dumps(directory).encode("utf-8")
+    # 数据区偏移相对于头部之后、按8字节对齐的起始位置
+    prefix = MAGIC + len(header).to_bytes(8, "little") + header
+    prefix += b"\0" * (-len(prefix) % 8)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(prefix)
+        for chunk in writer.chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return version
+
+
+class _Table:
+    """只读列视图，直接引用映射的内存，不复制数据"""
+
+    def __init__(self, view: memoryview, base: int, spec: dict):
+        self.rows = spec["rows"]
+        self._view = view
+        self._base = base
+        self._columns = spec["columns"]
+        self._values = {}
+        self._nulls = {}
+        self._offsets = {}
+        for name, column in self._columns.items():
+            self._nulls[name] = self._slice(column["nulls"], self.rows)
+            if column["type"] == "str":
+                self._offsets[name] = self._slice(column["offsets"], (self.rows + 1) * 8).cast("Q")
+            else:
+                typecode = {"datetime": "q", "dict": "i"}.get(column["type"], column["type"])
+                itemsize = array(typecode).itemsize
+                self._values[name] = self._slice(column["values"], self.rows * itemsize).cast(typecode)
+        self.orders = {
+            ProductSort(sort): self._slice(offset, self.rows * 4).cast("i")
+            for sort, offset in spec.get("orders", {}).items()
+        }
+        self.arrays = {}
+        for name, spec_array in spec.get("arrays", {}).items():
+            dtype = np.dtype(spec_array["dtype"])
+            self.arrays[name] = np.frombuffer(self._slice(spec_array["offset"], spec_array["count"] * dtype.itemsize), dtype=dtype)
+
+    def _slice(self, offset: int, length: int) -> memoryview:
+        start = self._base + offset
+        return self._view[start:start + length]
+
+    def column(self, name: str) -> memoryview:
+        return self._values[name]
+
+    def dictionary(self, name: str) -> List[str]:
+        return self._columns[name]["dictionary"]
+
+    def strings(self, name: str):
+        """字符串列的偏移数组和数据区"""
+        offsets = self._offsets[name]
+        return offsets, self._slice(self._columns[name]["data"], offsets[self.rows])
+
+    def value(self, name: str, index: int) -> Any:
+        if self._nulls[name][index]:
+            return None
+        column = self._columns[name]
+        if column["type"] == "str":
+            offsets = self._offsets[name]
+            start = self._base + column["data"]
+            return str(self._view[start + offsets[index]:start + offsets[index + 1]], "utf-8")
+        value = self._values[name][index]
+        if column["type"] == "datetime":
+            value = EPOCH + timedelta(microseconds=value)
+            return value.replace(tzinfo=timezone.utc) if column["aware"] else value
+        if column["type"] == "dict":
+            return column["dictionary"][value]
+        if column["type"] == "b":
+            return bool(value)
+        return value
+
+    def row(self, index: int) -> dict:
+        return {name: self.value(name, index) for name in self._columns}
+
+
+class _SuggestionTerms:
+    """快照中的建议词表：按编号读取（类型, 文本, ID, 热度）"""
+
+    def __init__(self, table: _Table):
+        self._table = table
+
+    def __len__(self) -> int:
+        return self._table.rows
+
+    def __getitem__(self, index: int) -> tuple:
+        value = self._table.value
+        return value("kind", index), value("text", index), value("ref", index), value("score", index)
+
+
+class CatalogSnapshot:
+    """
+    内存映射的商品目录快照
+
+    文件内容不可变，多个 worker 进程映射同一个文件，共享操作系统页缓存中的同一份数据。
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header_size = int.from_bytes(view[len(MAGIC):len(MAGIC) + 8], "little")
+        header_start = len(MAGIC) + 8
+        directory = json.loads(bytes(view[header_start:header_start + header_size]))
+        if directory["format"] != FORMAT_VERSION or directory["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} has an unsupported snapshot format")
+        base = header_start + header_size
+        base += -base % 8
+
+        self.version: int = directory["version"]
+        self.products = _Table(view, base, directory["tables"]["products"])
+        categories = _Table(view, base, directory["tables"]["categories"])
+        # 分类很少，加载时直接转换成字典
+        self.categories = {row["id"]: row for row in map(categories.row, range(categories.rows))}
+        self._product_ids = self.products.column("id")
+
+        products = self.products
+        self.index = CatalogIndex(
+            {name: np.asarray(products.column(name)) for name in INDEX_COLUMNS},
+            brands=products.dictionary("brand"),
+            orders={sort: np.asarray(order) for sort, order in products.orders.items()},
+        )
+        suggestions = _Table(view, base, directory["tables"]["suggestions"])
+        self.suggestions = SuggestIndex(_SuggestionTerms(suggestions), **suggestions.arrays)
+        self.trigrams = TrigramIndex(**_Table(view, base, directory["tables"]["trigrams"]).arrays)
+        # 快照写入后本进程的商品修改：行号 -> 完整的商品字段；新增商品追加在最后
+        self._overrides: Dict[int, dict] = {}
+        self._appended: Dict[int, int] = {}
+        self._lower_names: Optional[bytes] = None
+        # 分面计数缓存：（索引修改次数, 规范化的筛选条件） -> 结果，随快照版本一起丢弃
+        self._facet_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._facet_lock = threading.Lock()
+        # 保护 _overrides/_appended 的读-改-写和索引更新：并发下单时不丢失库存变化，读取时复制一份再遍历
+        self._write_lock = threading.Lock()
+
+    def _position(self, product_id: int) -> Optional[int]:
+        index = bisect.bisect_left(self._product_ids, product_id)
+        if index < len(self._product_ids) and self._product_ids[index] == product_id:
+            return index
+        return self._appended.get(product_id)
+
+    def _row(self, position: int) -> dict:
+        override = self._overrides.get(position)
+        return dict(override) if override is not None else self.products.row(position)
+
+    def _override_items(self) -> List[tuple]:
+        with self._write_lock:
+            return list(self._overrides.items())
+
+    def _search_mask(self, search: str) -> np.ndarray:
+        """名称包含关键字（只忽略ASCII大小写，与 SQLite LIKE 相同）的行"""
+        needle = search.encode("utf-8").lower()
+        offsets, data = self.products.strings("name")
+        if self._lower_names is None:
+            self._lower_names = bytes(data).lower()
+        names = self._lower_names
+        hits = []
+        start = names.find(needle)
+        while start != -1:
+            hits.append(start)
+            start = names.find(needle, start + 1)
+        offsets = np.asarray(offsets)
+        hits = np.asarray(hits, dtype=np.int64)
+        rows = np.searchsorted(offsets, hits, side="right") - 1
+        # 跨越两个名称边界的匹配不算
+        rows = rows[hits + len(needle) <= offsets[rows + 1]]
+        mask = np.zeros(len(self.index), dtype=bool)
+        mask[rows] = True
+        for position, row in self._override_items():
+            mask[position] = needle in (row["name"] or "").encode("utf-8").lower()
+        return mask
+
+    def _product(self, position: int) -> dict:
+        product = self._row(position)
+        product["category"] = self.categories.get(product["category_id"])
+        return product
+
+    def get_product(self, product_id: int) -> Optional[dict]:
+        """按ID查找商品（包含分类），不存在时返回None"""
+        position = self._position(product_id)
+        return self._product(position) if position is not None else None
+
+    def list_products(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        category_id: Optional[int] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        brand: Optional[str] = None,
+        sort: ProductSort = ProductSort.id,
+    ) -> List[dict]:
+        """与商品列表接口相同的筛选条件和排序，分页返回"""
+        positions = self.index.query(
+            category_id=category_id, min_price=min_price, max_price=max_price,
+            in_stock=in_stock, brand=brand, sort=sort,
+            mask=self._search_mask(search) if search else None,
+            stop=max(skip, 0) + limit,
+        )
+        skip = max(skip, 0)
+        return [self._product(int(position)) for position in positions[skip:skip + limit]]
+
+    def search_products(self, query: str, skip: int = 0, limit: int = 20) -> List[dict]:
+        """按商品名称模糊搜索（三元组相似度），相似度从高到低分页返回"""
+        active = self.index.column("is_active") != 0
+        rows = self.products.rows
+        # 只有改名和新增的商品需要按当前名称单独计算，库存、上下架等修改不影响三元组索引
+        overrides = {
+            position: row["name"] if active[position] else None
+            for position, row in self._override_items()
+            if position >= rows or row["name"] != self.products.value("name", position)
+        }
+        positions = self.trigrams.search(
+            query, settings.PRODUCT_SEARCH_MIN_SIMILARITY, settings.PRODUCT_SEARCH_MAX_CANDIDATES,
+            active=active, overrides=overrides,
+        )
+        skip = max(skip, 0)
+        return [self._product(int(position)) for position in positions[skip:skip + limit]]
+
+    def facets(
+        self,
+        price_edges: List[float],
+        category_id: Optional[int] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: bool = False,
+        brand: Optional[str] = None,
+    ) -> dict:
+        """品牌、分类、价格区间计数（ProductFacets 结构），相同筛选条件的结果被缓存"""
+        key = (
+            self.index.generation, tuple(price_edges), category_id or None, search.lower() if search else None,
+            min_price, max_price, bool(in_stock), brand,
+        )
+        with self._facet_lock:
+            cached = self._facet_cache.get(key)
+            if cached is not None:
+                self._facet_cache.move_to_end(key)
+                return cached
+
+        counts = self.index.facets(
+            price_edges, category_id=category_id, min_price=min_price, max_price=max_price,
+            in_stock=in_stock, brand=brand, mask=self._search_mask(search) if search else None,
+        )
+        result = format_facets(counts, {cid: category["name"] for cid, category in self.categories.items()}, price_edges)
+        with self._facet_lock:
+            self._facet_cache[key] = result
+            while len(self._facet_cache) > settings.PRODUCT_FACET_CACHE_SIZE:
+                self._facet_cache.popitem(last=False)
+        return result
+
+    def apply_product(self, product: dict) -> None:
+        """本进程创建或修改商品后立即更新快照中的这一行（字段与 Product 模型相同）"""
+        with self._write_lock:
+            position = self._position(product["id"])
+            appended = position is None
+            if appended:
+                position = len(self.index)
+            old = None if appended else self._row(position)
+            units_sold = 0 if appended else old["units_sold"]
+            self._overrides[position] = dict(product, units_sold=units_sold)
+            created_at = product.get("created_at")
+            self.index.update(position, {
+                "id": product["id"],
+                "price": product["price"],
+                "category_id": product["category_id"],
+                "stock": product["stock"],
+                "is_active": product["is_active"],
+                "created_at": _to_micros(created_at) if created_at else 0,
+                "brand": product["brand"],
+            })
+            if appended:
+                self._appended[product["id"]] = position
+
+            if old is None or any(old[name] != product[name] for name in ("name", "brand", "is_active")):
+                active = product["is_active"]
+                self.suggestions.update_product(
+                    product["id"], product["name"] if active else None, product["brand"] if active else None, units_sold + 1,
+                )
+
+    def adjust_stock(self, deltas: Dict[int, int]) -> None:
+        """下单或取消订单后按变化量更新库存"""
+        with self._write_lock:
+            for product_id, delta in deltas.items():
+                position = self._position(product_id)
+                if position is None:
+                    continue
+                row = self._row(position)
+                row["stock"] = (row["stock"] or 0) + delta
+                self._overrides[position] = row
+                self.index.update(position, {"stock": row["stock"]})
+
+
+class CatalogSnapshotStore:
+    """
+    商品目录快照的加载和重建
+
+    后台线程定期检查快照文件，文件被替换后重新映射并原子切换到新版本；
+    快照过期或本进程修改了商品时重建。重建持有文件锁，多个 worker 同时只有一个写入。
+    商品库存随订单变化，快照中的库存最多滞后 refresh_seconds（下单时仍以数据库为准）。
+    """
+
+    def __init__(self, path: str, refresh_seconds: float = 60, check_seconds: float = 1, enabled: bool = True):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.check_seconds = check_seconds
+        self.enabled = enabled
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._dirty = threading.Event()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """当前快照，未启用或尚未加载时返回None（调用方回退到数据库查询）"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot_hits.inc()
+        elif self.enabled:
+            snapshot_misses.inc()
+        return snapshot
+
+    def invalidate(self) -> None:
+        """商品或分类变更后通知后台线程重建快照"""
+        if self.enabled:
+            self._dirty.set()
+            self._wakeup.set()
+
+    def apply_product(self, product: dict) -> None:
+        """商品写入后更新本进程的当前快照，并通知重建（其他进程在新快照写入后更新）"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot.apply_product(product)
+        self.invalidate()
+
+    def adjust_stock(self, deltas: Dict[int, int]) -> None:
+        """库存变化只更新本进程的当前快照，其他进程在下次定期重建后更新"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot.adjust_stock(deltas)
+
+    def reload(self) -> bool:
+        """快照文件被替换后加载新版本，返回是否切换"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        current = self._snapshot
+        if current is not None and current.file_id == (stat.st_ino, stat.st_mtime_ns):
+            return False
+        snapshot = CatalogSnapshot(self.path)
+        if current is None or snapshot.version > current.version:
+            self._snapshot = snapshot
+            logger.info("Loaded catalog snapshot %d (%d products)", snapshot.version, snapshot.products.rows)
+            return True
+        return False
+
+    def _is_stale(self) -> bool:
+        try:
+            return time.time() - os.stat(self.path).st_mtime > self.refresh_seconds
+        except FileNotFoundError:
+            return True
+
+    def rebuild(self, force: bool = False) -> bool:
+        """持有文件锁时重建快照；其他进程正在重建时直接返回False"""
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return False
+            # 等锁期间其他进程可能已经写好了新快照
+            if not force and not self._is_stale():
+                return False
+            db = SessionLocal()
+            try:
+                write_snapshot(db, self.path)
+            finally:
+                db.close()
+        self.reload()
+        return True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self._dirty.is_set():
+                    self._dirty.clear()
+                    if not self.rebuild(force=True):
+                        self._dirty.set()
+                elif self._is_stale():
+                    self.rebuild()
+                self.reload()
+            except Exception:
+                logger.exception("Failed to refresh catalog snapshot")
+            self._wakeup.wait(self.check_seconds)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """启动后台线程"""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+
+# 全局商品目录快照
+catalog_snapshot = CatalogSnapshotStore(
+    path=settings.CATALOG_SNAPSHOT_PATH,
+    refresh_seconds=settings.CATALOG_SNAPSHOT_REFRESH_SECONDS,
+    check_seconds=settings.CATALOG_SNAPSHOT_CHECK_SECONDS,
+    enabled=settings.CATALOG_SNAPSHOT_ENABLED,
+)
@@ -2,8 +2,11 @@ import os
 from typing import Optional
 from fastapi import HTTPException, UploadFile
 import uuid
-from PIL import Image
 import io
+import time
+
+from app.core.metrics import image_processing_seconds
+from app.core.tracing import tracer
 
 class ImageManager:
     def __init__(self, base_path: str = "static/images"):
@@ -11,9 +14,13 @@ class ImageManager:
         self.product_path = os.path.join(base_path, "products")
         self.allowed_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
         self.max_file_size = 5 * 1024 * 1024  # 5MB
-        
-        # 确保目录存在
-        os.makedirs(self.product_path, exist_ok=True)
+        self._directory_ready = False
+    
+    def ensure_directories(self) -> None:
+        """首次保存图片时才创建目录，导入模块时不访问文件系统"""
+        if not self._directory_ready:
+            os.makedirs(self.product_path, exist_ok=True)
+            self._directory_ready = True
     
     def get_image_url(self, image_filename: Optional[str], base_url: str = "http://localhost:8000") -> str:
         """获取图片的完整URL"""
@@ -48,26 +55,33 @@ class ImageManager:
         file_ext = os.path.splitext(file.filename.lower())[1] if file.filename else '.jpg'
         filename = f"{uuid.uuid4().hex}{file_ext}"
         file_path = os.path.join(self.product_path, filename)
+        self.ensure_directories()
         
         try:
+            # PIL只在处理上传图片时才导入，避免拖慢应用启动
+            from PIL import Image
+
             # 读取并处理图片
             content = await file.read()
             
             # 使用PIL处理图片（可选：调整大小、压缩等）
-            image = Image.open(io.BytesIO(content))
-            
-            # 转换为RGB（如果是RGBA）
-            if image.mode == 'RGBA':
-                background = Image.new('RGB', image.size, (255, 255, 255))
-                background.paste(image, mask=image.split()[-1])
-                image = background
-            
-            # 限制图片尺寸
-            max_size = (800, 600)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # 保存图片
-            image.save(file_path, format='JPEG', quality=85, optimize=True)
+            started = time.perf_counter()
+            with tracer.span("image.process", attributes={"image.bytes": len(content)}):
+                image = Image.open(io.BytesIO(content))
+                
+                # 转换为RGB（如果是RGBA）
+                if image.mode == 'RGBA':
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    background.paste(image, mask=image.split()[-1])
+                    image = background
+                
+                # 限制图片尺寸
+                max_size = (800, 600)
+                image.thumbnail(max_size, Image.Resampling.LANCZOS)
+                
+                # 保存图片
+                image.save(file_path, format='JPEG', quality=85, optimize=True)
+            image_processing_seconds.labels("product_upload").observe(time.perf_counter() - started)
             
             return filename
             
@@ -81,8 +95,9 @@ class ImageManager:
         
         file_path = os.path.join(self.product_path, filename)
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            with tracer.span("image.delete"):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
             return True
         except Exception:
             return False
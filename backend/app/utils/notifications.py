@@ -0,0 +1,324 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+from string import Template
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 邮件模板：名称 -> (主题, 正文)，使用 $变量 占位
+TEMPLATES: Dict[str, Tuple[str, str]] = {
+    "order_confirmation": (
+        "Order confirmation $order_number",
+        "Hi $name,\n\n"
+        "Thank you for shopping at $store_name. We have received your order $order_number.\n\n"
+        "Total: $$$total_amount\n\n"
+        "We will let you know when it ships.\n",
+    ),
+    "order_status": (
+        "Order $order_number is now $status",
+        "Hi $name,\n\n"
+        "Your $store_name order $order_number status changed to $status.\n",
+    ),
+}
+
+
+class Notification:
+    """一封待发送的邮件：模板 + 收件人 + 该邮件独有的变量"""
+
+    def __init__(self, to: str, template: str, context: Optional[Dict[str, object]] = None):
+        self.to = to
+        self.template = template
+        self.context = context or {}
+
+    @property
+    def domain(self) -> str:
+        return self.to.rsplit("@", 1)[-1].lower()
+
+
+class TemplateRenderer:
+    """
+    模板渲染
+
+    每个模板只编译一次，公共变量（如店铺名）也只替换一次，
+    每封邮件只需替换自己的变量。
+    """
+
+    def __init__(self, templates: Dict[str, Tuple[str, str]], shared_context: Dict[str, object]):
+        self._compiled: Dict[str, Tuple[Template, Template]] = {}
+        for name, (subject, body) in templates.items():
+            self._compiled[name] = (
+                Template(Template(subject).safe_substitute(shared_context)),
+                Template(Template(body).safe_substitute(shared_context)),
+            )
+
+    def render(self, template: str, context: Dict[str, object]) -> Tuple[str, str]:
+        subject, body = self._compiled[template]
+        return subject.substitute(context), body.substitute(context)
+
+
+class DomainRateLimiter:
+    """按收件人域名限速（令牌桶），避免被大型邮箱服务商限流"""
+
+    def __init__(self, limits: Dict[str, float], default_rate: float):
+        self.limits = limits
+        self.default_rate = default_rate
+        # 域名 -> (令牌数, 上次更新时间)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, domain: str) -> None:
+        """阻塞直到该域名有可用令牌"""
+        rate = self.limits.get(domain, self.default_rate)
+        if rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(domain, (rate, now))
+                tokens = min(rate, tokens + (now - updated) * rate)
+                if tokens >= 1:
+                    self._buckets[domain] = (tokens - 1, now)
+                    return
+                self._buckets[domain] = (tokens, now)
+                wait = (1 - tokens) / rate
+            time.sleep(wait)
+
+
+class SMTPConnectionPool:
+    """
+    持久SMTP连接池
+
+    连接在多封邮件之间复用，避免每封邮件都重新建立TLS会话和登录。
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        use_tls: bool = True,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 4,
+        max_messages_per_connection: int = 500,
+        idle_check_seconds: float = 30,
+        timeout: float = 30,
+    ):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.user = user
+        self.password = password
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_check_seconds = idle_check_seconds
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.use_tls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.user:
+            smtp.login(self.user, self.password)
+        # 附加的计数信息：已发送数量、最后使用时间
+        smtp.sent_count = 0
+        smtp.last_used = time.monotonic()
+        return smtp
+
+    def _discard(self, smtp: smtplib.SMTP) -> None:
+        with self._lock:
+            self._created -= 1
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def _acquire(self) -> smtplib.SMTP:
+        """取出空闲连接或新建连接；连接数已满时最多等待 timeout 秒"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"No SMTP connection available after {self.timeout}s")
+            # 出错被丢弃的连接不会放回队列，等待一小段时间后重新检查能否新建连接
+            try:
+                return self._idle.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                pass
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，出错时丢弃该连接"""
+        smtp = self._acquire()
+
+        # 空闲太久的连接可能已被服务器断开
+        if time.monotonic() - smtp.last_used > self.idle_check_seconds:
+            try:
+                smtp.noop()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+                try:
+                    smtp = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+        try:
+            yield smtp
+        except Exception:
+            self._discard(smtp)
+            raise
+        smtp.last_used = time.monotonic()
+        if smtp.sent_count >= self.max_messages_per_connection:
+            self._discard(smtp)
+        else:
+            self._idle.put(smtp)
+
+    def close(self) -> None:
+        while True:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(smtp)
+
+
+class NotificationSender:
+    """批量发送邮件：连接池 + 模板预渲染 + 按域名限速"""
+
+    def __init__(
+        self,
+        pool: SMTPConnectionPool,
+        renderer: TemplateRenderer,
+        rate_limiter: DomainRateLimiter,
+        from_address: str,
+    ):
+        self.pool = pool
+        self.renderer = renderer
+        self.rate_limiter = rate_limiter
+        self.from_address = from_address
+
+    def build_message(self, notification: Notification) -> EmailMessage:
+        subject, body = self.renderer.render(notification.template, notification.context)
+        message = EmailMessage()
+        message["From"] = self.from_address
+        message["To"] = notification.to
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    def _send_chunk(self, notifications: List[Notification]) -> List[Tuple[Notification, Exception]]:
+        """用同一个SMTP会话连续发送多封邮件"""
+        failures = []
+        remaining = list(notifications)
+        while remaining:
+            try:
+                with self.pool.connection() as smtp:
+                    while remaining:
+                        notification = remaining[0]
+                        self.rate_limiter.acquire(notification.domain)
+                        try:
+                            smtp.send_message(self.build_message(notification))
+                            smtp.sent_count += 1
+                        except smtplib.SMTPRecipientsRefused as e:
+                            # 收件人被拒绝不影响连接，继续发送下一封
+                            failures.append((notification, e))
+                        remaining.pop(0)
+                        if smtp.sent_count >= self.pool.max_messages_per_connection:
+                            break
+            except Exception as e:
+                # 连接出错：当前邮件记为失败，其余邮件换一个连接继续
+                failures.append((remaining.pop(0), e))
+        return failures
+
+    def send_many(self, notifications: Iterable[Notification]) -> List[Tuple[Notification, Exception]]:
+        """发送一批邮件，返回失败的邮件及原因"""
+        notifications = list(notifications)
+        if not notifications:
+            return []
+        # 按连接数拆分，同一域名的邮件尽量分散到不同连接上
+        notifications.sort(key=lambda n: n.domain)
+        chunks = [notifications[i::self.pool.size] for i in range(min(self.pool.size, len(notifications)))]
+        failures = []
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            for chunk_failures in executor.map(self._send_chunk, chunks):
+                failures.extend(chunk_failures)
+        return failures
+
+    def send(self, notification: Notification) -> None:
+        """发送单封邮件（复用连接池），失败时抛出异常"""
+        failures = self._send_chunk([notification])
+        if failures:
+            raise failures[0][1]
+
+
+def parse_rate_limits(value: str) -> Dict[str, float]:
+    """解析 "gmail.com=10,outlook.com=5" 格式的限速配置（每秒邮件数）"""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            domain, rate = item.split("=", 1)
+            limits[domain.strip().lower()] = float(rate)
+    return limits
+
+
+_sender: Optional[NotificationSender] = None
+_sender_lock = threading.Lock()
+
+
+def get_notification_sender() -> NotificationSender:
+    """获取全局邮件发送器（首次使用时创建）"""
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                from_address = settings.EMAILS_FROM_EMAIL
+                if settings.EMAILS_FROM_NAME:
+                    from_address = f"{settings.EMAILS_FROM_NAME} <{settings.EMAILS_FROM_EMAIL}>"
+                _sender = NotificationSender(
+                    pool=SMTPConnectionPool(
+                        settings.SMTP_HOST,
+                        settings.SMTP_PORT or 25,
+                        use_tls=settings.SMTP_TLS,
+                        user=settings.SMTP_USER,
+                        password=settings.SMTP_PASSWORD,
+                        size=settings.SMTP_POOL_SIZE,
+                        max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+                    ),
+                    renderer=TemplateRenderer(TEMPLATES, {"store_name": settings.PROJECT_NAME}),
+                    rate_limiter=DomainRateLimiter(
+                        parse_rate_limits(settings.SMTP_DOMAIN_RATE_LIMITS),
+                        default_rate=settings.SMTP_DEFAULT_RATE_LIMIT,
+                    ),
+                    from_address=from_address,
+                )
+    return _sender
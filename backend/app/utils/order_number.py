@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+# Crockford Base32（不含 I L O U，避免人工抄写时混淆）
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+# 48位毫秒时间戳 + 40位进程节点ID + 32位序列号 = 120位 = 24个Base32字符
+_NODE_BITS = 40
+_SEQUENCE_BITS = 32
+_SEQUENCE_MASK = (1 << _SEQUENCE_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(_ALPHABET[remainder])
+    return "".join(reversed(chars))
+
+
+class OrderNumberGenerator:
+    """
+    按时间递增的订单号生成器（ULID风格）
+
+    编号 = 毫秒时间戳 + 进程节点ID + 进程内序列号：
+    - 同一进程内严格单调递增（时钟回拨时沿用上一次的时间戳）；
+    - 节点ID在进程启动和fork后随机生成，多个worker进程之间无需协调；
+    - 按时间递增的编号插入到 order_number 索引的末尾，避免随机写入。
+    """
+
+    def __init__(self, prefix: str = "ORD-"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._reset()
+        # fork出的worker进程必须使用新的节点ID
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._node = int.from_bytes(os.urandom(5), "big")
+        self._last_ms = 0
+        # 序列号起点随机，时间戳相同的两个进程即使节点ID相同也很难碰撞
+        self._sequence = int.from_bytes(os.urandom(2), "big")
+        self._lock = threading.Lock()
+
+    def _next_parts(self):
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = int.from_bytes(os.urandom(2), "big")
+            else:
+                self._sequence += 1
+                if self._sequence > _SEQUENCE_MASK:
+                    # 同一毫秒内序列号耗尽，借用下一毫秒
+                    self._last_ms += 1
+                    self._sequence = 0
+            return self._last_ms, self._node, self._sequence
+
+    def generate(self) -> str:
+        timestamp_ms, node, sequence = self._next_parts()
+        value = (((timestamp_ms << _NODE_BITS) | node) << _SEQUENCE_BITS) | sequence
+        return f"{self.prefix}{_encode(value, 24)}"
+
+
+# 全局订单号生成器
+order_number_generator = OrderNumberGenerator()
+
+
+def generate_order_number() -> str:
+    """生成新的订单号"""
+    return order_number_generator.generate()
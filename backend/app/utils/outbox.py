@@ -0,0 +1,212 @@
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# 事件类型 -> 处理函数列表
+_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+# 事件类型 -> 批量处理函数列表：参数是一批事件内容，返回与之对应的异常（成功为None）
+_batch_handlers: Dict[str, List[Callable[[List[Dict[str, Any]]], List[Optional[Exception]]]]] = {}
+
+
+def register_handler(event_type: str):
+    """注册事件处理函数（装饰器）"""
+    def decorator(func: Callable[[Dict[str, Any]], None]):
+        _handlers.setdefault(event_type, []).append(func)
+        return func
+    return decorator
+
+
+def register_batch_handler(event_type: str):
+    """注册批量处理函数（装饰器），同一批中该类型的所有事件一次性交给处理函数"""
+    def decorator(func: Callable[[List[Dict[str, Any]]], List[Optional[Exception]]]):
+        _batch_handlers.setdefault(event_type, []).append(func)
+        return func
+    return decorator
+
+
+def get_handlers(event_type: str) -> List[Callable[[Dict[str, Any]], None]]:
+    return _handlers.get(event_type, [])
+
+
+def get_batch_handlers(event_type: str) -> List[Callable[[List[Dict[str, Any]]], List[Optional[Exception]]]]:
+    return _batch_handlers.get(event_type, [])
+
+
+def enqueue(db: Session, event_type: str, payload: Dict[str, Any]) -> OutboxEvent:
+    """
+    写入待发送事件
+
+    只加入会话不提交，由调用方与业务数据在同一个事务中提交。
+    """
+    now = datetime.utcnow()
+    event = OutboxEvent(
+        event_type=event_type,
+        payload=json.dumps(payload, default=str),
+        status="pending",
+        attempts=0,
+        created_at=now,
+        next_attempt_at=now,
+    )
+    db.add(event)
+    return event
+
+
+def handler_name(handler: Callable) -> str:
+    """记录在事件上的处理函数名称"""
+    return f"{handler.__module__}.{handler.__qualname__}"
+
+
+def outbox_stats(db: Session) -> Dict[str, Any]:
+    """队列深度和延迟（处理中的事件也算在待处理中）"""
+    now = datetime.utcnow()
+    pending, oldest = db.query(
+        func.count(OutboxEvent.id), func.min(OutboxEvent.created_at)
+    ).filter(OutboxEvent.status.in_(("pending", "processing"))).one()
+    failed = db.query(func.count(OutboxEvent.id)).filter(OutboxEvent.status == "failed").scalar()
+    return {
+        "pending": pending,
+        "failed": failed,
+        "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+class OutboxWorker:
+    """
+    批量处理待发送事件，失败时按指数退避重试
+
+    先领取一批事件（标记为 processing 并提交，释放行锁），再逐个执行处理函数，
+    每个事件处理完立即提交结果。发送邮件等外部调用期间不持有数据库锁；
+    worker 崩溃时只有未提交的事件在领取过期后被重新处理。
+    每个事件记录已经成功的处理函数，重试时只执行失败的处理函数。
+    批量处理函数（如发送邮件）对整批事件只调用一次，先于逐个事件的处理函数执行。
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        max_attempts: int = 8,
+        base_delay: float = 5,
+        max_delay: float = 3600,
+        lease_seconds: float = 300,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+
+    def backoff(self, attempts: int) -> float:
+        """第N次失败后的等待秒数（带随机抖动）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def dispatch(self, event_type: str, payload: Dict[str, Any], completed: List[str]) -> None:
+        """执行还没有成功的处理函数，成功的名称追加到 completed；第一个失败的处理函数抛出异常"""
+        handlers = get_handlers(event_type)
+        if not handlers and not get_batch_handlers(event_type):
+            logger.warning("No outbox handler registered for %s", event_type)
+        for handler in handlers:
+            name = handler_name(handler)
+            if name not in completed:
+                handler(payload)
+                completed.append(name)
+
+    def dispatch_batches(self, db: Session, events: List[Dict[str, Any]]) -> Dict[int, Exception]:
+        """对整批事件执行批量处理函数并提交成功记录，返回 事件ID -> 第一个失败原因"""
+        errors: Dict[int, Exception] = {}
+        by_type: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            by_type.setdefault(event["event_type"], []).append(event)
+        for event_type, typed_events in by_type.items():
+            for handler in get_batch_handlers(event_type):
+                name = handler_name(handler)
+                todo = [event for event in typed_events if name not in event["completed"] and event["id"] not in errors]
+                if not todo:
+                    continue
+                try:
+                    results = handler([event["payload"] for event in todo])
+                except Exception as e:
+                    results = [e] * len(todo)
+                for event, error in zip(todo, results):
+                    if error is None:
+                        event["completed"].append(name)
+                    else:
+                        errors[event["id"]] = error
+        if any(event["completed"] for event in events):
+            # 批量发送完立即记录，worker 在逐个处理时崩溃也不会重复发送
+            db.execute(update(OutboxEvent), [
+                {"id": event["id"], "completed_handlers": json.dumps(event["completed"])} for event in events
+            ])
+            db.commit()
+        return errors
+
+    def claim(self, db: Session) -> List[Dict[str, Any]]:
+        """领取一批到期事件（包括领取已过期的 processing 事件）并提交"""
+        now = datetime.utcnow()
+        # PostgreSQL上多个worker并行时跳过已被其他worker锁定的行，行锁只持有到本次提交
+        events = db.query(OutboxEvent).filter(
+            OutboxEvent.status.in_(("pending", "processing")),
+            OutboxEvent.next_attempt_at <= now
+        ).order_by(OutboxEvent.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        claimed = []
+        for event in events:
+            event.status = "processing"
+            event.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+            claimed.append({
+                "id": event.id,
+                "event_type": event.event_type,
+                "payload": json.loads(event.payload),
+                "attempts": event.attempts,
+                "completed": json.loads(event.completed_handlers or "[]"),
+            })
+        db.commit()
+        return claimed
+
+    def finish(self, db: Session, event: Dict[str, Any], error: Optional[Exception]) -> None:
+        """记录一个事件的处理结果并提交"""
+        attempts = event["attempts"] + 1
+        values: Dict[str, Any] = {
+            "attempts": attempts,
+            "completed_handlers": json.dumps(event["completed"]),
+        }
+        if error is None:
+            values.update(status="done", processed_at=datetime.utcnow())
+        else:
+            values["last_error"] = f"{type(error).__name__}: {error}"
+            if attempts >= self.max_attempts:
+                values["status"] = "failed"
+                logger.error("Outbox event %s failed permanently: %s", event["id"], values["last_error"])
+            else:
+                values.update(
+                    status="pending",
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=self.backoff(attempts)),
+                )
+                logger.warning("Outbox event %s failed (attempt %s): %s", event["id"], attempts, values["last_error"])
+        db.execute(update(OutboxEvent).where(OutboxEvent.id == event["id"]).values(**values))
+        db.commit()
+
+    def run_once(self, db: Session) -> int:
+        """处理一批到期事件，返回处理数量"""
+        events = self.claim(db)
+        errors = self.dispatch_batches(db, events)
+        for event in events:
+            if event["id"] in errors:
+                self.finish(db, event, errors[event["id"]])
+                continue
+            try:
+                self.dispatch(event["event_type"], event["payload"], event["completed"])
+            except Exception as e:
+                self.finish(db, event, e)
+            else:
+                self.finish(db, event, None)
+        return len(events)
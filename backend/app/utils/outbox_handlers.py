@@ -0,0 +1,64 @@
+import json
+import logging
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.notifications import Notification, get_notification_sender
+from app.utils.outbox import register_batch_handler, register_handler
+
+logger = logging.getLogger(__name__)
+
+
+def post_webhook(event_type: str, payload: Dict[str, Any]) -> None:
+    """把事件POST到配置的Webhook地址，非2xx响应会抛出异常并重试"""
+    data = json.dumps({"type": event_type, "data": payload}).encode("utf-8")
+    request = urllib.request.Request(
+        settings.ORDER_WEBHOOK_URL,
+        data=data,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+def send_order_emails(template: str, payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    """一批订单通知通过 send_many 发送（共享连接池中的SMTP会话），返回每个事件的失败原因"""
+    if not settings.SMTP_HOST:
+        logger.info("SMTP not configured, skipping %d %s emails", len(payloads), template)
+        return [None] * len(payloads)
+    results: List[Optional[Exception]] = [None] * len(payloads)
+    notifications = []
+    positions = {}
+    for index, payload in enumerate(payloads):
+        if not payload.get("email"):
+            continue
+        notification = Notification(payload["email"], template, {
+            "name": payload.get("name") or payload["email"],
+            "order_number": payload["order_number"],
+            "status": payload["status"],
+            "total_amount": f"{payload['total_amount']:.2f}",
+        })
+        notifications.append(notification)
+        positions[id(notification)] = index
+    for notification, error in get_notification_sender().send_many(notifications):
+        results[positions[id(notification)]] = error
+    return results
+
+
+@register_batch_handler("order.created")
+def email_order_confirmations(payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    return send_order_emails("order_confirmation", payloads)
+
+
+@register_batch_handler("order.status_changed")
+def email_order_status(payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    return send_order_emails("order_status", payloads)
+
+
+@register_handler("order.created")
+@register_handler("order.status_changed")
+def order_webhook(payload: Dict[str, Any]) -> None:
+    if settings.ORDER_WEBHOOK_URL:
+        post_webhook(payload["event"], payload)
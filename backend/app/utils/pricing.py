@@ -0,0 +1,20 @@
+from typing import Dict
+
+# 订单满$100免运费
+FREE_SHIPPING_THRESHOLD = 100
+SHIPPING_FEE = 10
+# 10% 税
+TAX_RATE = 0.1
+
+
+def calculate_totals(subtotal: float) -> Dict[str, float]:
+    """根据商品小计计算运费、税费和总金额（购物车与下单共用）"""
+    subtotal = round(subtotal, 2)
+    shipping_fee = 0 if subtotal == 0 or subtotal >= FREE_SHIPPING_THRESHOLD else SHIPPING_FEE
+    tax = round(subtotal * TAX_RATE, 2)
+    return {
+        "subtotal": subtotal,
+        "shipping_fee": shipping_fee,
+        "tax": tax,
+        "total": round(subtotal + shipping_fee + tax, 2),
+    }
@@ -0,0 +1,289 @@
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, case, cast, delete, func, insert, literal, or_, select, text, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.product import Category, Product
+from app.models.sales import SalesDaily, SalesDailyCategory, SalesDailyProduct
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLES = (SalesDaily, SalesDailyCategory, SalesDailyProduct)
+
+
+def counts_as_sale(status: Optional[OrderStatus]) -> bool:
+    """计入销售汇总的订单状态（除已取消外都计入）"""
+    return status != OrderStatus.CANCELLED
+
+
+def order_day(created_at: datetime) -> date:
+    """订单所属的日期（UTC），SQLite 上读出的是不带时区的UTC时间"""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _day_expression(db: Session, column):
+    """SQL 中与 order_day 相同的日期"""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.timezone("UTC", column), Date)
+    return func.date(column)
+
+
+def _increment_statement(dialect_name: str, table, keys: Tuple[str, ...], columns: Iterable[str]):
+    """各数据库的 INSERT ... 主键冲突时累加 语句"""
+    counters = [name for name in columns if name not in keys]
+    if dialect_name in ("postgresql", "sqlite"):
+        stmt = (postgresql.insert if dialect_name == "postgresql" else sqlite.insert)(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+        )
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        return stmt.on_duplicate_key_update({name: table.c[name] + stmt.inserted[name] for name in counters})
+    raise NotImplementedError(f"Sales rollups are not supported on the {dialect_name} dialect")
+
+
+def _increment(db: Session, model, keys: Tuple[str, ...], rows: List[Dict[str, Any]]) -> None:
+    """
+    按主键累加计数（INSERT ... ON CONFLICT DO UPDATE / ON DUPLICATE KEY UPDATE，一条 executemany）
+
+    行按主键排序，并发的下单事务按相同顺序加锁，不会互相死锁。
+    """
+    if not rows:
+        return
+    stmt = _increment_statement(db.get_bind().dialect.name, model.__table__, keys, rows[0])
+    db.execute(stmt, sorted(rows, key=lambda row: tuple(row[key] for key in keys)))
+
+
+def record_order(
+    db: Session,
+    order: Order,
+    lines: Iterable[Tuple[int, Optional[int], int, float]],
+    sign: int = 1,
+    cancelled: int = 0,
+) -> None:
+    """
+    把订单计入（sign=1）或移出（sign=-1）销售汇总，只执行不提交
+
+    lines 为订单项的（商品ID, 分类ID, 数量, 金额），同一商品可以出现多次；
+    cancelled 为已取消订单数的变化。
+    """
+    day = order_day(order.created_at)
+    shard = order.id % settings.SALES_ROLLUP_SHARDS
+    products: Dict[int, List[float]] = {}
+    categories: Dict[int, List[float]] = {}
+    for product_id, category_id, quantity, total_price in lines:
+        for totals, key in ((products, product_id), (categories, category_id or 0)):
+            entry = totals.setdefault(key, [0, 0.0])
+            entry[0] += quantity
+            entry[1] += total_price
+
+    # 按 sales_daily、sales_daily_category、sales_daily_product 的固定顺序更新
+    _increment(db, SalesDaily, ("day", "shard"), [{
+        "day": day,
+        "shard": shard,
+        "orders": sign,
+        "units": sign * sum(units for units, _ in products.values()),
+        "revenue": sign * order.total_amount,
+        "cancelled_orders": cancelled,
+    }])
+    _increment(db, SalesDailyCategory, ("day", "category_id", "shard"), [
+        {"day": day, "category_id": category_id, "shard": shard, "orders": sign, "units": sign * units, "revenue": sign * revenue}
+        for category_id, (units, revenue) in categories.items()
+    ])
+    _increment(db, SalesDailyProduct, ("day", "product_id"), [
+        {"day": day, "product_id": product_id, "orders": sign, "units": sign * units, "revenue": sign * revenue}
+        for product_id, (units, revenue) in products.items()
+    ])
+
+
+def order_lines(db: Session, order_id: int) -> List[Tuple[int, Optional[int], int, float]]:
+    """订单项的（商品ID, 分类ID, 数量, 金额），一条查询"""
+    return [
+        tuple(row) for row in db.query(
+            OrderItem.product_id, Product.category_id, OrderItem.quantity, OrderItem.total_price
+        ).outerjoin(Product, Product.id == OrderItem.product_id).filter(OrderItem.order_id == order_id)
+    ]
+
+
+def record_status_change(db: Session, order: Order, old_status: Optional[OrderStatus]) -> None:
+    """订单状态变化后更新汇总：只有取消和恢复（撤销取消）会改变汇总"""
+    was_sale, is_sale = counts_as_sale(old_status), counts_as_sale(order.status)
+    if was_sale == is_sale:
+        return
+    sign = 1 if is_sale else -1
+    record_order(db, order, order_lines(db, order.id), sign, cancelled=-sign)
+
+
+def rebuild_sales_rollups(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, int]:
+    """
+    从订单重新计算 [start, end] 日期范围（默认全部）内的汇总，只执行不提交
+
+    分类按商品的当前分类统计。PostgreSQL 上先锁定汇总表：已经写过汇总的下单事务提交后才开始读取订单，
+    之后的下单事务等重算提交后再累加，重算期间可以继续下单，结果不会重复或遗漏。
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE sales_daily, sales_daily_category, sales_daily_product IN EXCLUSIVE MODE"))
+
+    for model in ROLLUP_TABLES:
+        stmt = delete(model)
+        if start is not None:
+            stmt = stmt.where(model.day >= start)
+        if end is not None:
+            stmt = stmt.where(model.day <= end)
+        db.execute(stmt)
+
+    # 按创建时间筛选订单，可以使用索引
+    order_filter = []
+    if start is not None:
+        order_filter.append(Order.created_at >= datetime.combine(start, time(), tzinfo=timezone.utc))
+    if end is not None:
+        order_filter.append(Order.created_at < datetime.combine(end + timedelta(days=1), time(), tzinfo=timezone.utc))
+    is_sale = or_(Order.status.is_(None), Order.status != OrderStatus.CANCELLED)
+    day = _day_expression(db, Order.created_at).label("day")
+
+    counts = {}
+    lines = select(
+        day, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.total_price,
+        func.coalesce(Product.category_id, 0).label("category_id"),
+    ).select_from(OrderItem).join(Order, Order.id == OrderItem.order_id).outerjoin(
+        Product, Product.id == OrderItem.product_id
+    ).where(is_sale, OrderItem.product_id.isnot(None), *order_filter).subquery()
+
+    counts["products"] = db.execute(insert(SalesDailyProduct).from_select(
+        ["day", "product_id", "orders", "units", "revenue"],
+        select(
+            lines.c.day, lines.c.product_id, func.count(lines.c.order_id.distinct()),
+            func.sum(lines.c.quantity), func.sum(lines.c.total_price),
+        ).group_by(lines.c.day, lines.c.product_id),
+    )).rowcount
+    counts["categories"] = db.execute(insert(SalesDailyCategory).from_select(
+        ["day", "category_id", "shard", "orders", "units", "revenue"],
+        select(
+            lines.c.day, lines.c.category_id, literal(0), func.count(lines.c.order_id.distinct()),
+            func.sum(lines.c.quantity), func.sum(lines.c.total_price),
+        ).group_by(lines.c.day, lines.c.category_id),
+    )).rowcount
+    counts["days"] = db.execute(insert(SalesDaily).from_select(
+        ["day", "shard", "orders", "units", "revenue", "cancelled_orders"],
+        select(
+            day, literal(0),
+            func.sum(case((is_sale, 1), else_=0)), literal(0),
+            func.sum(case((is_sale, Order.total_amount), else_=0)),
+            func.sum(case((is_sale, 0), else_=1)),
+        ).where(*order_filter).group_by(day),
+    )).rowcount
+
+    # 每日件数等于当天各商品件数之和
+    product_units = select(func.coalesce(func.sum(SalesDailyProduct.units), 0)).where(
+        SalesDailyProduct.day == SalesDaily.day
+    ).scalar_subquery()
+    stmt = update(SalesDaily).values(units=product_units)
+    if start is not None:
+        stmt = stmt.where(SalesDaily.day >= start)
+    if end is not None:
+        stmt = stmt.where(SalesDaily.day <= end)
+    db.execute(stmt.execution_options(synchronize_session=False))
+    logger.info("Rebuilt sales rollups from %s to %s: %s", start or "beginning", end or "end", counts)
+    return counts
+
+
+def analytics_range(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """报表的日期范围：默认截至今天（UTC）的最近 SALES_ANALYTICS_DEFAULT_DAYS 天"""
+    if end is None:
+        end = datetime.now(timezone.utc).date() if start is None else start + timedelta(days=settings.SALES_ANALYTICS_DEFAULT_DAYS - 1)
+    if start is None:
+        start = end - timedelta(days=settings.SALES_ANALYTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if (end - start).days + 1 > settings.SALES_ANALYTICS_MAX_DAYS:
+        raise ValueError(f"Date range must not exceed {settings.SALES_ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+
+def _totals(orders, units, revenue) -> Dict[str, Any]:
+    # 累加和扣减会留下浮点误差
+    return {"orders": int(orders or 0), "units": int(units or 0), "revenue": round(revenue or 0, 2)}
+
+
+def daily_sales(db: Session, start: date, end: date) -> Dict[str, Any]:
+    """每日销售额、件数和订单数（一条查询，没有订单的日期补零）"""
+    rows = {
+        row.day: row for row in db.query(
+            SalesDaily.day,
+            func.sum(SalesDaily.orders).label("orders"),
+            func.sum(SalesDaily.units).label("units"),
+            func.sum(SalesDaily.revenue).label("revenue"),
+            func.sum(SalesDaily.cancelled_orders).label("cancelled_orders"),
+        ).filter(SalesDaily.day >= start, SalesDaily.day <= end).group_by(SalesDaily.day)
+    }
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = rows.get(day)
+        days.append({
+            "day": day,
+            **(_totals(row.orders, row.units, row.revenue) if row else _totals(0, 0, 0)),
+            "cancelled_orders": int(row.cancelled_orders or 0) if row else 0,
+        })
+    totals = _totals(
+        sum(day["orders"] for day in days), sum(day["units"] for day in days), sum(day["revenue"] for day in days),
+    )
+    totals["cancelled_orders"] = sum(day["cancelled_orders"] for day in days)
+    return {"start": start, "end": end, "totals": totals, "days": days}
+
+
+def product_sales(db: Session, start: date, end: date, sort_by: str = "revenue", limit: int = 20) -> List[Dict[str, Any]]:
+    """日期范围内的商品排行（汇总一条查询，商品名称一条查询）"""
+    metric = func.sum(getattr(SalesDailyProduct, sort_by))
+    rows = db.query(
+        SalesDailyProduct.product_id,
+        func.sum(SalesDailyProduct.orders).label("orders"),
+        func.sum(SalesDailyProduct.units).label("units"),
+        func.sum(SalesDailyProduct.revenue).label("revenue"),
+    ).filter(
+        SalesDailyProduct.day >= start, SalesDailyProduct.day <= end
+    ).group_by(SalesDailyProduct.product_id).having(
+        # 取消后只剩零值（和浮点误差）的行不出现在排行中
+        func.sum(SalesDailyProduct.orders) > 0
+    ).order_by(
+        metric.desc(), SalesDailyProduct.product_id
+    ).limit(limit).all()
+    names = {}
+    if rows:
+        names = dict(db.query(Product.id, Product.name).filter(Product.id.in_([row.product_id for row in rows])))
+    return [
+        {"product_id": row.product_id, "name": names.get(row.product_id), **_totals(row.orders, row.units, row.revenue)}
+        for row in rows
+    ]
+
+
+def category_sales(db: Session, start: date, end: date, sort_by: str = "revenue") -> List[Dict[str, Any]]:
+    """日期范围内各分类的销售（category_id 为 0 表示没有分类）"""
+    metric = func.sum(getattr(SalesDailyCategory, sort_by))
+    rows = db.query(
+        SalesDailyCategory.category_id,
+        func.sum(SalesDailyCategory.orders).label("orders"),
+        func.sum(SalesDailyCategory.units).label("units"),
+        func.sum(SalesDailyCategory.revenue).label("revenue"),
+    ).filter(
+        SalesDailyCategory.day >= start, SalesDailyCategory.day <= end
+    ).group_by(SalesDailyCategory.category_id).having(
+        func.sum(SalesDailyCategory.orders) > 0
+    ).order_by(
+        metric.desc(), SalesDailyCategory.category_id
+    ).all()
+    names = {}
+    if rows:
+        names = dict(db.query(Category.id, Category.name).filter(Category.id.in_([row.category_id for row in rows])))
+    return [
+        {"category_id": row.category_id, "name": names.get(row.category_id), **_totals(row.orders, row.units, row.revenue)}
+        for row in rows
+    ]
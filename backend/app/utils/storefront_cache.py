@@ -0,0 +1,204 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.core.metrics import cache_requests_total
+from app.db.session import SessionLocal
+from app.models.order import OrderItem
+from app.models.product import Category, Product
+from app.schemas.storefront import StorefrontCategory, StorefrontHome
+from app.schemas.product import Category as CategorySchema, ProductWithCategory
+
+logger = logging.getLogger(__name__)
+
+cache_hits = cache_requests_total.labels("storefront", "hit")
+cache_misses = cache_requests_total.labels("storefront", "miss")
+
+
+class StorefrontSnapshot:
+    """预先序列化好的首页数据"""
+
+    def __init__(self, body: bytes, generated_at: datetime):
+        self.body = body
+        self.generated_at = generated_at
+        self.etag = '"%s"' % hashlib.md5(body).hexdigest()
+
+
+class StorefrontCache:
+    """
+    首页聚合数据缓存
+
+    固定三条查询构建快照（分类、每个分类前N个商品、精选商品），
+    由后台线程定时刷新，请求直接返回内存中的JSON。
+    每个worker进程各有一份快照：invalidate 替换 version_path 指向的版本文件，
+    各进程的后台线程每 check_seconds 秒检查一次，版本文件变化后重建，
+    因此修改商品后其他进程最多滞后 check_seconds 秒（加上一次重建的时间）。
+    """
+
+    def __init__(self, per_category: int = 8, featured_limit: int = 8, refresh_seconds: float = 60,
+                 check_seconds: float = 1, version_path: Optional[str] = None):
+        self.per_category = per_category
+        self.featured_limit = featured_limit
+        self.refresh_seconds = refresh_seconds
+        self.check_seconds = check_seconds
+        self.version_path = version_path
+        self._snapshot: Optional[StorefrontSnapshot] = None
+        self._build_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def build(self, db) -> StorefrontSnapshot:
+        """从数据库构建快照"""
+        # 1. 所有启用的分类
+        categories = db.query(Category).filter(
+            Category.is_active == True
+        ).order_by(Category.id).all()
+        category_ids = [c.id for c in categories]
+
+        # 2. 每个分类最新的N个商品（窗口函数，一条查询）
+        products_by_category = {cid: [] for cid in category_ids}
+        if category_ids:
+            ranked = db.query(
+                Product.id.label("id"),
+                func.row_number().over(
+                    partition_by=Product.category_id,
+                    order_by=Product.id.desc(),
+                ).label("rank"),
+            ).filter(
+                Product.is_active == True,
+                Product.category_id.in_(category_ids),
+            ).subquery()
+            top_products = db.query(Product).join(
+                ranked, ranked.c.id == Product.id
+            ).filter(
+                ranked.c.rank <= self.per_category
+            ).order_by(Product.category_id, Product.id.desc()).all()
+            for product in top_products:
+                products_by_category[product.category_id].append(product)
+
+        # 3. 精选商品：按销量排序，没有销量时按最新排序
+        units_sold = func.coalesce(func.sum(OrderItem.quantity), 0)
+        featured = db.query(Product).join(
+            Category, Category.id == Product.category_id
+        ).outerjoin(
+            OrderItem, OrderItem.product_id == Product.id
+        ).filter(
+            Product.is_active == True,
+            Category.is_active == True,
+        ).group_by(Product.id).order_by(
+            units_sold.desc(), Product.id.desc()
+        ).limit(self.featured_limit).all()
+
+        # 商品的category关系由第1条查询加载的分类在identity map中解析，不会产生额外查询
+        home = StorefrontHome(
+            categories=[
+                StorefrontCategory(
+                    **CategorySchema.from_orm(category).dict(),
+                    products=[ProductWithCategory.from_orm(p) for p in products_by_category[category.id]],
+                )
+                for category in categories
+            ],
+            featured=[ProductWithCategory.from_orm(p) for p in featured],
+            generated_at=datetime.now(timezone.utc),
+        )
+        body = json.dumps(jsonable_encoder(home), separators=(",", ":")).encode("utf-8")
+        return StorefrontSnapshot(body, home.generated_at)
+
+    def _build_from_db(self) -> StorefrontSnapshot:
+        db = SessionLocal()
+        try:
+            return self.build(db)
+        finally:
+            db.close()
+
+    def refresh(self) -> StorefrontSnapshot:
+        """重新构建快照并替换"""
+        with self._build_lock:
+            self._snapshot = self._build_from_db()
+            return self._snapshot
+
+    def get(self) -> StorefrontSnapshot:
+        """获取当前快照，尚未构建时同步构建一次"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            cache_hits.inc()
+        else:
+            cache_misses.inc()
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build_from_db()
+                snapshot = self._snapshot
+        return snapshot
+
+    def _version(self) -> Optional[tuple]:
+        """版本文件的标识，每次 invalidate 都会换成新文件（inode和修改时间都会变化）"""
+        if self.version_path is None:
+            return None
+        try:
+            stat = os.stat(self.version_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def invalidate(self) -> None:
+        """商品或分类变更后通知本进程和其他worker进程的后台线程尽快刷新"""
+        self._wakeup.set()
+        if self.version_path is None:
+            return
+        tmp_path = f"{self.version_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(str(time.time_ns()))
+            os.replace(tmp_path, self.version_path)
+        except OSError:
+            # 数据已经提交，通知失败时其他进程在下一个刷新周期更新
+            logger.warning("Failed to signal storefront invalidation via %s", self.version_path, exc_info=True)
+
+    def _run(self) -> None:
+        seen_version = self._version()
+        next_refresh = 0.0
+        while not self._stopped.is_set():
+            version = self._version()
+            if self._wakeup.is_set() or version != seen_version or time.monotonic() >= next_refresh:
+                # 先清除再重建：重建期间到达的 invalidate 会让下一轮检查再重建一次，
+                # 而不是被重建之后的 clear 丢掉（快照可能已经读到了修改之前的数据）
+                self._wakeup.clear()
+                seen_version = version
+                next_refresh = time.monotonic() + self.refresh_seconds
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Failed to refresh storefront snapshot")
+            self._wakeup.wait(self.check_seconds)
+
+    def start(self) -> None:
+        """启动后台刷新线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="storefront-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+
+# 全局首页缓存实例
+storefront_cache = StorefrontCache(
+    per_category=settings.STOREFRONT_PRODUCTS_PER_CATEGORY,
+    featured_limit=settings.STOREFRONT_FEATURED_LIMIT,
+    refresh_seconds=settings.STOREFRONT_REFRESH_SECONDS,
+    check_seconds=settings.STOREFRONT_CHECK_SECONDS,
+    version_path=settings.STOREFRONT_VERSION_PATH,
+)
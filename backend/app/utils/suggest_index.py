@@ -0,0 +1,170 @@
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 建议词类型，热度和文本都相同时按此顺序排列
+SUGGESTION_KINDS = ("product", "brand", "category")
+
+KEY_BYTES = 24
+MAX_WORDS = 8
+
+
+def normalize_text(text: str) -> str:
+    """小写并合并连续空白，建议词和用户输入使用相同的规则"""
+    return " ".join(text.lower().split())
+
+
+def _word_starts(text: str) -> List[int]:
+    return [0] + [i + 1 for i, char in enumerate(text) if char == " "]
+
+
+def _matches(lower: str, prefix: str) -> bool:
+    """某个单词开头的后缀以 prefix 开始"""
+    return any(lower.startswith(prefix, start) for start in _word_starts(lower))
+
+
+def suggestion_sort_key(term: tuple) -> tuple:
+    """（类型, 文本, ID, 热度）的排列顺序：热度从高到低，再按规范化的文本"""
+    kind, text, _, score = term[:4]
+    return -score, normalize_text(text), SUGGESTION_KINDS.index(kind)
+
+
+def build_suggestions(terms: List[Tuple[str, str, Optional[int], int]]) -> Tuple[list, Dict[str, np.ndarray]]:
+    """
+    把建议词（类型, 文本, 商品或分类ID, 热度）按最终顺序排列并生成前缀键
+
+    每个建议词从每个单词开头（最多 MAX_WORDS 个）截取最多 KEY_BYTES 字节作为键，
+    返回排列后的建议词和 SuggestIndex 使用的数组。
+    """
+    terms = sorted(terms, key=suggestion_sort_key)
+    keys, entry_terms = [], []
+    for term_id, (_, text, _, _) in enumerate(terms):
+        lower = normalize_text(text)
+        for start in _word_starts(lower)[:MAX_WORDS]:
+            keys.append(lower[start:].encode("utf-8")[:KEY_BYTES])
+            entry_terms.append(term_id)
+    keys = np.array(keys, dtype=f"S{KEY_BYTES}")
+    order = np.argsort(keys, kind="stable")
+    entry_terms = np.asarray(entry_terms, dtype=np.int32)[order]
+    return terms, {
+        "keys": keys[order],
+        "entry_terms": entry_terms,
+        # 按建议词编号（即最终顺序）排列的键位置
+        "by_rank": np.argsort(entry_terms, kind="stable").astype(np.int32),
+        "product_ids": np.array([ref if kind == "product" else -1 for kind, _, ref, _ in terms], dtype=np.int64),
+    }
+
+
+class SuggestIndex:
+    """
+    搜索建议的前缀索引
+
+    键排序后存成定长字节数组，一次前缀查找是两次二分查找。建议词按最终顺序编号，
+    匹配范围较小时直接对范围内的编号排序；范围很大（输入很短）时按编号从小到大扫描全部键，
+    很快就能找够 limit 个。两种情况下检查的键都不超过约 sqrt(SCAN_FACTOR * 键数) 个。
+    数组可以直接引用快照文件的内存映射，多个 worker 共享同一份。
+
+    商品写入后新增的建议词放在一个小的附加表中逐个匹配，被改名或下架商品原来的建议词被隐藏，
+    快照重建后合并进主索引（同名的其他商品要到那时才重新出现）。
+    """
+
+    SCAN_FACTOR = 64
+
+    def __init__(
+        self,
+        terms: Sequence[tuple],
+        keys: np.ndarray,
+        entry_terms: np.ndarray,
+        by_rank: np.ndarray,
+        product_ids: np.ndarray,
+    ):
+        """terms[i] 为第 i 个建议词（类型, 文本, ID, 热度），其余参数由 build_suggestions 生成"""
+        self._terms = terms
+        self._keys = keys
+        self._entry_terms = entry_terms
+        self._by_rank = by_rank
+        self._product_ids = product_ids
+        self._hidden = frozenset()
+        self._extra: Dict[Tuple[str, str], tuple] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _range(self, key: bytes) -> Tuple[int, int]:
+        key = key[:KEY_BYTES]
+        # UTF-8 中不会出现 0xff，key + 0xff 大于所有以 key 开头的键
+        return (
+            int(np.searchsorted(self._keys, key, side="left")),
+            int(np.searchsorted(self._keys, key + b"\xff", side="left")),
+        )
+
+    def _ranked(self, lo: int, hi: int) -> Iterator[int]:
+        """[lo, hi) 范围内的键对应的建议词编号，从小到大（可能重复）"""
+        if (hi - lo) ** 2 <= self.SCAN_FACTOR * len(self._keys):
+            yield from np.sort(self._entry_terms[lo:hi]).tolist()
+            return
+        start, size = 0, 256
+        while start < len(self._by_rank):
+            chunk = self._by_rank[start:start + size]
+            yield from self._entry_terms[chunk[(chunk >= lo) & (chunk < hi)]].tolist()
+            start += size
+            size *= 2
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """以 prefix 开头（按单词）的建议词，热度从高到低"""
+        prefix = normalize_text(prefix)
+        if not prefix or limit <= 0:
+            return []
+        needle = prefix.encode("utf-8")
+        hidden = self._hidden
+        results, seen = [], set()
+        for term_id in self._ranked(*self._range(needle)):
+            if term_id in seen or term_id in hidden:
+                continue
+            seen.add(term_id)
+            term = self._terms[term_id]
+            # 键只保存了前 KEY_BYTES 字节，更长的输入需要核对完整文本
+            if len(needle) > KEY_BYTES and not _matches(normalize_text(term[1]), prefix):
+                continue
+            results.append(term)
+            if len(results) >= limit:
+                break
+        with self._lock:
+            results.extend(term for term in self._extra.values() if _matches(term[4], prefix))
+        results.sort(key=suggestion_sort_key)
+        return [{"text": text, "kind": kind, "id": ref} for kind, text, ref, *_ in results[:limit]]
+
+    def _find(self, kind: str, lower: str) -> Optional[int]:
+        """主索引中未隐藏的相同建议词"""
+        lo, hi = self._range(lower.encode("utf-8"))
+        for term_id in self._entry_terms[lo:hi].tolist():
+            term = self._terms[term_id]
+            if term[0] == kind and term_id not in self._hidden and normalize_text(term[1]) == lower:
+                return term_id
+        return None
+
+    def _add(self, kind: str, text: str, ref: Optional[int], score: int) -> None:
+        lower = normalize_text(text)
+        if lower and (kind, lower) not in self._extra and self._find(kind, lower) is None:
+            self._extra[(kind, lower)] = (kind, text, ref, score, lower)
+
+    def update_product(self, product_id: int, name: Optional[str], brand: Optional[str], score: int) -> None:
+        """
+        商品创建、改名或下架后更新建议词（下架时 name 和 brand 为None）
+
+        品牌只增加不删除，没有商品的品牌要到快照重建后才消失。
+        """
+        with self._lock:
+            term_ids = np.flatnonzero(self._product_ids == product_id).tolist()
+            if term_ids:
+                # 读取方不加锁，替换整个集合而不是原地修改
+                self._hidden = self._hidden | set(term_ids)
+            for key, term in list(self._extra.items()):
+                if term[0] == "product" and term[2] == product_id:
+                    del self._extra[key]
+            if name:
+                self._add("product", name, product_id, score)
+            if brand:
+                self._add("brand", brand, None, score)
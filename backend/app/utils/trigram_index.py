@@ -0,0 +1,171 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 与 pg_trgm 相同：按非字母数字分词，每个词前加两个空格、后加一个空格后取三元组。
+# 按 UTF-8 字节计算，非ASCII字节都当作字母（UTF-8 中不会出现 0xff，建索引时用作分隔符），只忽略ASCII大小写
+_SEPARATORS = re.compile(rb"[^0-9a-z\x80-\xfe]+")
+
+
+def _padded(text: Optional[str]) -> bytes:
+    return b"".join(b"  " + word + b" " for word in _SEPARATORS.split((text or "").encode("utf-8").lower()) if word)
+
+
+def _trigram_codes(stream: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """字节流中每个位置的三元组编码，以及是否在同一个词内（后两个字节都是空格的跨越了词边界）"""
+    values = stream.astype(np.uint32)
+    codes = (values[:-2] << 16) | (values[1:-1] << 8) | values[2:]
+    valid = ~((stream[1:-1] == 32) & (stream[2:] == 32))
+    return codes, valid
+
+
+def trigrams(text: Optional[str]) -> np.ndarray:
+    """文本的三元组编码（去重、升序）"""
+    codes, valid = _trigram_codes(np.frombuffer(_padded(text), dtype=np.uint8))
+    return np.unique(codes[valid])
+
+
+def _padded_stream(names: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """所有名称按 _padded 的规则拼接成一个字节流（不逐个名称循环），以及每个字节所属的行号"""
+    data = np.frombuffer(b"\xff".join((name or "").encode("utf-8") for name in names).lower(), dtype=np.uint8)
+    rows = np.cumsum(data == 0xFF)
+    word = (
+        ((data >= 0x80) & (data < 0xFF))
+        | ((data >= ord("0")) & (data <= ord("9")))
+        | ((data >= ord("a")) & (data <= ord("z")))
+    )
+    starts = word & ~np.concatenate(([False], word[:-1]))
+    ends = word & ~np.concatenate((word[1:], [False]))
+    # 每个输入字节输出的字节数：词首前加两个空格，词尾后加一个空格，分隔符不输出
+    sizes = word * (1 + 2 * starts.astype(np.int64) + ends)
+    positions = np.cumsum(sizes) - sizes + 2 * starts
+    stream = np.full(int(sizes.sum()), ord(" "), dtype=np.uint8)
+    stream[positions[word]] = data[word]
+    return stream, np.repeat(rows, sizes)
+
+
+def build_trigram_arrays(names: List[Optional[str]]) -> Dict[str, np.ndarray]:
+    """
+    倒排索引：每个三元组对应包含它的行号（升序）
+
+    codes 为升序的三元组编码，第 i 个的行号是 postings[starts[i]:starts[i + 1]]；
+    row_counts 为每行不同三元组的个数。
+    """
+    stream, rows = _padded_stream(names)
+    codes, valid = _trigram_codes(stream)
+    # 跨行的三元组一定跨越了词边界，已被排除；按（编码, 行号）排序后去掉相邻的重复
+    keys = np.sort((codes[valid].astype(np.int64) << 32) | rows[:len(codes)][valid])
+    if len(keys):
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    key_codes = (keys >> 32).astype(np.uint32)
+    starts = np.zeros(1, dtype=np.int64)
+    if len(keys):
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(key_codes)) + 1, [len(keys)])).astype(np.int64)
+    postings = (keys & 0xFFFFFFFF).astype(np.int32)
+    return {
+        "codes": key_codes[starts[:-1]],
+        "starts": starts,
+        "postings": postings,
+        "row_counts": np.bincount(postings, minlength=len(names)).astype(np.int32),
+    }
+
+
+class TrigramIndex:
+    """
+    商品名称的三元组倒排索引，用于容错的模糊搜索
+
+    相似度为查询的三元组在名称中出现的比例（同分时按 Jaccard 相似度，再按行号）。
+    至少匹配 required 个三元组的行一定出现在最稀有的 n - required + 1 个倒排列表中，
+    只对这些列表计数生成候选，其余（常见的）列表用二分查找补全候选的计数，
+    不需要扫描所有商品；候选超过 max_candidates 时只保留部分计数最高的。
+    """
+
+    # 倒排列表总长度超过行数的这个比例时用 bincount 计数，否则排序计数
+    DENSE_RATIO = 1 / 16
+
+    def __init__(self, codes: np.ndarray, starts: np.ndarray, postings: np.ndarray, row_counts: np.ndarray):
+        self._codes = codes
+        self._starts = starts
+        self._postings = postings
+        self._row_counts = row_counts
+
+    def __len__(self) -> int:
+        return len(self._row_counts)
+
+    def _posting_lists(self, query_codes: np.ndarray) -> List[np.ndarray]:
+        found = np.searchsorted(self._codes, query_codes)
+        lists = []
+        for code, index in zip(query_codes.tolist(), found.tolist()):
+            if index < len(self._codes) and self._codes[index] == code:
+                lists.append(self._postings[self._starts[index]:self._starts[index + 1]])
+        return lists
+
+    def _count(self, lists: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        merged = np.concatenate(lists)
+        if len(merged) > len(self) * self.DENSE_RATIO:
+            counts = np.bincount(merged, minlength=len(self))
+            rows = np.flatnonzero(counts)
+            return rows, counts[rows]
+        merged = np.sort(merged)
+        firsts = np.flatnonzero(np.concatenate(([True], merged[1:] != merged[:-1])))
+        return merged[firsts], np.diff(np.append(firsts, len(merged)))
+
+    def search(
+        self,
+        query: str,
+        min_similarity: float,
+        max_candidates: int,
+        active: Optional[np.ndarray] = None,
+        overrides: Optional[Dict[int, Optional[str]]] = None,
+    ) -> np.ndarray:
+        """
+        相似度不低于 min_similarity 的行号，按相似度从高到低排列
+
+        active 为可选的行过滤条件；overrides 为索引建立后修改过的行（行号 -> 当前名称，
+        None 表示排除），这些行按当前名称单独计算。
+        """
+        query_codes = trigrams(query)
+        n = len(query_codes)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        required = max(1, math.ceil(min_similarity * n - 1e-9))
+
+        lists = sorted(self._posting_lists(query_codes), key=len)
+        # 索引中不存在的三元组相当于空列表，排在最前面
+        probes = n - required + 1 - (n - len(lists))
+        rows = np.empty(0, dtype=np.int64)
+        matched = np.empty(0, dtype=np.int64)
+        if probes > 0:
+            rows, matched = self._count(lists[:probes])
+            keep = np.ones(len(rows), dtype=bool)
+            if active is not None:
+                keep &= active[rows]
+            if overrides:
+                keep &= ~np.isin(rows, np.fromiter(overrides, dtype=np.int64, count=len(overrides)))
+            rows, matched = rows[keep], matched[keep]
+            if len(rows) > max_candidates:
+                top = np.sort(np.argpartition(-matched, max_candidates - 1)[:max_candidates])
+                rows, matched = rows[top], matched[top]
+            for postings in lists[probes:]:
+                index = np.minimum(np.searchsorted(postings, rows), len(postings) - 1)
+                matched = matched + (postings[index] == rows)
+        row_counts = self._row_counts[rows].astype(np.int64)
+
+        extra = []
+        for position, name in (overrides or {}).items():
+            codes = trigrams(name) if name is not None else np.empty(0, dtype=np.uint32)
+            count = len(np.intersect1d(query_codes, codes, assume_unique=True))
+            if name is not None and count >= required:
+                extra.append((position, count, len(codes)))
+        if extra:
+            rows = np.concatenate((rows, [position for position, _, _ in extra]))
+            matched = np.concatenate((matched, [count for _, count, _ in extra]))
+            row_counts = np.concatenate((row_counts, [total for _, _, total in extra]))
+
+        keep = matched >= required
+        rows, matched, row_counts = rows[keep].astype(np.int64), matched[keep], row_counts[keep]
+        similarity = matched / n
+        jaccard = matched / (n + row_counts - matched)
+        return rows[np.lexsort((rows, -jaccard, -similarity))]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""购物车存储后端加购吞吐量对比（sql / memory / redis）
+
+用法:
+    python benchmarks/cart_store_bench.py --threads 8 --ops 2000
+
+redis后端优先使用本地 fakeredis（pip install fakeredis），
+未安装时连接 REDIS_URL 指向的真实Redis。
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.session import Base
+from app.models.user import User
+from app.models.order import Order, OrderItem  # 导入所有模型避免关系错误
+from app.models.product import Product, Category
+from app.utils.cart_store import KeyValueCartStore, MemoryKVClient, SQLCartStore
+
+
+def make_redis_client():
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis(), "fakeredis"
+    except ImportError:
+        import redis
+        return redis.Redis.from_url(settings.REDIS_URL), settings.REDIS_URL
+
+
+def run(store, session_factory, users: int, products: int, threads: int, ops: int) -> float:
+    """每个线程执行ops次加购，返回每秒操作数"""
+    def worker(seed: int):
+        rng = random.Random(seed)
+        db = session_factory()
+        try:
+            for _ in range(ops):
+                user_id = rng.randint(1, users)
+                product_id = rng.randint(1, products)
+                store.apply(db, user_id, {product_id: rng.randint(1, 5)})
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return threads * ops / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=500, help="每个线程的加购次数")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--backends", default="sql,memory,redis")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            connect_args={"check_same_thread": False},
+        )
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        db = session_factory()
+        db.add(Category(id=1, name="Bench", slug="bench"))
+        db.add_all(User(id=i, email=f"user{i}@example.com", hashed_password="x") for i in range(1, args.users + 1))
+        db.add_all(
+            Product(id=i, name=f"Product {i}", price=9.99, stock=1000, category_id=1)
+            for i in range(1, args.products + 1)
+        )
+        db.commit()
+        db.close()
+
+        for backend in args.backends.split(","):
+            if backend == "sql":
+                store, label = SQLCartStore(), "sqlite"
+            elif backend == "memory":
+                store, label = KeyValueCartStore(MemoryKVClient()), "in-process"
+            elif backend == "redis":
+                client, label = make_redis_client()
+                store = KeyValueCartStore(client)
+            else:
+                raise SystemExit(f"Unknown backend: {backend}")
+            throughput = run(store, session_factory, args.users, args.products, args.threads, args.ops)
+            print(f"{backend:<8} ({label}): {throughput:10.0f} cart adds/s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
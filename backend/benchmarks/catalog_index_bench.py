@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""商品列表、分面计数、搜索建议和模糊搜索：数据库查询与目录快照（NumPy 索引）的耗时对比
+
+生成模拟数据（默认 100 万商品）并写入快照，对每组筛选/排序条件分别执行
+数据库查询（query_products / query_facets / query_suggestions / query_fuzzy_products）和快照查询
+（list_products / 索引分面计数 / 搜索建议索引 / 三元组索引），输出中位数耗时。
+
+用法:
+    python benchmarks/catalog_index_bench.py                       # 临时 SQLite，100 万商品
+    python benchmarks/catalog_index_bench.py --products 200000 --repeat 20
+    python benchmarks/catalog_index_bench.py --database-url postgresql://... --skip-seed
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+CASES = [
+    ("first page", {}),
+    ("deep page", {"skip": 5000}),
+    ("category", {"category_id": 2}),
+    ("price range", {"min_price": 10, "max_price": 50}),
+    ("in stock + brand", {"in_stock": True, "brand": "PawPal"}),
+    ("category + price + in stock", {"category_id": 3, "min_price": 20, "max_price": 80, "in_stock": True}),
+    ("price asc", {"sort": "price_asc"}),
+    ("price desc + category", {"sort": "price_desc", "category_id": 1}),
+    ("newest", {"sort": "newest"}),
+    ("best selling", {"sort": "best_selling"}),
+    ("best selling + brand + in stock", {"sort": "best_selling", "brand": "Barkly", "in_stock": True}),
+    ("search", {"search": "bowl"}),
+]
+
+FACET_CASES = [
+    ("facets: no filter", {}),
+    ("facets: brand", {"brand": "PawPal"}),
+    ("facets: category + price + in stock", {"category_id": 3, "min_price": 20, "max_price": 80, "in_stock": True}),
+    ("facets: search", {"search": "bowl"}),
+]
+
+SUGGEST_PREFIXES = ["d", "pa", "paw", "pawpal", "dry f", "pawpal premium dog fo", "zzz"]
+
+SEARCH_QUERIES = ["dgo food", "scrtching post", "pawpal premum", "food", "zzzz"]
+
+
+def timed(function, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--orders", type=int, default=200_000, help="用于计算销量排序")
+    parser.add_argument("--limit", type=int, default=24, help="每页商品数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", help="默认使用临时 SQLite 数据库")
+    parser.add_argument("--skip-seed", action="store_true", help="使用数据库中已有的数据")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="catalog-bench-")
+    # 应用在导入时读取配置
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'catalog.db')}"
+    os.environ["CATALOG_SNAPSHOT_ENABLED"] = "false"
+    os.environ["SLOW_QUERY_THRESHOLD_MS"] = "60000"
+
+    from app.api.api_v1.endpoints.products import query_facets, query_fuzzy_products, query_products, query_suggestions
+    from app.core.config import settings
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal, engine
+    from app.db.synthetic import SyntheticConfig, SyntheticDataGenerator
+    from app.utils.catalog_index import ProductSort
+    from app.utils.catalog_snapshot import CatalogSnapshot, write_snapshot
+
+    db = SessionLocal()
+    try:
+        if not args.skip_seed:
+            init_db(db)
+            started = time.perf_counter()
+            SyntheticDataGenerator(engine, SyntheticConfig(
+                products=args.products, users=max(100, args.orders // 20), orders=args.orders, carts=0,
+            )).run()
+            print(f"Seeded {args.products} products / {args.orders} orders in {time.perf_counter() - started:.1f}s")
+
+        path = os.path.join(tmp, "catalog.snapshot")
+        started = time.perf_counter()
+        write_snapshot(db, path)
+        print(f"Snapshot written in {time.perf_counter() - started:.1f}s ({os.path.getsize(path) / 2 ** 20:.0f} MiB)")
+        started = time.perf_counter()
+        snapshot = CatalogSnapshot(path)
+        print(f"Snapshot loaded in {(time.perf_counter() - started) * 1000:.0f}ms ({snapshot.products.rows} products)\n")
+
+        print(f"{'case':34} {'sql':>10} {'snapshot':>10} {'speedup':>8}")
+        for name, params in CASES:
+            params = dict(params)
+            skip = params.pop("skip", 0)
+            if "sort" in params:
+                params["sort"] = ProductSort(params["sort"])
+            sql_ms = timed(lambda: query_products(db, **params).offset(skip).limit(args.limit).all(), args.repeat)
+            db.expunge_all()
+            snapshot_ms = timed(lambda: snapshot.list_products(skip=skip, limit=args.limit, **params), args.repeat)
+            print(f"{name:34} {sql_ms:8.2f}ms {snapshot_ms:8.2f}ms {sql_ms / snapshot_ms:7.1f}x")
+
+        # 分面计数：快照一列不计缓存（直接调用索引），缓存命中另列
+        edges = settings.PRODUCT_FACET_PRICE_BUCKETS
+        print(f"\n{'case':34} {'sql':>10} {'index':>10} {'speedup':>8} {'cached':>10}")
+        for name, params in FACET_CASES:
+            search = params.get("search")
+            index_params = {key: value for key, value in params.items() if key != "search"}
+            sql_ms = timed(lambda: query_facets(db, edges, **params), args.repeat)
+            index_ms = timed(lambda: snapshot.index.facets(
+                edges, mask=snapshot._search_mask(search) if search else None, **index_params,
+            ), args.repeat)
+            snapshot.facets(edges, **params)
+            cached_ms = timed(lambda: snapshot.facets(edges, **params), args.repeat)
+            print(f"{name:34} {sql_ms:8.2f}ms {index_ms:8.2f}ms {sql_ms / index_ms:7.1f}x {cached_ms:8.3f}ms")
+
+        # 建议索引在写快照时生成，这里只输出大小
+        suggestions = snapshot.suggestions
+        arrays = (suggestions._keys, suggestions._entry_terms, suggestions._by_rank, suggestions._product_ids)
+        size = sum(values.nbytes for values in arrays)
+        print(f"\nSuggest index: {len(suggestions)} terms, {len(suggestions._keys)} keys, {size / 2 ** 20:.1f} MiB arrays")
+        print(f"{'suggest':34} {'sql':>10} {'index':>10} {'speedup':>8}")
+        for prefix in SUGGEST_PREFIXES:
+            sql_ms = timed(lambda: query_suggestions(db, prefix, 10), args.repeat)
+            index_ms = timed(lambda: suggestions.suggest(prefix, 10), args.repeat * 20)
+            print(f"{prefix!r:34} {sql_ms:8.2f}ms {index_ms:8.3f}ms {sql_ms / index_ms:7.0f}x")
+
+        trigrams = snapshot.trigrams
+        size = sum(values.nbytes for values in (trigrams._codes, trigrams._starts, trigrams._postings, trigrams._row_counts))
+        print(f"\nTrigram index: {len(trigrams._codes)} trigrams, {len(trigrams._postings)} postings, {size / 2 ** 20:.1f} MiB arrays")
+        print(f"{'search':34} {'sql':>10} {'snapshot':>10} {'speedup':>8} {'results':>8}")
+        for query in SEARCH_QUERIES:
+            sql_ms = timed(lambda: query_fuzzy_products(db, query, 0, args.limit), args.repeat)
+            db.expunge_all()
+            snapshot_ms = timed(lambda: snapshot.search_products(query, limit=args.limit), args.repeat * 4)
+            matches = len(trigrams.search(query, settings.PRODUCT_SEARCH_MIN_SIMILARITY, settings.PRODUCT_SEARCH_MAX_CANDIDATES))
+            print(f"{query!r:34} {sql_ms:8.2f}ms {snapshot_ms:8.2f}ms {sql_ms / snapshot_ms:7.1f}x {matches:8}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""过载测试：低优先级流量压满连接池时，下单接口的延迟是否仍然可控
+
+分别在开启和关闭准入控制的情况下启动 uvicorn（小连接池），
+用大量深度分页请求压满数据库，同时持续下单，比较下单的 p50/p99。
+
+用法:
+    python benchmarks/overload_bench.py --duration 15 --flood 60
+
+tests/test_admission.py 用模拟的连接池在测试中检查同样的行为（503 + Retry-After，被接受的请求延迟有上限）。
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+SEED_SCRIPT = """
+from app.db.init_db import init_db
+from app.db.session import SessionLocal
+from app.models.product import Product
+db = SessionLocal()
+init_db(db)
+db.bulk_save_objects([
+    Product(name=f"Load Product {{i}}", price=10 + i % 50, stock=10 ** 9, category_id=1 + i % 3, is_active=True)
+    for i in range({products})
+])
+db.commit()
+"""
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"{base_url}/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def drive(base_url: str, duration: float, flood: int, checkout_workers: int):
+    api = f"{base_url}/api/v1"
+    limits = httpx.Limits(max_connections=flood + checkout_workers + 5)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        login = await client.post(f"{api}/auth/login/", data={"username": "admin@example.com", "password": "admin"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        order = {
+            "items": [{"product_id": 1, "quantity": 1, "unit_price": 0, "total_price": 0}],
+            "payment_method": "paypal", "shipping_address": "1 Test St", "shipping_city": "Sydney",
+            "shipping_state": "NSW", "shipping_postcode": "2000",
+        }
+        deadline = time.monotonic() + duration
+        checkout_latencies, checkout_errors, flood_status = [], 0, {}
+
+        async def flood_worker(offset: int):
+            while time.monotonic() < deadline:
+                r = await client.get(f"{api}/products/", params={"skip": 1000 + offset, "limit": 200})
+                flood_status[r.status_code] = flood_status.get(r.status_code, 0) + 1
+                if r.status_code == 503:
+                    await asyncio.sleep(float(r.headers.get("retry-after", 1)) / 10)
+
+        async def checkout_worker():
+            nonlocal checkout_errors
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                r = await client.post(f"{api}/orders/", json=order, headers=headers)
+                if r.status_code == 200:
+                    checkout_latencies.append(time.perf_counter() - started)
+                else:
+                    checkout_errors += 1
+
+        await asyncio.gather(
+            *[flood_worker(i) for i in range(flood)],
+            *[checkout_worker() for _ in range(checkout_workers)],
+        )
+        return checkout_latencies, checkout_errors, flood_status
+
+
+def run(admission: bool, args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'overload.db')}",
+            DB_POOL_SIZE=str(args.pool_size),
+            DB_MAX_OVERFLOW="0",
+            RATE_LIMIT_ENABLED="false",
+            ADMISSION_ENABLED="true" if admission else "false",
+            PYTHONPATH=BACKEND_DIR,
+        )
+        subprocess.run([sys.executable, "-c", SEED_SCRIPT.format(products=args.products)], env=env, cwd=BACKEND_DIR, check=True)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            env=env, cwd=BACKEND_DIR,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(wait_ready(base_url))
+            latencies, errors, flood_status = asyncio.run(drive(base_url, args.duration, args.flood, args.checkout))
+        finally:
+            server.terminate()
+            server.wait()
+
+    label = "admission on " if admission else "admission off"
+    if latencies:
+        print(
+            f"{label}: checkout n={len(latencies)} errors={errors} "
+            f"p50={statistics.median(latencies) * 1000:.0f}ms p99={percentile(latencies, 99) * 1000:.0f}ms "
+            f"flood responses={flood_status}"
+        )
+    else:
+        print(f"{label}: no successful checkouts (errors={errors}) flood responses={flood_status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--flood", type=int, default=60, help="并发的低优先级请求数")
+    parser.add_argument("--checkout", type=int, default=2, help="并发的下单请求数")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--port", type=int, default=18034)
+    args = parser.parse_args()
+    for admission in (False, True):
+        run(admission, args)
+
+
+if __name__ == "__main__":
+    main()
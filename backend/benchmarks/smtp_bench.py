@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""邮件发送吞吐量对比：每封邮件新建SMTP会话 vs 连接池批量发送
+
+在本地启动一个 aiosmtpd 服务器作为替身（pip install aiosmtpd），
+--handshake-ms 模拟真实服务器建立会话（TCP+TLS+登录）的耗时。
+
+用法:
+    python benchmarks/smtp_bench.py --messages 2000 --handshake-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import smtplib
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from aiosmtpd.controller import Controller
+
+from app.utils.notifications import (
+    TEMPLATES, DomainRateLimiter, Notification, NotificationSender, SMTPConnectionPool, TemplateRenderer
+)
+
+DOMAINS = ["gmail.com", "outlook.com", "example.com", "yahoo.com"]
+
+
+class CountingHandler:
+    def __init__(self, handshake_delay: float):
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        # 模拟建立会话的开销
+        await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def make_notifications(count: int):
+    return [
+        Notification(
+            f"customer{i}@{DOMAINS[i % len(DOMAINS)]}",
+            "order_confirmation",
+            {"name": f"Customer {i}", "order_number": f"ORD-{i:08d}", "status": "pending", "total_amount": "42.00"},
+        )
+        for i in range(count)
+    ]
+
+
+def send_naive(host: str, port: int, notifications) -> None:
+    """每封邮件单独渲染模板并新建会话"""
+    for notification in notifications:
+        subject, body = TemplateRenderer(TEMPLATES, {"store_name": "CY Pet Store"}).render(
+            notification.template, notification.context
+        )
+        message = EmailMessage()
+        message["From"] = "shop@example.com"
+        message["To"] = notification.to
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(host, port) as smtp:
+            smtp.send_message(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--handshake-ms", type=float, default=20)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--port", type=int, default=10251)
+    args = parser.parse_args()
+
+    handler = CountingHandler(args.handshake_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        notifications = make_notifications(args.messages)
+        renderer = TemplateRenderer(TEMPLATES, {"store_name": "CY Pet Store"})
+
+        started = time.perf_counter()
+        send_naive("127.0.0.1", args.port, notifications)
+        naive = args.messages / (time.perf_counter() - started)
+
+        pool = SMTPConnectionPool("127.0.0.1", args.port, use_tls=False, size=args.pool_size)
+        sender = NotificationSender(pool, renderer, DomainRateLimiter({}, default_rate=0), "shop@example.com")
+        started = time.perf_counter()
+        failures = sender.send_many(notifications)
+        pooled = args.messages / (time.perf_counter() - started)
+        pool.close()
+
+        print(f"per-message session: {naive:8.0f} msgs/s")
+        print(f"pooled ({args.pool_size} conns) : {pooled:8.0f} msgs/s ({len(failures)} failures)")
+        print(f"server received {handler.received} messages")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
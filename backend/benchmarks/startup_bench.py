@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""冷启动耗时：导入 app.main、数据库初始化检查、uvicorn 到第一个响应
+
+每项在新的子进程中重复运行取中位数，并用 python -X importtime 给出导入耗时最多的包和模块。
+
+用法:
+    python benchmarks/startup_bench.py --runs 5 --top 15
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+INIT_DB_SCRIPT = """
+import time
+from app.db.init_db import init_db
+from app.db.session import SessionLocal
+db = SessionLocal()
+started = time.perf_counter()
+init_db(db)
+print(time.perf_counter() - started)
+"""
+
+
+def run_python(args, env) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+
+
+def measure_import(env, runs: int):
+    """返回（导入耗时中位数, 最后一次 -X importtime 的解析结果）"""
+    durations, entries = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run_python(["-X", "importtime", "-c", "import app.main"], env)
+        durations.append(time.perf_counter() - started)
+        entries = []
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                self_us, cumulative_us, indent, module = match.groups()
+                entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return statistics.median(durations), entries
+
+
+def print_breakdown(entries, top: int) -> None:
+    by_package = {}
+    for module, self_us, _, _ in entries:
+        package = module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    total = sum(by_package.values())
+    print(f"\nImport self time by top-level package (total {total / 1000:.0f}ms):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:30} {self_us / 1000:8.1f}ms {self_us / total:6.1%}")
+
+    print("\nSlowest application modules (cumulative, includes their imports):")
+    app_modules = [entry for entry in entries if entry[0].startswith("app.")]
+    for module, self_us, cumulative_us, _ in sorted(app_modules, key=lambda e: -e[2])[:top]:
+        print(f"  {module:45} {cumulative_us / 1000:8.1f}ms (self {self_us / 1000:.1f}ms)")
+
+
+def measure_init_db(env, runs: int):
+    """第一次运行建表和写入初始数据，之后的运行应该只检查迁移版本"""
+    cold = float(run_python(["-c", INIT_DB_SCRIPT], env).stdout.strip().splitlines()[-1])
+    warm = [float(run_python(["-c", INIT_DB_SCRIPT], env).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return cold, statistics.median(warm)
+
+
+async def wait_first_response(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.005)
+    raise RuntimeError("Server did not respond")
+
+
+def measure_first_response(env, runs: int, port: int) -> float:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, cwd=BACKEND_DIR,
+        )
+        try:
+            asyncio.run(wait_first_response(f"http://127.0.0.1:{port}/"))
+            durations.append(time.perf_counter() - started)
+        finally:
+            server.terminate()
+            server.wait()
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=18042)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            PYTHONPATH=BACKEND_DIR,
+        )
+        import_seconds, entries = measure_import(env, args.runs)
+        cold_init, warm_init = measure_init_db(env, args.runs)
+        first_response = measure_first_response(env, args.runs, args.port)
+
+    print(f"python -c 'import app.main' (process start + import): {import_seconds * 1000:.0f}ms")
+    print(f"init_db on empty database:                             {cold_init * 1000:.0f}ms")
+    print(f"init_db at migration head:                             {warm_init * 1000:.1f}ms")
+    print(f"uvicorn spawn -> first 200 response:                   {first_response * 1000:.0f}ms")
+    print_breakdown(entries, args.top)
+
+
+if __name__ == "__main__":
+    main()
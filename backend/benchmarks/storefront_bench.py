@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""商城主要流程的端到端基准测试：浏览、商品详情、购物车、下单、后台订单列表
+
+可以在进程内（httpx 直接调用 ASGI 应用，不经过网络）和真实 uvicorn 上运行，
+每个场景用固定并发持续压测，输出吞吐量和 p50/p95/p99，结果保存为 JSON 便于比较。
+
+用法:
+    python benchmarks/storefront_bench.py run --mode both --concurrency 16 --duration 10 --output results.json
+    python benchmarks/storefront_bench.py run --scenarios browse,checkout --workers 4
+    python benchmarks/storefront_bench.py compare baseline.json results.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+API = "/api/v1"
+PASSWORD = "bench-password"
+SEARCH_TERMS = ["dog", "cat", "food", "toy", "bed", "treat", "lead", "bowl"]
+BRANDS = ["Acme", "PawPal", "Whiskers", "Barkly", "Nibbles"]
+
+SEED_SCRIPT = """
+import random
+from app.db.init_db import init_db
+from app.db.session import SessionLocal
+from app.models.order import Order, OrderItem, PaymentMethod
+from app.models.product import Product
+from app.models.user import User
+from app.utils.order_number import generate_order_number
+from app.utils.security import get_password_hash
+
+rng = random.Random(42)
+words = {words!r}
+brands = {brands!r}
+db = SessionLocal()
+init_db(db)
+db.bulk_save_objects([
+    Product(
+        name=f"{{rng.choice(brands)}} {{rng.choice(words)}} {{rng.choice(words)}} {{i}}",
+        price=round(rng.uniform(2, 200), 2), stock=10 ** 9, category_id=1 + i % 3,
+        brand=rng.choice(brands), is_active=True,
+    )
+    for i in range({products})
+])
+hashed = get_password_hash({password!r})
+db.bulk_save_objects([
+    User(email=f"shopper{{i}}@bench.example.com", hashed_password=hashed, full_name=f"Shopper {{i}}", is_active=True)
+    for i in range({shoppers})
+])
+db.commit()
+user_ids = [u.id for u in db.query(User.id).all()]
+for i in range({orders}):
+    order = Order(
+        user_id=rng.choice(user_ids), order_number=generate_order_number(), total_amount=0,
+        payment_method=PaymentMethod.PAYPAL, shipping_address="1 Bench St", shipping_city="Sydney",
+        shipping_state="NSW", shipping_postcode="2000", shipping_country="Australia",
+    )
+    order.items = [
+        OrderItem(product_id=rng.randint(1, {products}), quantity=1, unit_price=10, total_price=10)
+        for _ in range(rng.randint(1, 4))
+    ]
+    order.total_amount = sum(item.total_price for item in order.items)
+    db.add(order)
+db.commit()
+"""
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Workload:
+    """登录后的令牌和商品范围，各场景共用"""
+
+    def __init__(self, admin_headers, shopper_headers, product_count: int):
+        self.admin_headers = admin_headers
+        self.shopper_headers = shopper_headers
+        self.product_count = product_count
+
+    def shopper(self, worker: int):
+        # 每个并发 worker 固定使用一个用户，避免多个 worker 争用同一个购物车
+        return self.shopper_headers[worker % len(self.shopper_headers)]
+
+    def product_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.product_count)
+
+
+async def browse(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    params = {"limit": 20, "skip": rng.choice([0, 0, 0, 20, 40])}
+    roll = rng.random()
+    if roll < 0.4:
+        params["category_id"] = rng.randint(1, 3)
+    elif roll < 0.7:
+        params["search"] = rng.choice(SEARCH_TERMS)
+    elif roll < 0.85:
+        params["min_price"], params["max_price"] = 10, 50
+    r = await client.get(f"{API}/products/", params=params)
+    return r.status_code
+
+
+async def product_detail(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    r = await client.get(f"{API}/products/{workload.product_id(rng)}")
+    return r.status_code
+
+
+async def cart_add(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    r = await client.post(
+        f"{API}/cart/",
+        json={"product_id": workload.product_id(rng), "quantity": 1},
+        headers=workload.shopper(worker),
+    )
+    return r.status_code
+
+
+async def cart_update(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    r = await client.patch(
+        f"{API}/cart/",
+        json={"upserts": [{"product_id": workload.product_id(rng), "quantity": rng.randint(1, 5)} for _ in range(3)]},
+        headers=workload.shopper(worker),
+    )
+    return r.status_code
+
+
+async def checkout(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    items = [
+        {"product_id": workload.product_id(rng), "quantity": rng.randint(1, 3), "unit_price": 0, "total_price": 0}
+        for _ in range(rng.randint(1, 5))
+    ]
+    r = await client.post(f"{API}/orders/", json={
+        "items": items, "payment_method": "paypal", "shipping_address": "1 Bench St",
+        "shipping_city": "Sydney", "shipping_state": "NSW", "shipping_postcode": "2000",
+    }, headers=workload.shopper(worker))
+    return r.status_code
+
+
+async def admin_orders(client, workload: Workload, rng: random.Random, worker: int) -> int:
+    r = await client.get(f"{API}/orders/", params={"limit": 50, "skip": rng.choice([0, 50, 100])}, headers=workload.admin_headers)
+    return r.status_code
+
+
+SCENARIOS = {
+    "browse": browse,
+    "product_detail": product_detail,
+    "cart_add": cart_add,
+    "cart_update": cart_update,
+    "checkout": checkout,
+    "admin_orders": admin_orders,
+}
+
+
+async def login(client, email: str, password: str):
+    r = await client.post(f"{API}/auth/login/", data={"username": email, "password": password})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def prepare_workload(client, args) -> Workload:
+    admin = await login(client, "admin@example.com", "admin")
+    shoppers = await asyncio.gather(*[
+        login(client, f"shopper{i}@bench.example.com", PASSWORD) for i in range(args.shoppers)
+    ])
+    return Workload(admin, list(shoppers), args.products)
+
+
+async def run_scenario(client, workload: Workload, name: str, concurrency: int, duration: float, warmup: float) -> dict:
+    operation = SCENARIOS[name]
+    latencies, statuses = [], {}
+
+    async def worker(index: int, until: float, record: bool):
+        rng = random.Random(f"{name}-{index}")
+        while time.monotonic() < until:
+            started = time.perf_counter()
+            try:
+                status_code = await operation(client, workload, rng, index)
+            except httpx.HTTPError as e:
+                status_code = type(e).__name__
+            if record:
+                statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+                if status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+
+    if warmup:
+        until = time.monotonic() + warmup
+        await asyncio.gather(*[worker(i, until, False) for i in range(concurrency)])
+
+    started = time.monotonic()
+    await asyncio.gather(*[worker(i, started + duration, True) for i in range(concurrency)])
+    elapsed = time.monotonic() - started
+    total = sum(statuses.values())
+    return {
+        "requests": total,
+        "errors": total - len(latencies),
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+async def drive(client, args) -> dict:
+    workload = await prepare_workload(client, args)
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(client, workload, name, args.concurrency, args.duration, args.warmup)
+        print_result(args.mode_label, name, results[name])
+    return results
+
+
+def print_result(mode: str, name: str, result: dict) -> None:
+    if result["p50_ms"] is None:
+        print(f"{mode:10} {name:15} no successful requests, statuses={result['statuses']}")
+        return
+    print(
+        f"{mode:10} {name:15} {result['throughput_rps']:9.1f} req/s  "
+        f"p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms p99={result['p99_ms']:7.1f}ms  "
+        f"errors={result['errors']}"
+    )
+
+
+def benchmark_env(args, database_url: str) -> dict:
+    return dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        RATE_LIMIT_ENABLED="false",
+        ADMISSION_ENABLED="false",
+        TRACING_ENABLED="false",
+        PYTHONPATH=BACKEND_DIR,
+    )
+
+
+def seed(env: dict, args) -> None:
+    script = SEED_SCRIPT.format(
+        words=SEARCH_TERMS, brands=BRANDS, products=args.products,
+        shoppers=args.shoppers, orders=args.orders, password=PASSWORD,
+    )
+    subprocess.run([sys.executable, "-c", script], env=env, cwd=BACKEND_DIR, check=True)
+
+
+async def wait_ready(base_url: str) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            try:
+                await client.get(f"{base_url}/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+def run_uvicorn(env: dict, args) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env, cwd=BACKEND_DIR,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        asyncio.run(wait_ready(base_url))
+
+        async def main():
+            limits = httpx.Limits(max_connections=args.concurrency + 5)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+                return await drive(client, args)
+
+        return asyncio.run(main())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def run_inprocess(env: dict, args) -> dict:
+    # 应用在导入时读取配置，所以在子进程中用基准测试的环境变量导入
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as output:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "inprocess", "--output", output.name, *args.forward],
+            env=env, cwd=BACKEND_DIR, check=True,
+        )
+        return json.load(output)
+
+
+def inprocess_main(args) -> None:
+    from app.main import app
+
+    async def main():
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=60) as client:
+                return await drive(client, args)
+        finally:
+            await app.router.shutdown()
+
+    results = asyncio.run(main())
+    with open(args.output, "w") as f:
+        json.dump(results, f)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_main(args) -> None:
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "workers": args.workers,
+            "products": args.products,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in modes:
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmp, f'{mode}.db')}"
+            env = benchmark_env(args, database_url)
+            seed(env, args)
+            args.mode_label = mode
+            if mode == "uvicorn":
+                report["results"][mode] = run_uvicorn(env, args)
+            else:
+                report["results"][mode] = run_inprocess(env, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def compare_main(args) -> None:
+    """对比两次结果：p95 上升或吞吐量下降超过阈值视为退化，返回码为 1"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    for mode, scenarios in current.items():
+        for name, result in scenarios.items():
+            before = baseline.get(mode, {}).get(name)
+            if not before or before["p95_ms"] is None or result["p95_ms"] is None:
+                continue
+            p95_change = result["p95_ms"] / before["p95_ms"] - 1
+            rps_change = result["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0
+            regressed = p95_change > args.threshold or rps_change < -args.threshold
+            regressions += regressed
+            print(
+                f"{mode:10} {name:15} p95 {before['p95_ms']:7.1f} -> {result['p95_ms']:7.1f}ms ({p95_change:+.0%})  "
+                f"throughput {before['throughput_rps']:8.1f} -> {result['throughput_rps']:8.1f} ({rps_change:+.0%})"
+                f"{'  REGRESSION' if regressed else ''}"
+            )
+    sys.exit(1 if regressions else 0)
+
+
+def add_workload_arguments(parser) -> None:
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="每个场景的压测秒数")
+    parser.add_argument("--warmup", type=float, default=1, help="每个场景预热秒数（不计入结果）")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--shoppers", type=int, default=16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="运行基准测试")
+    add_workload_arguments(run_parser)
+    run_parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="both")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 进程数")
+    run_parser.add_argument("--orders", type=int, default=500, help="预先生成的订单数")
+    run_parser.add_argument("--database-url", help="默认使用临时 SQLite 数据库")
+    run_parser.add_argument("--port", type=int, default=18039)
+    run_parser.add_argument("--output", help="结果 JSON 文件")
+
+    inprocess_parser = subparsers.add_parser("inprocess")
+    add_workload_arguments(inprocess_parser)
+    inprocess_parser.add_argument("--output", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="比较两次结果")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="允许的变化比例")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare_main(args)
+        return
+
+    scenarios = args.scenarios
+    args.scenarios = [name.strip() for name in scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.forward = [
+        "--scenarios", scenarios, "--concurrency", str(args.concurrency), "--duration", str(args.duration),
+        "--warmup", str(args.warmup), "--products", str(args.products), "--shoppers", str(args.shoppers),
+    ]
+    if args.command == "inprocess":
+        args.mode_label = "inprocess"
+        inprocess_main(args)
+    else:
+        run_main(args)
+
+
+if __name__ == "__main__":
+    main()
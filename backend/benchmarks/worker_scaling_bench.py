@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""serve.py 吞吐量随 worker 数的变化
+
+对每个 worker 数启动一次 serve.py，用相同的并发压测选定场景，输出吞吐量、p95
+以及相对单个 worker 的加速比和每核效率。worker 数超过CPU核数时不会继续提升。
+
+用法:
+    python benchmarks/worker_scaling_bench.py --workers 1,2,4,8 --scenarios browse,product_detail --concurrency 32
+    python benchmarks/worker_scaling_bench.py --database-url postgresql://... --output scaling.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from storefront_bench import BACKEND_DIR, SCENARIOS, benchmark_env, drive, seed, wait_ready
+
+
+def run_serve(env: dict, args, workers: int) -> dict:
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env, cwd=BACKEND_DIR,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        asyncio.run(wait_ready(base_url))
+
+        async def main():
+            limits = httpx.Limits(max_connections=args.concurrency + 5)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+                return await drive(client, args)
+
+        args.mode_label = f"{workers}w"
+        return asyncio.run(main())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=f"1,2,{os.cpu_count() or 1}", help="逗号分隔的 worker 数")
+    parser.add_argument("--scenarios", default="browse,product_detail", help="逗号分隔的场景")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--shoppers", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--database-url", help="默认使用临时 SQLite 数据库")
+    parser.add_argument("--port", type=int, default=18043)
+    parser.add_argument("--output", help="结果 JSON 文件")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    worker_counts = sorted({int(count) for count in args.workers.split(",")})
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'scaling.db')}"
+        env = benchmark_env(args, database_url)
+        seed(env, args)
+        for workers in worker_counts:
+            results[workers] = run_serve(env, args, workers)
+
+    print(f"\nScaling (CPU cores: {os.cpu_count()}):")
+    for name in args.scenarios:
+        baseline = results[worker_counts[0]][name]["throughput_rps"] / worker_counts[0]
+        for workers in worker_counts:
+            result = results[workers][name]
+            speedup = result["throughput_rps"] / baseline if baseline else 0
+            print(
+                f"  {name:15} {workers:3} workers {result['throughput_rps']:9.1f} req/s  "
+                f"p95={result['p95_ms'] or float('nan'):7.1f}ms  speedup={speedup:5.2f}x  efficiency={speedup / workers:5.0%}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
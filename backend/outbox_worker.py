@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""发件箱worker：批量发送订单通知等后台任务
+
+用法:
+    python outbox_worker.py           # 持续运行
+    python outbox_worker.py --once    # 处理完当前积压后退出
+
+本地调试可以启动一个不真正投递的SMTP服务器:
+    python -m aiosmtpd -n -l localhost:1025
+并设置 SMTP_HOST=localhost SMTP_PORT=1025 SMTP_TLS=false
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+# Add backend directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+from app.models.order import Order, OrderItem  # 导入所有模型避免关系错误
+from app.models.product import Product, Category
+from app.utils.outbox import OutboxWorker, outbox_stats
+import app.utils.outbox_handlers  # noqa: F401  注册事件处理函数
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbox worker")
+    parser.add_argument("--once", action="store_true", help="处理完当前积压后退出")
+    args = parser.parse_args()
+
+    worker = OutboxWorker(
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+        lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    )
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    logger.info("Outbox worker started")
+    while not stopped.is_set():
+        db = SessionLocal()
+        try:
+            processed = worker.run_once(db)
+            if processed:
+                stats = outbox_stats(db)
+                logger.info(
+                    "Processed %d events (pending=%d failed=%d lag=%.1fs)",
+                    processed, stats["pending"], stats["failed"], stats["lag_seconds"],
+                )
+        except Exception:
+            logger.exception("Outbox batch failed")
+            db.rollback()
+            processed = 0
+        finally:
+            db.close()
+
+        if not processed:
+            if args.once:
+                break
+            stopped.wait(settings.OUTBOX_POLL_SECONDS)
+    logger.info("Outbox worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,12 @@ logger = logging.getLogger(__name__)
 
 
 def init() -> None:
+    # 数据库已迁移到最新版本时 init_db 只执行一条查询
     db = SessionLocal()
-    init_db(db)
+    try:
+        init_db(db)
+    finally:
+        db.close()
 
 
 def main() -> None:
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Generate large, reproducible synthetic catalog/user/order data for load testing
+
+Usage:
+    python seed_synthetic.py --scale small
+    python seed_synthetic.py --scale large --seed 7        # 1M products, 100k users, 10M orders
+    python seed_synthetic.py --products 50000 --orders 200000 --reset
+"""
+
+import argparse
+import logging
+import sys
+import os
+import time
+
+# Add backend directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from app.db.init_db import init_db, reset_database
+from app.db.session import SessionLocal, engine
+from app.db.synthetic import SyntheticConfig, SyntheticDataGenerator
+from app.utils.sales_rollup import rebuild_sales_rollups
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    "small": dict(products=10_000, users=1_000, orders=20_000, carts=200),
+    "medium": dict(products=100_000, users=10_000, orders=500_000, carts=2_000),
+    "large": dict(products=1_000_000, users=100_000, orders=10_000_000, carts=20_000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small", help="preset volumes (overridden by explicit counts)")
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--carts", type=int, help="number of users with an active cart")
+    parser.add_argument("--max-items", type=int, default=5, help="max items per order")
+    parser.add_argument("--days", type=int, default=365, help="order history length")
+    parser.add_argument("--skew", type=float, default=0.9, help="Zipf exponent for product popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--reset", action="store_true", help="DROP all tables before seeding")
+    args = parser.parse_args()
+
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+    config = SyntheticConfig(
+        max_items_per_order=args.max_items,
+        days=args.days,
+        popularity_skew=args.skew,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        **volumes,
+    )
+
+    if args.reset:
+        logger.info("Dropping all tables...")
+        reset_database()
+
+    db = SessionLocal()
+    try:
+        init_db(db, force=args.reset)
+    finally:
+        db.close()
+
+    logger.info("Generating synthetic data: %s (seed=%d)", volumes, args.seed)
+    started = time.perf_counter()
+    SyntheticDataGenerator(engine, config).run()
+    logger.info("✓ Synthetic data generated in %.1fs", time.perf_counter() - started)
+
+    # 模拟订单批量写入，不经过下单接口，销售汇总从订单重新生成
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        rebuild_sales_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    logger.info("✓ Sales rollups rebuilt in %.1fs", time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""生产环境多进程服务器：预加载应用后 fork 多个 uvicorn worker
+
+- 主进程导入应用（以及可选的数据库初始化）后再 fork，代码和导入的模块由各 worker 写时复制共享
+- worker 处理 --max-requests（加随机抖动）个请求后退出，由主进程补充新的 worker
+- SIGTERM/SIGINT：停止接受新连接，等待正在处理的请求完成（最多 --graceful-timeout 秒）后退出
+- SIGHUP：滚动重启，先启动新 worker，就绪后再逐个让旧 worker 排空退出
+- /admin/profile/* 的分析状态属于单个 worker：按第一次应答返回的 pid 传 ?pid= 固定到同一个 worker，或用 --workers 1 启动
+
+用法:
+    python serve.py --port 8000                        # worker 数默认取 WEB_CONCURRENCY 或可用CPU数（最多8个）
+    python serve.py --workers 4 --max-requests 10000 --graceful-timeout 30
+    kill -HUP <主进程pid>                               # 滚动重启
+    FORWARDED_ALLOW_IPS="*" python serve.py            # 只能经由反向代理访问、代理不在本机时
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import math
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from collections import deque
+
+# Add backend directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import uvicorn
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("serve")
+
+
+class WorkerServer(uvicorn.Server):
+    """启动完成后通过管道通知主进程"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+    async def shutdown(self, sockets=None) -> None:
+        # 刚被接受、请求还没读到的连接在 uvicorn 看来是空闲的，会被直接关闭；
+        # 停止监听后稍等片刻，让这些请求开始处理，之后按正在处理的请求排空
+        for server in self.servers:
+            server.close()
+        await asyncio.sleep(0.2)
+        await super().shutdown(sockets=sockets)
+
+
+class Worker:
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.ready = False
+        self.retiring = False
+        self.started_at = time.monotonic()
+
+
+class Arbiter:
+    """管理 worker 进程：补充退出的 worker、转发信号、滚动重启"""
+
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers = {}
+        self.restart_queue = deque()
+        self.stopping = False
+        self.exit_code = 0
+        self._signal_r, self._signal_w = os.pipe()
+        os.set_blocking(self._signal_w, False)
+
+    # ---- 主进程 ----
+
+    def spawn(self) -> None:
+        ready_r, ready_w = os.pipe()
+        max_requests = None
+        if self.args.max_requests:
+            # 随机抖动避免所有 worker 同时重启
+            max_requests = self.args.max_requests + random.randint(0, self.args.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            code = 0
+            try:
+                self.run_worker(ready_w, max_requests)
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        self.workers[pid] = Worker(pid, ready_r)
+        logger.info("Started worker %d (max_requests=%s)", pid, max_requests)
+
+    def _on_signal(self, signum, frame) -> None:
+        if signum == signal.SIGHUP:
+            self.restart_queue = deque(pid for pid, worker in self.workers.items() if not worker.retiring)
+            logger.info("Rolling restart of %d workers", len(self.restart_queue))
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        try:
+            os.write(self._signal_w, b"s")
+        except BlockingIOError:
+            pass
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            os.close(worker.ready_fd)
+            code = os.waitstatus_to_exitcode(status)
+            if not worker.ready and not self.stopping:
+                # 启动阶段就退出（导入错误、端口等问题），继续重启只会不断失败
+                logger.error("Worker %d failed to boot (exit code %d), shutting down", pid, code)
+                self.exit_code = 1
+                self.stopping = True
+            elif code != 0 and not self.stopping:
+                logger.warning("Worker %d exited with code %d", pid, code)
+            else:
+                logger.info("Worker %d exited", pid)
+
+    def retire(self, pid: int) -> None:
+        worker = self.workers.get(pid)
+        if worker is None or worker.retiring:
+            return
+        worker.retiring = True
+        os.kill(pid, signal.SIGTERM)
+
+    def maintain(self) -> None:
+        active = [worker for worker in self.workers.values() if not worker.retiring]
+        for _ in range(self.args.workers - len(active)):
+            self.spawn()
+        active = [worker for worker in self.workers.values() if not worker.retiring]
+        while self.restart_queue and self.restart_queue[0] not in self.workers:
+            self.restart_queue.popleft()
+        if self.restart_queue and all(worker.ready for worker in active):
+            if len(active) <= self.args.workers:
+                # 先多启动一个 worker，就绪后再让一个旧 worker 退出，重启期间容量不下降
+                self.spawn()
+            else:
+                self.retire(self.restart_queue.popleft())
+
+    def wait(self, timeout: float) -> None:
+        fds = [self._signal_r] + [worker.ready_fd for worker in self.workers.values() if not worker.ready]
+        try:
+            readable, _, _ = select.select(fds, [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            if fd == self._signal_r:
+                os.read(self._signal_r, 1024)
+                continue
+            for worker in self.workers.values():
+                if worker.ready_fd == fd:
+                    worker.ready = bool(os.read(fd, 1))
+                    if worker.ready:
+                        logger.info("Worker %d ready in %.2fs", worker.pid, time.monotonic() - worker.started_at)
+
+    def stop(self) -> None:
+        logger.info("Stopping %d workers, waiting up to %ss for in-flight requests", len(self.workers), self.args.graceful_timeout)
+        self.sock.close()
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d after graceful timeout", pid)
+            os.kill(pid, signal.SIGKILL)
+        while self.workers:
+            self.reap()
+            time.sleep(0.05)
+
+    def run(self) -> int:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        logger.info("Master %d listening on %s:%d with %d workers", os.getpid(), self.args.host, self.args.port, self.args.workers)
+        while not self.stopping:
+            self.maintain()
+            self.wait(1.0)
+            self.reap()
+        self.stop()
+        return self.exit_code
+
+    # ---- worker 进程 ----
+
+    def run_worker(self, ready_fd: int, max_requests) -> None:
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(self._signal_r)
+        os.close(self._signal_w)
+        for worker in self.workers.values():
+            os.close(worker.ready_fd)
+        random.seed()
+
+        # 不复用主进程的数据库连接（close=False：不能关闭父进程仍在使用的连接）
+        from app.db.session import engine
+        engine.dispose(close=False)
+
+        config = uvicorn.Config(
+            self.app,
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            timeout_keep_alive=self.args.keep_alive,
+            proxy_headers=True,
+            forwarded_allow_ips=self.args.forwarded_allow_ips,
+            log_level=self.args.log_level,
+        )
+        WorkerServer(config, ready_fd).run(sockets=[self.sock])
+
+
+# 自动计算 worker 数时的上限：每个 worker 有自己的连接池，最多占用 DB_POOL_SIZE + DB_MAX_OVERFLOW
+# （默认 5 + 10 = 15）个数据库连接，需要更多 worker 时设置 WEB_CONCURRENCY 并确认数据库的连接数上限
+MAX_DEFAULT_WORKERS = 8
+
+
+def cgroup_cpu_limit():
+    """容器的CPU配额（核数，可能是小数），没有限制时返回None"""
+    try:
+        # cgroup v2: "<quota> <period>" 或 "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return int(quota) / int(period) if quota != "max" else None
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: 配额为 -1 表示没有限制
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def default_workers() -> int:
+    """
+    本进程实际可用的CPU数
+
+    os.cpu_count() 返回宿主机的核数，在限制了CPU亲和性或配额的容器中会启动过多 worker。
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, min(cpus, MAX_DEFAULT_WORKERS))
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork production server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 0)) or None,
+        help=f"默认取可用CPU数（CPU亲和性和容器配额），最多 {MAX_DEFAULT_WORKERS} 个",
+    )
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", 0)), help="worker 处理多少请求后重启，0表示不重启")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", 0)))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", 30)), help="退出时等待正在处理的请求的秒数")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument(
+        "--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        help="信任其 X-Forwarded-For 的代理IP（逗号分隔的精确地址，* 表示全部）；代理不在本机时必须设置，否则所有客户端共用代理IP的限流额度",
+    )
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--init-db", action="store_true", help="fork 之前执行一次数据库初始化")
+    args = parser.parse_args()
+    args.max_requests_jitter = max(0, args.max_requests_jitter)
+    if not args.workers:
+        args.workers = default_workers()
+
+    # 各 worker 的监控指标需要写到共享目录才能在 /metrics 合并（配置在导入应用时读取）
+    metrics_dir = None
+    if args.workers > 1 and not os.getenv("METRICS_DIR"):
+        metrics_dir = tempfile.mkdtemp(prefix="petstore-metrics-")
+        os.environ["METRICS_DIR"] = metrics_dir
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+
+    started = time.perf_counter()
+    from app.core.config import settings
+    from app.db.session import engine
+    from app.main import app, initialize_database
+    if args.init_db or settings.INIT_DB_ON_STARTUP:
+        initialize_database()
+        settings.INIT_DB_ON_STARTUP = False
+    engine.dispose()
+    logger.info("Application preloaded in %.2fs", time.perf_counter() - started)
+    if engine.dialect.name != "sqlite":
+        logger.info(
+            "%d workers may open up to %d database connections (DB_POOL_SIZE + DB_MAX_OVERFLOW per worker)",
+            args.workers, args.workers * (settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW),
+        )
+
+    # 预加载的对象移出垃圾回收跟踪，避免 worker 中的回收扫描触发写时复制
+    gc.collect()
+    gc.freeze()
+
+    try:
+        code = Arbiter(app, sock, args).run()
+    finally:
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+pytest 插件：按接口限制SQL语句数量和耗时
+
+用法:
+    def test_list(client, query_budget):
+        with query_budget(max_queries=2, max_seconds=0.5):
+            client.get("/api/v1/products/")
+
+超出预算时失败信息中列出执行过的每一条SQL。
+"""
+
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import pytest
+from sqlalchemy import event
+
+
+class QueryRecorder:
+    """记录某个引擎上执行的SQL（executemany 计为一条）"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: List[Tuple[str, object]] = []
+        self.recording = False
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording:
+            self.statements.append((statement, parameters))
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+    @contextmanager
+    def record(self):
+        self.statements = []
+        self.recording = True
+        try:
+            yield self
+        finally:
+            self.recording = False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def format_statements(self) -> str:
+        lines = []
+        for index, (statement, parameters) in enumerate(self.statements, 1):
+            sql = " ".join(statement.split())
+            lines.append(f"  {index:3}. {sql[:300]}{'...' if len(sql) > 300 else ''}  {str(parameters)[:120]}")
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@pytest.fixture
+def query_budget(db_engine):
+    """返回一个上下文管理器，块内执行的SQL数量或耗时超出预算时测试失败"""
+    recorder = QueryRecorder(db_engine)
+
+    @contextmanager
+    def budget(max_queries: Optional[int] = None, max_seconds: Optional[float] = None):
+        started = time.perf_counter()
+        with recorder.record():
+            yield recorder
+        elapsed = time.perf_counter() - started
+        if max_queries is not None and recorder.count > max_queries:
+            raise QueryBudgetExceeded(
+                f"Expected at most {max_queries} queries, {recorder.count} were executed:\n"
+                f"{recorder.format_statements()}"
+            )
+        if max_seconds is not None and elapsed > max_seconds:
+            raise QueryBudgetExceeded(
+                f"Expected to finish within {max_seconds:.3f}s, took {elapsed:.3f}s "
+                f"({recorder.count} queries):\n{recorder.format_statements()}"
+            )
+
+    try:
+        yield budget
+    finally:
+        recorder.close()
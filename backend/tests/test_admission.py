@@ -0,0 +1,101 @@
+"""
+准入控制：连接池饱和时快速拒绝低优先级请求（503 + Retry-After），被接受的请求数量有上限
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core.admission import LOW, AdmissionControlMiddleware, AdmissionController, classify_request
+from app.core.config import settings
+
+API = settings.API_V1_STR
+POOL_SIZE = 4
+SERVICE_SECONDS = 0.05
+
+
+class PooledApp:
+    """
+    模拟数据库：每个请求占用连接池中的一个连接 SERVICE_SECONDS 秒，并报告等待连接的时间
+
+    记录到达下游的请求数和同时处理的最大请求数（以及其中的低优先级请求数）
+    """
+
+    def __init__(self, controller=None):
+        self.controller = controller
+        self.pool = asyncio.Semaphore(POOL_SIZE)
+        self.calls = 0
+        self.active = self.peak = 0
+        self.low_active = self.low_peak = 0
+
+    async def __call__(self, scope, receive, send):
+        low = classify_request(scope["method"], scope["path"], scope.get("query_string", b"")) == LOW
+        self.calls += 1
+        self.active += 1
+        self.low_active += low
+        self.peak = max(self.peak, self.active)
+        self.low_peak = max(self.low_peak, self.low_active)
+        try:
+            started = time.perf_counter()
+            async with self.pool:
+                if self.controller is not None:
+                    self.controller.record_pool_wait(time.perf_counter() - started)
+                await asyncio.sleep(SERVICE_SECONDS)
+        finally:
+            self.active -= 1
+            self.low_active -= low
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+CRITICAL_REQUESTS = 5
+
+
+async def saturate(app) -> list:
+    """同时发出大量普通、深度分页和下单请求，返回（优先级, 响应）"""
+    requests = (
+        [("normal", "GET", f"{API}/products/?skip=0")] * 40
+        + [("low", "GET", f"{API}/products/?skip=5000")] * 10
+        + [("critical", "POST", f"{API}/orders/")] * CRITICAL_REQUESTS
+    )
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def call(priority, method, url):
+            return priority, await client.request(method, url)
+
+        return await asyncio.gather(*(call(*request) for request in requests))
+
+
+@pytest.mark.anyio
+async def test_saturated_pool_sheds_load():
+    controller = AdmissionController(max_inflight=4, wait_threshold=SERVICE_SECONDS, max_low_inflight=1)
+    downstream = PooledApp(controller)
+    results = await saturate(AdmissionControlMiddleware(downstream, controller=controller))
+
+    rejected = [(priority, response) for priority, response in results if response.status_code == 503]
+    admitted = [priority for priority, response in results if response.status_code == 200]
+    assert {response.status_code for _, response in results} == {200, 503}
+    assert {priority for priority, _ in rejected} == {"normal", "low"}
+    # 下单请求过载时也被接受
+    assert admitted.count("critical") == CRITICAL_REQUESTS
+    for _, response in rejected:
+        assert response.headers["retry-after"] == str(settings.ADMISSION_RETRY_AFTER)
+    # 被拒绝的请求没有到达下游（不占用连接池）
+    assert downstream.calls == len(admitted)
+    assert controller.shed_count == len(rejected)
+    assert controller.inflight == controller.low_inflight == 0
+    # 同时处理的请求数有上限：普通请求在过载等级2（1.5倍 max_inflight）时被拒绝，下单请求始终放行
+    assert downstream.peak <= controller.max_inflight * 1.5 + CRITICAL_REQUESTS
+    assert downstream.low_peak <= controller.max_low_inflight
+
+    # 对照：没有准入控制时所有请求都到达下游，在连接池前排队
+    baseline_app = PooledApp()
+    baseline = await saturate(baseline_app)
+    assert all(response.status_code == 200 for _, response in baseline)
+    assert baseline_app.calls == len(baseline)
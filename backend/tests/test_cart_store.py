@@ -0,0 +1,101 @@
+"""
+购物车存储：SQL、进程内键值和Redis（fakeredis）三种实现行为一致
+"""
+
+import threading
+import time
+
+import fakeredis
+import pytest
+from sqlalchemy import select
+
+from app.models.user import User
+from app.utils.cart_store import KeyValueCartStore, MemoryKVClient, SQLCartStore
+
+STORES = ["sql", "memory", "redis"]
+
+
+def make_store(backend: str, ttl_seconds: int = 3600):
+    if backend == "sql":
+        return SQLCartStore()
+    client = MemoryKVClient() if backend == "memory" else fakeredis.FakeRedis()
+    return KeyValueCartStore(client, ttl_seconds=ttl_seconds)
+
+
+@pytest.fixture
+def user_id(db):
+    # 使用最后一个用户，不影响其他测试使用的购物车
+    return db.execute(select(User.id).where(User.is_admin == False).order_by(User.id.desc())).scalar()
+
+
+@pytest.fixture(params=STORES)
+def store(request, db, user_id):
+    store = make_store(request.param)
+    store.clear(db, user_id)
+    yield store
+    store.clear(db, user_id)
+
+
+def quantities(store, db, user_id) -> dict:
+    return {line.product_id: line.quantity for line in store.get_items(db, user_id)}
+
+
+def test_apply_upserts_and_deletes(store, db, user_id):
+    store.apply(db, user_id, {1: 2, 2: 1})
+    store.apply(db, user_id, {2: 5, 3: 1}, deletes=[1])
+    assert quantities(store, db, user_id) == {2: 5, 3: 1}
+    store.remove(db, user_id, 3)
+    assert quantities(store, db, user_id) == {2: 5}
+    store.clear(db, user_id)
+    assert store.get_items(db, user_id) == []
+
+
+def test_update_keeps_created_at(store, db, user_id):
+    first = store.set_quantity(db, user_id, 1, 1)
+    assert first.updated_at is None
+    updated = store.set_quantity(db, user_id, 1, 4)
+    assert updated.quantity == 4
+    assert updated.created_at == first.created_at
+    assert store.get_item(db, user_id, updated.id).quantity == 4
+
+
+def test_checkout_clears_after_commit(store, db, user_id):
+    store.apply(db, user_id, {1: 1})
+    store.checkout(db, user_id)
+    db.rollback()
+    # 订单事务回滚时购物车不变
+    assert quantities(store, db, user_id) == {1: 1}
+    store.checkout(db, user_id)
+    db.commit()
+    assert store.get_items(db, user_id) == []
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_carts_expire(backend, db, user_id):
+    store = make_store(backend, ttl_seconds=1)
+    store.apply(db, user_id, {1: 1})
+    assert 0 < store.client.ttl(store._key(user_id)) <= 1
+    time.sleep(1.1)
+    assert store.get_items(db, user_id) == []
+    # 过期后重新加入的商品是新的一行
+    assert store.set_quantity(db, user_id, 1, 2).quantity == 2
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_concurrent_updates_keep_every_item(backend, db, user_id):
+    store = make_store(backend)
+    store.apply(db, user_id, {0: 1})
+    created = store.get_item(db, user_id, 0).created_at
+
+    def add(product_id):
+        for quantity in range(1, 21):
+            store.apply(db, user_id, {product_id: quantity, 0: quantity})
+
+    threads = [threading.Thread(target=add, args=(product_id,)) for product_id in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = {line.product_id: line for line in store.get_items(db, user_id)}
+    assert {product_id: line.quantity for product_id, line in lines.items()} == {product_id: 20 for product_id in range(9)}
+    assert lines[0].created_at == created
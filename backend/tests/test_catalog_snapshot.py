@@ -0,0 +1,263 @@
+"""
+商品目录快照：结果与数据库查询一致，且不执行SQL
+"""
+
+import sys
+import threading
+
+import pytest
+from sqlalchemy import select, update
+
+from app.models.product import Product
+from app.utils.catalog_snapshot import CatalogSnapshot, catalog_snapshot, write_snapshot
+
+API = "/api/v1"
+
+LIST_PARAMS = [
+    {},
+    {"limit": 500},
+    {"category_id": 2},
+    {"search": "food"},
+    {"search": "FOOD", "min_price": 10, "max_price": 50},
+    {"skip": 1000, "limit": 50},
+    {"skip": 100000},
+    {"in_stock": True, "limit": 200},
+    {"brand": "PawPal"},
+    {"brand": "No Such Brand"},
+    {"sort": "price_asc", "limit": 50},
+    {"sort": "price_desc", "category_id": 3, "in_stock": True},
+    {"sort": "newest", "skip": 20, "limit": 20},
+    {"sort": "best_selling", "limit": 50},
+    {"sort": "best_selling", "search": "dog", "min_price": 5},
+]
+
+
+@pytest.fixture
+def snapshot_path(db, tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    write_snapshot(db, path)
+    return path
+
+
+@pytest.fixture
+def use_snapshot(snapshot_path, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    return catalog_snapshot
+
+
+def fetch(client, url, **params):
+    response = client.get(url, params=params)
+    return response.status_code, response.json()
+
+
+@pytest.mark.parametrize("params", LIST_PARAMS)
+def test_list_matches_database(client, snapshot_path, monkeypatch, params):
+    expected = fetch(client, f"{API}/products/", **params)
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    assert fetch(client, f"{API}/products/", **params) == expected
+
+
+def test_detail_matches_database(client, db, snapshot_path, monkeypatch):
+    inactive_id = db.execute(select(Product.id).where(Product.is_active == False)).scalar()
+    product_ids = [1, 2, 500, inactive_id, 10 ** 9]
+    expected = [fetch(client, f"{API}/products/{product_id}") for product_id in product_ids]
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    assert [fetch(client, f"{API}/products/{product_id}") for product_id in product_ids] == expected
+
+
+def test_reads_do_not_query_database(client, query_budget, use_snapshot):
+    with query_budget(max_queries=0):
+        assert client.get(f"{API}/products/", params={"limit": 100}).status_code == 200
+        assert client.get(f"{API}/products/1").status_code == 200
+
+
+def test_reload_switches_to_newer_snapshot(db, snapshot_path, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, "path", snapshot_path)
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", None)
+    assert catalog_snapshot.reload()
+    old = catalog_snapshot.current()
+    price = old.get_product(1)["price"]
+
+    db.execute(update(Product).where(Product.id == 1).values(price=price + 1))
+    try:
+        write_snapshot(db, snapshot_path)
+        assert catalog_snapshot.reload()
+        assert catalog_snapshot.current().version > old.version
+        assert catalog_snapshot.current().get_product(1)["price"] == price + 1
+        # 旧版本仍然可以读取（正在处理的请求继续使用旧快照）
+        assert old.get_product(1)["price"] == price
+        assert not catalog_snapshot.reload()
+    finally:
+        db.rollback()
+
+
+def test_product_writes_update_index(client, db, snapshot_path, monkeypatch, admin_headers):
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    monkeypatch.setattr(catalog_snapshot, "enabled", False)  # 不启动重建
+    cheapest = client.get(f"{API}/products/", params={"sort": "price_asc", "limit": 1}).json()[0]
+
+    created = client.post(f"{API}/products/", json={
+        "name": "Snapshot Test Bowl", "price": 0.01, "stock": 0, "category_id": 1, "brand": "Brand New Co",
+    }, headers=admin_headers).json()
+    try:
+        assert client.get(f"{API}/products/{created['id']}").json()["name"] == "Snapshot Test Bowl"
+        assert client.get(f"{API}/products/", params={"sort": "price_asc", "limit": 1}).json()[0]["id"] == created["id"]
+        assert client.get(f"{API}/products/", params={"sort": "price_asc", "limit": 1, "in_stock": True}).json()[0]["id"] == cheapest["id"]
+        assert [p["id"] for p in client.get(f"{API}/products/", params={"brand": "Brand New Co"}).json()] == [created["id"]]
+
+        client.put(f"{API}/products/{created['id']}", json={"stock": 5}, headers=admin_headers)
+        assert client.get(f"{API}/products/", params={"sort": "price_asc", "limit": 1, "in_stock": True}).json()[0]["id"] == created["id"]
+
+        catalog_snapshot.adjust_stock({created["id"]: -5})
+        assert client.get(f"{API}/products/{created['id']}").json()["stock"] == 0
+        assert client.get(f"{API}/products/", params={"sort": "price_asc", "limit": 1, "in_stock": True}).json()[0]["id"] == cheapest["id"]
+
+        client.delete(f"{API}/products/{created['id']}", headers=admin_headers)
+        assert client.get(f"{API}/products/{created['id']}").status_code == 404
+        assert client.get(f"{API}/products/", params={"brand": "Brand New Co"}).json() == []
+    finally:
+        db.query(Product).filter(Product.id == created["id"]).delete()
+        db.commit()
+
+
+def test_concurrent_stock_adjustments(snapshot_path):
+    snapshot = CatalogSnapshot(snapshot_path)
+    product = snapshot.get_product(1)
+    threads, per_thread = 8, 200
+    # 频繁切换线程，尽量让读-改-写交错
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errors = []
+
+    def order():
+        for _ in range(per_thread):
+            snapshot.adjust_stock({1: -1})
+
+    def browse():
+        try:
+            for _ in range(50):
+                snapshot.list_products(search="food", limit=10)
+        except Exception as exc:  # 遍历时字典被修改会抛出 RuntimeError
+            errors.append(exc)
+
+    try:
+        workers = [threading.Thread(target=order) for _ in range(threads)] + [threading.Thread(target=browse)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert snapshot.get_product(1)["stock"] == product["stock"] - threads * per_thread
+
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"brand": "PawPal"},
+    {"category_id": 2, "in_stock": True},
+    {"min_price": 10, "max_price": 50, "brand": "Barkly"},
+    {"search": "bowl", "category_id": 1},
+])
+def test_facets_match_database(client, snapshot_path, monkeypatch, params):
+    expected = fetch(client, f"{API}/products/facets", **params)
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    assert fetch(client, f"{API}/products/facets", **params) == expected
+    # 第二次从缓存返回
+    assert fetch(client, f"{API}/products/facets", **params) == expected
+
+
+def test_facets_exclude_own_dimension(client, use_snapshot):
+    all_brands = client.get(f"{API}/products/facets").json()
+    facets = client.get(f"{API}/products/facets", params={"brand": "PawPal"}).json()
+    assert facets["brands"] == all_brands["brands"]
+    assert facets["total"] == next(b["count"] for b in all_brands["brands"] if b["brand"] == "PawPal")
+    assert sum(c["count"] for c in facets["categories"]) == facets["total"]
+    listed = client.get(f"{API}/products/", params={"brand": "PawPal", "limit": 10000}).json()
+    assert len(listed) == facets["total"]
+
+
+@pytest.mark.parametrize("params", [
+    {"q": "d"},
+    {"q": "dog"},
+    {"q": "PAW"},
+    {"q": "bowl", "limit": 20},
+    {"q": "  Dry   F"},
+    {"q": "food", "limit": 50},
+    {"q": "zzz"},
+])
+def test_suggestions_match_database(client, snapshot_path, monkeypatch, params):
+    expected = fetch(client, f"{API}/products/suggest", **params)
+    assert expected[0] == 200
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    assert fetch(client, f"{API}/products/suggest", **params) == expected
+
+
+def test_product_writes_update_suggestions(client, db, use_snapshot, monkeypatch, admin_headers):
+    monkeypatch.setattr(catalog_snapshot, "enabled", False)  # 不启动重建
+
+    def suggest(q):
+        return [(s["kind"], s["text"]) for s in client.get(f"{API}/products/suggest", params={"q": q}).json()]
+
+    assert suggest("zebra") == []
+    created = client.post(f"{API}/products/", json={
+        "name": "Zebra Stripe Leash", "price": 9.99, "stock": 3, "category_id": 1, "brand": "Zebra Co",
+    }, headers=admin_headers).json()
+    try:
+        assert set(suggest("zeb")) == {("product", "Zebra Stripe Leash"), ("brand", "Zebra Co")}
+        assert ("product", "Zebra Stripe Leash") in suggest("stripe l")
+
+        client.put(f"{API}/products/{created['id']}", json={"name": "Zebra Striped Collar"}, headers=admin_headers)
+        assert ("product", "Zebra Striped Collar") in suggest("zebra")
+        assert ("product", "Zebra Stripe Leash") not in suggest("zebra")
+
+        client.delete(f"{API}/products/{created['id']}", headers=admin_headers)
+        assert suggest("zebra") == [("brand", "Zebra Co")]
+    finally:
+        db.query(Product).filter(Product.id == created["id"]).delete()
+        db.commit()
+
+
+@pytest.mark.parametrize("params", [
+    {"q": "dgo food"},
+    {"q": "scrtching post", "limit": 50},
+    {"q": "PawPal", "skip": 10, "limit": 10},
+    {"q": "premum hutch"},
+    {"q": "zzzz"},
+])
+def test_search_matches_database(client, db, snapshot_path, monkeypatch, params):
+    if db.get_bind().dialect.name == "postgresql":
+        pytest.skip("pg_trgm 的 word_similarity 评分与进程内三元组索引不同")
+    expected = fetch(client, f"{API}/products/search", **params)
+    assert expected[0] == 200
+    monkeypatch.setattr(catalog_snapshot, "_snapshot", CatalogSnapshot(snapshot_path))
+    assert fetch(client, f"{API}/products/search", **params) == expected
+
+
+def test_search_tolerates_typos(client, use_snapshot):
+    results = client.get(f"{API}/products/search", params={"q": "scrtching post"}).json()
+    assert results and all("Scratching Post" in product["name"] for product in results)
+    results = client.get(f"{API}/products/search", params={"q": "wet fod", "limit": 5}).json()
+    assert len(results) == 5 and all("Wet Food" in product["name"] for product in results)
+
+
+def test_product_writes_update_search(client, db, use_snapshot, monkeypatch, admin_headers):
+    monkeypatch.setattr(catalog_snapshot, "enabled", False)  # 不启动重建
+
+    def search(q):
+        return [product["id"] for product in client.get(f"{API}/products/search", params={"q": q}).json()]
+
+    created = client.post(f"{API}/products/", json={
+        "name": "Quokka Grooming Glove", "price": 9.99, "stock": 3, "category_id": 1,
+    }, headers=admin_headers).json()
+    try:
+        assert search("quoka glove") == [created["id"]]
+        client.put(f"{API}/products/{created['id']}", json={"name": "Wombat Grooming Mitt"}, headers=admin_headers)
+        assert search("quoka glove") == []
+        assert search("wombat mit") == [created["id"]]
+        client.delete(f"{API}/products/{created['id']}", headers=admin_headers)
+        assert search("wombat mit") == []
+    finally:
+        db.query(Product).filter(Product.id == created["id"]).delete()
+        db.commit()
@@ -0,0 +1,131 @@
+"""
+幂等键：重试返回保存的响应，不同请求复用同一个键被拒绝，并发的重复请求只执行一次
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.idempotency import IdempotencyMiddleware, IdempotencyStore, request_fingerprint, stored_response
+from app.db.session import Base, engine
+from app.models.idempotency import IdempotencyKey
+from app.utils.security import create_access_token
+
+PATH = "/api/v1/orders/"
+
+
+class CountingApp:
+    """下游应用：记录执行次数，可以在返回前暂停以模拟慢请求"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        body = (await receive())["body"]
+        self.started.set()
+        await self.release.wait()
+        payload = json.dumps({"call": self.calls, "echo": body.decode()}).encode()
+        await send({"type": "http.response.start", "status": 201, "headers": [
+            (b"content-type", b"application/json"),
+            (b"location", f"/api/v1/orders/{self.calls}".encode()),
+            (b"set-cookie", b"cart=; Max-Age=0"),
+            (b"set-cookie", f"last_order={self.calls}".encode()),
+        ]})
+        await send({"type": "http.response.body", "body": payload})
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def store():
+    # 幂等键存储使用应用的数据库（测试环境中的临时 SQLite）
+    Base.metadata.create_all(bind=engine)
+    return IdempotencyStore(ttl_seconds=3600, lock_seconds=60, sweep_seconds=300)
+
+
+@pytest.fixture
+def downstream():
+    return CountingApp()
+
+
+def make_client(downstream, store, **kwargs) -> httpx.AsyncClient:
+    middleware = IdempotencyMiddleware(downstream, store=store, paths=["/api/v1/orders"], **kwargs)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+
+
+def headers(key: str, user_id: int = 1) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id)}", "Idempotency-Key": key}
+
+
+@pytest.mark.anyio
+async def test_retry_replays_stored_response(downstream, store):
+    async with make_client(downstream, store) as client:
+        first = await client.post(PATH, content=b"a", headers=headers("replay"))
+        retry = await client.post(PATH, content=b"a", headers=headers("replay"))
+        # 其他用户使用相同的键互不影响
+        other = await client.post(PATH, content=b"a", headers=headers("replay", user_id=2))
+    assert downstream.calls == 2
+    assert (retry.status_code, retry.json()) == (first.status_code, first.json()) == (201, {"call": 1, "echo": "a"})
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    # 重放原始响应的全部响应头
+    assert retry.headers["location"] == first.headers["location"] == "/api/v1/orders/1"
+    assert retry.headers.get_list("set-cookie") == first.headers.get_list("set-cookie") == ["cart=; Max-Age=0", "last_order=1"]
+    assert retry.headers["content-type"] == "application/json"
+    assert retry.headers["content-length"] == str(len(retry.content))
+    assert other.json()["call"] == 2
+
+
+@pytest.mark.anyio
+async def test_key_reused_for_different_request(downstream, store):
+    async with make_client(downstream, store) as client:
+        await client.post(PATH, content=b"a", headers=headers("mismatch"))
+        response = await client.post(PATH, content=b"b", headers=headers("mismatch"))
+    assert response.status_code == 422
+    assert downstream.calls == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_duplicates_execute_once(downstream, store):
+    downstream.release.clear()
+    async with make_client(downstream, store) as client:
+        first = asyncio.create_task(client.post(PATH, content=b"a", headers=headers("concurrent")))
+        await downstream.started.wait()
+        duplicate = asyncio.create_task(client.post(PATH, content=b"a", headers=headers("concurrent")))
+        # 原请求还在处理时，指纹不同的请求立即被拒绝，不会拿到原请求的响应
+        different = await client.post(PATH, content=b"b", headers=headers("concurrent"))
+        downstream.release.set()
+        first, duplicate = await asyncio.gather(first, duplicate)
+    assert different.status_code == 422
+    assert downstream.calls == 1
+    assert duplicate.json() == first.json() == {"call": 1, "echo": "a"}
+    assert duplicate.headers["idempotent-replayed"] == "true"
+
+
+@pytest.mark.anyio
+async def test_expired_lock_is_reclaimed(downstream, store):
+    # 其他进程认领后中断：锁过期之前重复请求等待后返回409，过期后重新执行
+    store.lock_seconds = 0.2
+    assert store.claim("user:1", "expired", "POST", PATH, request_fingerprint("POST", PATH, b"", b"a")) is None
+    async with make_client(downstream, store, wait_seconds=0.1) as client:
+        locked = await client.post(PATH, content=b"a", headers=headers("expired"))
+        await asyncio.sleep(0.2)
+        reclaimed = await client.post(PATH, content=b"a", headers=headers("expired"))
+    assert locked.status_code == 409
+    assert reclaimed.status_code == 201
+    assert downstream.calls == 1
+
+
+def test_records_without_headers_replay_content_type():
+    # 0007 迁移之前保存的记录只有 Content-Type
+    record = IdempotencyKey(response_status=201, response_content_type="application/json", response_body=b"{}")
+    assert stored_response(record) == (201, [(b"content-type", b"application/json")], b"{}")
@@ -0,0 +1,87 @@
+"""
+指标：已退出 worker 的计数合并后删除它的文件，SQL出错时计时栈不错位
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core import metrics
+from app.core.metrics import MultiProcessStore, http_requests_in_flight, http_requests_total, install_db_metrics, registry
+from app.core.slow_query import SlowQueryLog
+
+
+def exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_snapshot(directory, pid: int, requests: float, in_flight: float) -> None:
+    snapshot = {
+        http_requests_total.name: {json.dumps(["GET", "/exited", "200"]): [requests]},
+        http_requests_in_flight.name: {json.dumps(["GET", "/exited"]): [in_flight]},
+    }
+    with open(os.path.join(directory, f"metrics_{pid}.json"), "w") as f:
+        json.dump(snapshot, f)
+
+
+def test_exited_workers_are_compacted(tmp_path):
+    store = MultiProcessStore(str(tmp_path))
+    first, second = exited_pid(), exited_pid()
+    write_snapshot(tmp_path, first, requests=3, in_flight=1)
+    write_snapshot(tmp_path, second, requests=4, in_flight=1)
+
+    requests_key = json.dumps(["GET", "/exited", "200"])
+    for _ in range(2):
+        # 再次抓取时不会重复累加已合并的计数
+        merged = store.collect()
+        assert merged[http_requests_total.name][requests_key] == [7]
+        # 已退出进程的仪表盘不计入
+        assert json.dumps(["GET", "/exited"]) not in merged.get(http_requests_in_flight.name, {})
+    assert sorted(os.listdir(tmp_path)) == sorted(["metrics.lock", MultiProcessStore.EXITED_FILE, f"metrics_{os.getpid()}.json"])
+
+    write_snapshot(tmp_path, exited_pid(), requests=1, in_flight=0)
+    assert store.collect()[http_requests_total.name][requests_key] == [8]
+
+
+def test_without_file_locks_exited_files_are_kept(tmp_path, monkeypatch):
+    # Windows 没有 fcntl：不合并，已退出进程的计数仍然从各自的文件读取
+    monkeypatch.setattr(metrics, "fcntl", None)
+    store = MultiProcessStore(str(tmp_path))
+    pid = exited_pid()
+    write_snapshot(tmp_path, pid, requests=2, in_flight=1)
+    assert store.compact() == 0
+    assert store.collect()[http_requests_total.name][json.dumps(["GET", "/exited", "200"])] == [2]
+    assert os.path.exists(tmp_path / f"metrics_{pid}.json")
+
+
+@pytest.mark.parametrize("install", ["metrics", "slow_query"])
+def test_failed_statements_do_not_leak_timers(tmp_path, install):
+    engine = create_engine(f"sqlite:///{tmp_path / 'timers.db'}")
+    if install == "metrics":
+        collectors = list(registry.collectors)
+        install_db_metrics(engine)
+        registry.collectors[:] = collectors
+        name = "metrics_started"
+    else:
+        SlowQueryLog(threshold_ms=10 ** 6).install(engine)
+        name = "slow_query_started"
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+            conn.rollback()
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert conn.info[name] == []
+    engine.dispose()
+
+
+def test_label_values_are_escaped():
+    # 反斜杠、双引号和换行按Prometheus文本格式转义，不修改标签值
+    assert metrics._format_labels(["route"], ['a\\b"c\nd']) == '{route="a\\\\b\\"c\\nd"}'
@@ -0,0 +1,79 @@
+"""
+数据库迁移：迁移建出的结构与模型一致，引入迁移之前的数据库可以直接升级
+"""
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.init_db import ALEMBIC_INI, BASELINE_REVISION, is_schema_current, reset_database, upgrade_database
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_migrations_match_models(tmp_path):
+    engine = _engine(tmp_path)
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        config = Config(ALEMBIC_INI)
+        config.attributes["connection"] = connection
+        # 与 alembic check 相同：autogenerate 比较模型和数据库，有差异时抛出异常
+        command.check(config)
+    # 已经是最新版本时再次执行不做任何修改
+    upgrade_database(engine)
+    engine.dispose()
+
+
+def test_upgrade_database_created_before_migrations(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as connection:
+        config = Config(ALEMBIC_INI)
+        config.attributes["connection"] = connection
+        command.upgrade(config, BASELINE_REVISION)
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@example.com', 'x')"))
+        connection.execute(text("INSERT INTO products (id, name, price) VALUES (1, 'Toy', 1.0)"))
+        connection.execute(text(
+            "INSERT INTO cart_items (id, user_id, product_id, quantity) VALUES (1, 1, 1, 2), (2, 1, 1, 5)"
+        ))
+
+    upgrade_database(engine)
+
+    with engine.connect() as connection:
+        head = MigrationContext.configure(connection).get_current_revision()
+        rows = connection.execute(text("SELECT id, quantity FROM cart_items")).all()
+        indexes = {index["name"] for index in inspect(connection).get_indexes("cart_items")}
+    assert head == ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+    # 重复的购物车行只保留最后写入的一行
+    assert rows == [(2, 5)]
+    assert "uq_cart_items_user_product" in indexes
+    engine.dispose()
+
+
+def test_reset_database_reruns_migrations(tmp_path):
+    engine = _engine(tmp_path)
+    upgrade_database(engine)
+    reset_database(engine)
+    assert inspect(engine).get_table_names() == []
+    upgrade_database(engine)
+    assert inspect(engine).has_table("users")
+    engine.dispose()
+
+
+def test_is_schema_current_compares_migration_head(tmp_path):
+    engine = _engine(tmp_path)
+    with Session(engine) as db:
+        # 新数据库没有版本表
+        assert not is_schema_current(db)
+        upgrade_database(engine)
+        assert is_schema_current(db)
+        # 版本落后时启动会重新执行迁移（包括只修改数据或约束的迁移）
+        db.execute(text("UPDATE alembic_version SET version_num = :revision"), {"revision": BASELINE_REVISION})
+        db.commit()
+        assert not is_schema_current(db)
+    engine.dispose()
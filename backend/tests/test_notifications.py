@@ -0,0 +1,47 @@
+"""
+SMTP连接池：连接数已满时等待有限时间，出错丢弃的连接可以被重新创建
+"""
+
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.utils.notifications import SMTPConnectionPool
+
+
+def make_pool(**kwargs) -> SMTPConnectionPool:
+    # smtp_server 把 SMTP_HOST/SMTP_PORT 指向本地服务器
+    return SMTPConnectionPool(settings.SMTP_HOST, settings.SMTP_PORT, use_tls=False, **kwargs)
+
+
+def test_waits_for_discarded_connection(smtp_server):
+    pool = make_pool(size=1, timeout=5)
+    borrowed = threading.Event()
+    release = threading.Event()
+
+    def failing_send():
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                borrowed.set()
+                release.wait()
+                raise RuntimeError("connection reset")
+
+    thread = threading.Thread(target=failing_send)
+    thread.start()
+    borrowed.wait()
+    # 出错的连接被丢弃而不是放回队列，等待者应该新建一个连接
+    threading.Timer(0.2, release.set).start()
+    with pool.connection() as smtp:
+        assert smtp.noop()[0] == 250
+    thread.join()
+    pool.close()
+
+
+def test_times_out_when_pool_is_exhausted(smtp_server):
+    pool = make_pool(size=1, timeout=0.3)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    pool.close()
@@ -0,0 +1,50 @@
+"""
+下单：库存检查之后被其他订单扣减了库存时整个订单回滚
+"""
+
+from sqlalchemy import func, select, update
+
+from app.api.api_v1.endpoints import orders
+from app.models.order import Order
+from app.models.product import Product
+from app.utils.order_number import generate_order_number
+
+API = "/api/v1"
+
+
+def order_payload(product_ids, quantity):
+    return {
+        "items": [{"product_id": product_id, "quantity": quantity, "unit_price": 0, "total_price": 0} for product_id in product_ids],
+        "payment_method": "paypal",
+        "shipping_address": "1 Test St",
+        "shipping_city": "Sydney",
+        "shipping_state": "NSW",
+        "shipping_postcode": "2000",
+    }
+
+
+def test_concurrent_stock_decrement_rolls_back_order(client, db, db_engine, shopper_headers, monkeypatch):
+    product_ids = db.execute(
+        select(Product.id).where(Product.is_active == True, Product.stock > 10).order_by(Product.id).limit(2)
+    ).scalars().all()
+    stock = dict(db.execute(select(Product.id, Product.stock).where(Product.id.in_(product_ids))).all())
+    orders_before = db.execute(select(func.count(Order.id))).scalar()
+
+    def race(*args, **kwargs):
+        # 模拟另一个订单在库存检查之后、扣减之前买走了第二个商品的全部库存
+        with db_engine.begin() as connection:
+            connection.execute(update(Product).where(Product.id == product_ids[1]).values(stock=0))
+        return generate_order_number(*args, **kwargs)
+
+    monkeypatch.setattr(orders, "generate_order_number", race)
+    try:
+        response = client.post(f"{API}/orders/", json=order_payload(product_ids, 2), headers=shopper_headers)
+        assert response.status_code == 400
+        db.expire_all()
+        assert db.execute(select(func.count(Order.id))).scalar() == orders_before
+        # 第一个商品的扣减随订单一起回滚
+        assert db.get(Product, product_ids[0]).stock == stock[product_ids[0]]
+        assert db.get(Product, product_ids[1]).stock == 0
+    finally:
+        with db_engine.begin() as connection:
+            connection.execute(update(Product).where(Product.id == product_ids[1]).values(stock=stock[product_ids[1]]))
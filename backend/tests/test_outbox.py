@@ -0,0 +1,131 @@
+"""
+发件箱worker：通过本地SMTP服务器发送订单通知，失败重试时不重复发送已经成功的通知
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.outbox import OutboxEvent
+from app.utils import outbox
+from app.utils.notifications import NotificationSender
+from app.utils.outbox import OutboxWorker, enqueue
+import app.utils.outbox_handlers  # noqa: F401  注册事件处理函数
+
+
+@pytest.fixture
+def outbox_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def enqueue_orders(outbox_db, count: int) -> None:
+    with outbox_db() as db:
+        for number in range(count):
+            enqueue(db, "order.created", {
+                "event": "order.created",
+                "order_id": number,
+                "order_number": f"ORD-{number}",
+                "status": "pending",
+                "total_amount": 10.0,
+                "email": f"shopper{number}@example.com",
+                "name": None,
+            })
+        db.commit()
+
+
+def events(outbox_db):
+    with outbox_db() as db:
+        return db.execute(select(OutboxEvent).order_by(OutboxEvent.id)).scalars().all()
+
+
+def test_sends_each_notification_once(smtp_server, outbox_db):
+    enqueue_orders(outbox_db, 3)
+    worker = OutboxWorker()
+    with outbox_db() as db:
+        assert worker.run_once(db) == 3
+        assert worker.run_once(db) == 0
+    # send_many 并行使用多个连接，邮件到达顺序不固定
+    received = {envelope.rcpt_tos[0]: envelope.content for envelope in smtp_server.messages}
+    assert len(smtp_server.messages) == 3
+    assert sorted(received) == ["shopper0@example.com", "shopper1@example.com", "shopper2@example.com"]
+    assert b"ORD-0" in received["shopper0@example.com"]
+    assert {event.status for event in events(outbox_db)} == {"done"}
+
+
+def test_events_are_claimed_before_sending(smtp_server, outbox_db, monkeypatch):
+    enqueue_orders(outbox_db, 2)
+    seen = []
+
+    def check_claimed(payload):
+        # 处理函数执行时事件已经提交为 processing，其他连接可以读写事件表
+        with outbox_db() as other:
+            seen.append([event.status for event in other.execute(select(OutboxEvent)).scalars()])
+
+    monkeypatch.setitem(outbox._handlers, "order.created", outbox.get_handlers("order.created") + [check_claimed])
+    with outbox_db() as db:
+        OutboxWorker().run_once(db)
+    # 第一个事件处理完就已经提交
+    assert seen == [["processing", "processing"], ["done", "processing"]]
+
+
+def test_retry_skips_handlers_that_succeeded(smtp_server, outbox_db, monkeypatch):
+    enqueue_orders(outbox_db, 1)
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload["order_id"])
+        if len(calls) == 1:
+            raise RuntimeError("webhook unavailable")
+
+    monkeypatch.setitem(outbox._handlers, "order.created", outbox.get_handlers("order.created") + [flaky])
+    worker = OutboxWorker(base_delay=0)
+    with outbox_db() as db:
+        worker.run_once(db)
+        [event] = events(outbox_db)
+        assert event.status == "pending"
+        assert event.last_error == "RuntimeError: webhook unavailable"
+        worker.run_once(db)
+    [event] = events(outbox_db)
+    assert event.status == "done"
+    assert event.attempts == 2
+    assert calls == [0, 0]
+    # 邮件在第一次尝试时已经发送成功，重试时不再发送
+    assert len(smtp_server.messages) == 1
+
+
+def test_expired_claims_are_reprocessed(smtp_server, outbox_db):
+    enqueue_orders(outbox_db, 1)
+    worker = OutboxWorker(lease_seconds=300)
+    with outbox_db() as db:
+        # 模拟 worker 领取事件后崩溃：领取过期之前其他 worker 不会处理
+        assert len(worker.claim(db)) == 1
+        assert worker.run_once(db) == 0
+        db.execute(update(OutboxEvent).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+        assert worker.run_once(db) == 1
+    [event] = events(outbox_db)
+    assert event.status == "done"
+    assert len(smtp_server.messages) == 1
+
+
+def test_batch_is_sent_through_one_send_many_call(smtp_server, outbox_db, monkeypatch):
+    enqueue_orders(outbox_db, 5)
+    batches = []
+    send_many = NotificationSender.send_many
+
+    def spy(self, notifications):
+        notifications = list(notifications)
+        batches.append(len(notifications))
+        return send_many(self, notifications)
+
+    monkeypatch.setattr(NotificationSender, "send_many", spy)
+    with outbox_db() as db:
+        assert OutboxWorker().run_once(db) == 5
+    assert batches == [5]
+    assert len(smtp_server.messages) == 5
@@ -0,0 +1,95 @@
+"""
+性能分析：collapsed stack 输出格式、内存快照之间的增长对比、多worker时按pid固定到同一进程
+"""
+
+import os
+import re
+import threading
+
+import pytest
+
+from app.core.profiling import MemoryProfiler, SamplingProfiler
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_cpu_profile_is_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        collapsed = SamplingProfiler().profile(0.2, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = collapsed.splitlines()
+    assert lines
+    counts = []
+    for line in lines:
+        # "线程名;最外层函数 (文件:行);...;最内层函数 (文件:行) 次数"
+        stack, count = line.rsplit(" ", 1)
+        counts.append(int(count))
+        frames = stack.split(";")
+        assert len(frames) >= 2
+        assert all(re.fullmatch(r"\S+ \(.+:\d+\)", frame) for frame in frames[1:])
+    assert counts == sorted(counts, reverse=True)
+
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy
+    assert all("busy_loop (test_profiling.py:" in line for line in busy)
+
+
+def test_memory_snapshot_reports_growth_since_previous():
+    profiler = MemoryProfiler()
+    profiler.start()
+    try:
+        first = profiler.snapshot()
+        assert first["pid"] == os.getpid()
+        assert first["growth"] is None
+
+        retained = [bytearray(1024) for _ in range(2000)]  # noqa: F841 两次快照之间保留约2MB
+        second = profiler.snapshot()
+    finally:
+        profiler.stop()
+
+    assert second["growth"]
+    top = second["growth"][0]
+    assert top["traceback"][0].endswith(f"test_profiling.py:{grown_line()}")
+    assert top["size_diff_kb"] >= 2000
+    assert top["count_diff"] >= 2000
+    assert not profiler.running
+
+
+def grown_line() -> int:
+    with open(__file__) as f:
+        return next(number for number, line in enumerate(f, 1) if "retained = [bytearray" in line)
+
+
+def test_profiling_is_pinned_to_the_requested_worker(client, admin_headers):
+    other = os.getpid() + 1
+    response = client.post(f"/api/v1/admin/profile/memory/start?pid={other}", headers=admin_headers)
+    assert response.status_code == 409
+    assert response.headers["x-worker-pid"] == str(os.getpid())
+
+    response = client.post("/api/v1/admin/profile/memory/start", headers=admin_headers)
+    assert response.status_code == 200
+    pid = response.json()["pid"]
+    assert pid == os.getpid()
+    try:
+
+        response = client.post(f"/api/v1/admin/profile/memory/snapshot?pid={pid}", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["pid"] == pid
+    finally:
+        response = client.post(f"/api/v1/admin/profile/memory/stop?pid={pid}", headers=admin_headers)
+    assert response.status_code == 200
+
+    response = client.get(f"/api/v1/admin/profile/cpu?seconds=0.05&pid={other}", headers=admin_headers)
+    assert response.status_code == 409
+    response = client.get(f"/api/v1/admin/profile/cpu?seconds=0.05&pid={os.getpid()}", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["x-worker-pid"] == str(os.getpid())
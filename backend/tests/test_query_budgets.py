@@ -0,0 +1,131 @@
+"""
+各接口的SQL数量和耗时预算
+
+数量预算与分页大小、订单商品数量无关，新增的懒加载关系会让这些测试失败。
+认证用户的请求包含一条查询当前用户的SQL。
+"""
+
+import pytest
+from sqlalchemy import select
+
+from app.models.product import Product
+
+API = "/api/v1"
+
+
+def order_payload(product_ids):
+    return {
+        "items": [
+            {"product_id": product_id, "quantity": 1, "unit_price": 0, "total_price": 0}
+            for product_id in product_ids
+        ],
+        "payment_method": "paypal",
+        "shipping_address": "1 Test St",
+        "shipping_city": "Sydney",
+        "shipping_state": "NSW",
+        "shipping_postcode": "2000",
+    }
+
+
+@pytest.fixture
+def product_ids(db):
+    return db.execute(
+        select(Product.id).where(Product.is_active == True, Product.stock > 10).order_by(Product.id).limit(20)
+    ).scalars().all()
+
+
+@pytest.mark.parametrize("limit", [10, 100, 500])
+def test_read_products_query_count_independent_of_page_size(client, query_budget, limit):
+    with query_budget(max_queries=1, max_seconds=1.0):
+        response = client.get(f"{API}/products/", params={"limit": limit})
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+
+
+@pytest.mark.parametrize("params", [
+    {"category_id": 1},
+    {"search": "food"},
+    {"min_price": 10, "max_price": 50},
+    {"skip": 1000, "limit": 50},
+])
+def test_read_products_with_filters(client, query_budget, params):
+    with query_budget(max_queries=1, max_seconds=1.0):
+        response = client.get(f"{API}/products/", params=params)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("params", [{}, {"brand": "PawPal", "min_price": 10, "in_stock": True}])
+def test_product_facets(client, query_budget, params):
+    # 一条分组查询加上分类名称
+    with query_budget(max_queries=2, max_seconds=1.0):
+        response = client.get(f"{API}/products/facets", params=params)
+    assert response.status_code == 200
+
+
+def test_product_suggest(client, query_budget):
+    # 商品名称分组、代表商品、品牌、分类各一条
+    with query_budget(max_queries=4, max_seconds=1.0):
+        response = client.get(f"{API}/products/suggest", params={"q": "dog"})
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_product_search(client, query_budget):
+    # 商品名称（PostgreSQL 为设置相似度阈值）加上一页商品
+    with query_budget(max_queries=2, max_seconds=1.0):
+        response = client.get(f"{API}/products/search", params={"q": "dgo food"})
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_read_product_detail(client, query_budget, product_ids):
+    with query_budget(max_queries=1, max_seconds=0.2):
+        response = client.get(f"{API}/products/{product_ids[0]}")
+    assert response.status_code == 200
+
+
+def test_cart_summary(client, query_budget, shopper_headers, product_ids):
+    client.patch(f"{API}/cart/", json={
+        "upserts": [{"product_id": product_id, "quantity": 1} for product_id in product_ids[:10]],
+    }, headers=shopper_headers)
+    with query_budget(max_queries=3, max_seconds=0.3):
+        response = client.get(f"{API}/cart/summary", headers=shopper_headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) >= 10
+
+
+@pytest.mark.parametrize("item_count", [1, 5, 20])
+def test_create_order_query_count_independent_of_items(client, query_budget, shopper_headers, product_ids, item_count):
+    order = order_payload(product_ids[:item_count])
+    # 用户查询、商品查询、订单/订单项/库存/购物车/发件箱写入、三个销售汇总表的累加，以及响应所需的订单和订单项加载
+    with query_budget(max_queries=12, max_seconds=0.5):
+        response = client.post(f"{API}/orders/", json=order, headers=shopper_headers)
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == item_count
+
+
+def test_read_order_detail(client, query_budget, shopper_headers, product_ids):
+    created = client.post(f"{API}/orders/", json=order_payload(product_ids[:5]), headers=shopper_headers).json()
+    with query_budget(max_queries=3, max_seconds=0.2):
+        response = client.get(f"{API}/orders/{created['id']}", headers=shopper_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("limit", [10, 100])
+def test_admin_order_listing(client, query_budget, admin_headers, limit):
+    with query_budget(max_queries=2, max_seconds=0.5):
+        response = client.get(f"{API}/orders/", params={"limit": limit}, headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+
+
+@pytest.mark.parametrize("path, params", [
+    ("sales", {"start": "2024-01-01", "end": "2024-12-31"}),
+    ("products", {"start": "2024-01-01", "end": "2024-12-31", "limit": 100}),
+    ("categories", {"start": "2024-01-01", "end": "2024-12-31", "sort_by": "units"}),
+])
+def test_admin_sales_analytics(client, query_budget, admin_headers, path, params):
+    # 只读取汇总表（排行再加一条名称查询），与订单数量无关
+    with query_budget(max_queries=3, max_seconds=0.5):
+        response = client.get(f"{API}/admin/analytics/{path}", params=params, headers=admin_headers)
+    assert response.status_code == 200
@@ -0,0 +1,67 @@
+"""
+查询计划：常用的查询形状使用对应的组合索引或部分索引
+
+PostgreSQL 上测试数据很少，关闭顺序扫描后检查计划能否使用索引。
+"""
+
+import pytest
+from sqlalchemy import text
+
+from app.api.api_v1.endpoints.products import query_products
+from app.models.order import Order, OrderItem
+from app.models.product import CartItem, Product
+from app.utils.catalog_index import ProductSort
+
+QUERY_SHAPES = [
+    (
+        "ix_products_active_category_id",
+        lambda db: query_products(db, category_id=2).limit(20),
+    ),
+    (
+        "ix_products_active_category_price",
+        lambda db: query_products(db, category_id=2, min_price=10, max_price=20).limit(20),
+    ),
+    (
+        "ix_products_active_price",
+        lambda db: query_products(db, sort=ProductSort.price_asc).limit(20),
+    ),
+    (
+        "ix_orders_user_id_created_at",
+        lambda db: db.query(Order).filter(Order.user_id == 2).order_by(Order.created_at.desc()).limit(20),
+    ),
+    (
+        "ix_orders_created_at",
+        lambda db: db.query(Order).order_by(Order.created_at.desc()).limit(20),
+    ),
+    (
+        "ix_order_items_order_id",
+        lambda db: db.query(OrderItem).filter(OrderItem.order_id.in_([1, 2, 3])),
+    ),
+    (
+        "uq_cart_items_user_product",
+        lambda db: db.query(CartItem).filter(CartItem.user_id == 2, CartItem.product_id == 5),
+    ),
+]
+
+
+def explain(db, query) -> str:
+    bind = db.get_bind()
+    sql = str(query.statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    if bind.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    try:
+        return "\n".join(row[0] for row in db.execute(text("EXPLAIN " + sql)))
+    finally:
+        db.rollback()
+
+
+@pytest.mark.parametrize("index_name, build", QUERY_SHAPES, ids=[name for name, _ in QUERY_SHAPES])
+def test_query_uses_index(db, index_name, build):
+    assert index_name in explain(db, build(db))
+
+
+def test_partial_indexes_require_active_filter(db):
+    # 部分索引不包含下架商品，不限定 is_active 的查询（例如后台）不能使用
+    plan = explain(db, db.query(Product).filter(Product.category_id == 2).order_by(Product.id).limit(20))
+    assert "ix_products_active" not in plan
@@ -0,0 +1,95 @@
+"""
+限流：按用户和IP分别计数，超出时返回429和 Retry-After，X-Forwarded-For 只在信任代理时使用
+"""
+
+import httpx
+import pytest
+
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimitMiddleware, RateLimitPolicy
+from app.utils.security import create_access_token
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def make_client(trust_proxy: bool = False, proxy_hops: int = 1, client=("10.0.0.1", 1234)) -> httpx.AsyncClient:
+    policies = [
+        RateLimitPolicy("login", "/auth/login", rate=0.5, burst=2, methods=["POST"], key="ip"),
+        RateLimitPolicy("api", "/", rate=0.5, burst=2),
+    ]
+    middleware = RateLimitMiddleware(ok_app, backend=MemoryRateLimitBackend(), policies=policies)
+    middleware.trust_proxy = trust_proxy
+    middleware.proxy_hops = proxy_hops
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware, client=client), base_url="http://test")
+
+
+def bearer(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+
+async def statuses(client, count: int, path: str = "/items", method: str = "GET", headers=None) -> list:
+    return [(await client.request(method, path, headers=headers)).status_code for _ in range(count)]
+
+
+@pytest.mark.anyio
+async def test_rejects_with_retry_after():
+    async with make_client() as client:
+        assert await statuses(client, 2) == [200, 200]
+        response = await client.get("/items")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Too many requests"}
+    # 每秒补充0.5个令牌，下一个令牌最多等待2秒
+    assert 1 <= int(response.headers["retry-after"]) <= 2
+    assert response.headers["x-ratelimit-limit"] == "2"
+    assert response.headers["x-ratelimit-remaining"] == "0"
+
+
+@pytest.mark.anyio
+async def test_users_and_policies_have_separate_buckets():
+    async with make_client() as client:
+        assert await statuses(client, 3, headers=bearer(1)) == [200, 200, 429]
+        # 同一IP上的其他用户、匿名请求和其他规则不受影响
+        assert await statuses(client, 2, headers=bearer(2)) == [200, 200]
+        assert await statuses(client, 2) == [200, 200]
+        assert await statuses(client, 3, path="/auth/login", method="POST") == [200, 200, 429]
+        # 按IP计数的规则忽略登录状态
+        assert await statuses(client, 1, path="/auth/login", method="POST", headers=bearer(3)) == [429]
+
+
+@pytest.mark.anyio
+async def test_forwarded_for_ignored_by_default():
+    async with make_client() as client:
+        results = [
+            (await client.get("/items", headers={"X-Forwarded-For": f"203.0.113.{n}"})).status_code
+            for n in range(3)
+        ]
+    # 不信任代理时客户端不能通过伪造请求头绕过限流
+    assert results == [200, 200, 429]
+
+
+@pytest.mark.anyio
+async def test_trusted_proxy_uses_forwarded_client():
+    async with make_client(trust_proxy=True) as client:
+        # 代理把真实客户端地址追加在最后，客户端自己带的地址在左边
+        first = {"X-Forwarded-For": "198.51.100.7, 203.0.113.1"}
+        assert await statuses(client, 3, headers=first) == [200, 200, 429]
+        spoofed = {"X-Forwarded-For": "198.51.100.8, 203.0.113.1"}
+        assert await statuses(client, 1, headers=spoofed) == [429]
+        assert await statuses(client, 2, headers={"X-Forwarded-For": "203.0.113.2"}) == [200, 200]
+        # 没有请求头时退回到连接的对端地址
+        assert await statuses(client, 2) == [200, 200]
+
+
+@pytest.mark.anyio
+async def test_proxy_hops():
+    async with make_client(trust_proxy=True, proxy_hops=2) as client:
+        # CDN -> 负载均衡 -> 应用：客户端地址是从右数第二个
+        assert await statuses(client, 3, headers={"X-Forwarded-For": "203.0.113.1, 10.1.0.1"}) == [200, 200, 429]
+        assert await statuses(client, 2, headers={"X-Forwarded-For": "203.0.113.2, 10.1.0.1"}) == [200, 200]
@@ -0,0 +1,22 @@
+"""
+serve.py 默认 worker 数：按可用CPU（亲和性和容器配额）计算，并有上限
+"""
+
+import os
+
+import pytest
+
+import serve
+
+
+@pytest.mark.parametrize("affinity, quota, expected", [
+    (4, None, 4),
+    (16, None, serve.MAX_DEFAULT_WORKERS),
+    (16, 2.5, 3),
+    (2, 6, 2),
+    (4, 0.5, 1),
+])
+def test_default_workers(monkeypatch, affinity, quota, expected):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(affinity)), raising=False)
+    monkeypatch.setattr(serve, "cgroup_cpu_limit", lambda: quota)
+    assert serve.default_workers() == expected
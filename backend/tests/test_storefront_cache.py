@@ -0,0 +1,58 @@
+"""
+首页缓存：重建期间收到的失效通知不会丢失
+"""
+
+import threading
+from datetime import datetime, timezone
+
+from app.utils.storefront_cache import StorefrontCache, StorefrontSnapshot
+
+
+def test_invalidate_during_rebuild_triggers_another_rebuild(monkeypatch):
+    cache = StorefrontCache(refresh_seconds=60)
+    builds = []
+    rebuilt = threading.Event()
+
+    def build():
+        builds.append(len(builds))
+        if len(builds) == 1:
+            # 第一次重建还没完成时商品被修改
+            cache.invalidate()
+        else:
+            rebuilt.set()
+        return StorefrontSnapshot(b"{}", datetime.now(timezone.utc))
+
+    monkeypatch.setattr(cache, "_build_from_db", build)
+    cache.start()
+    try:
+        # 不需要等到下一个刷新周期（60秒）
+        assert rebuilt.wait(5)
+    finally:
+        cache.stop()
+    assert len(builds) >= 2
+
+
+def test_invalidate_reaches_other_processes(tmp_path, monkeypatch):
+    # 两个实例共享同一个版本文件，相当于两个worker进程
+    version_path = str(tmp_path / "storefront.version")
+    writer = StorefrontCache(refresh_seconds=60, check_seconds=0.01, version_path=version_path)
+    reader = StorefrontCache(refresh_seconds=60, check_seconds=0.01, version_path=version_path)
+    builds = []
+    built = threading.Event()
+    rebuilt = threading.Event()
+
+    def build():
+        builds.append(len(builds))
+        (built if len(builds) == 1 else rebuilt).set()
+        return StorefrontSnapshot(b"{}", datetime.now(timezone.utc))
+
+    monkeypatch.setattr(reader, "_build_from_db", build)
+    reader.start()
+    try:
+        assert built.wait(5)
+        assert not rebuilt.wait(0.1)
+        # 另一个进程修改了商品，本进程不需要等到下一个刷新周期（60秒）
+        writer.invalidate()
+        assert rebuilt.wait(5)
+    finally:
+        reader.stop()
@@ -0,0 +1,150 @@
+"""
+链路追踪：traceparent 的解析和传递、span 的父子关系、数据库和序列化 span、采样和 OTLP/JSON 导出
+"""
+
+import json
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core import tracing
+from app.core.tracing import KIND_CLIENT, KIND_SERVER, Span, SpanExporter, TracingMiddleware, instrument_serialization, tracer
+from app.db.session import get_db
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+items = FastAPI()
+
+
+@items.post("/items", response_model=Item)
+def create_item(db: Session = Depends(get_db)):
+    db.execute(text("SELECT 1"))
+    db.commit()
+    return {"id": 1, "name": "kibble"}
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    recording = RecordingExporter()
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "sample_ratio", 1.0)
+    monkeypatch.setattr(tracer, "exporter", recording)
+    instrument_serialization()
+    return recording
+
+
+@pytest.fixture
+def traced_client():
+    with TestClient(TracingMiddleware(items)) as client:
+        yield client
+
+
+def test_traceparent_is_continued(exporter, traced_client):
+    response = traced_client.post("/items", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    assert response.status_code == 200
+
+    spans = exporter.spans
+    assert spans and all(span.trace_id == TRACE_ID for span in spans)
+    (root,) = [span for span in spans if span.kind == KIND_SERVER]
+    assert root.parent_id == PARENT_ID
+    assert root.attributes["http.status_code"] == 200
+    # 响应头返回本服务的根 span，下游可以继续传递
+    assert response.headers["traceparent"] == f"00-{TRACE_ID}-{root.span_id}-01"
+
+    by_name = {span.name: span for span in spans}
+    assert {"get_db", "db.query", "db.commit", "serialize_response"} <= set(by_name)
+    for name in ("get_db", "db.query", "db.commit", "serialize_response"):
+        assert by_name[name].parent_id == root.span_id
+    query = by_name["db.query"]
+    assert query.kind == KIND_CLIENT
+    assert query.attributes["db.statement"] == "SELECT 1"
+    assert query.attributes["db.system"] == "sqlite"
+    # 子 span 先于根 span 结束，并且在根 span 的时间范围内
+    assert spans[-1] is root
+    assert all(root.start_ns <= span.start_ns <= span.end_ns <= root.end_ns for span in spans)
+
+
+def test_new_trace_is_started_without_traceparent(exporter, traced_client):
+    response = traced_client.post("/items")
+    assert response.status_code == 200
+
+    root = exporter.spans[-1]
+    assert root.kind == KIND_SERVER
+    assert root.parent_id is None
+    assert root.trace_id != TRACE_ID
+    assert {span.trace_id for span in exporter.spans} == {root.trace_id}
+    assert response.headers["traceparent"] == root.traceparent
+
+
+@pytest.mark.parametrize("headers, sample_ratio", [
+    ({"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"}, 1.0),  # 上游未采样
+    ({}, 0.0),  # 按比例未抽中
+    ({"traceparent": "00-not-a-traceparent"}, 0.0),  # 无法解析的 traceparent 按根 span 处理
+])
+def test_unsampled_requests_export_nothing(exporter, traced_client, monkeypatch, headers, sample_ratio):
+    monkeypatch.setattr(tracer, "sample_ratio", sample_ratio)
+    response = traced_client.post("/items", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "name": "kibble"}
+    assert "traceparent" not in response.headers
+    assert exporter.spans == []
+
+
+def test_exporter_writes_otlp_json(tmp_path, monkeypatch):
+    target = tmp_path / "spans.jsonl"
+    exporter = SpanExporter(str(target), flush_seconds=0.01)
+    monkeypatch.setattr(tracer, "exporter", exporter)
+
+    root = Span("GET /items", TRACE_ID, PARENT_ID, KIND_SERVER, {"http.status_code": 200, "http.method": "GET"})
+    child = Span("db.query", TRACE_ID, root.span_id, KIND_CLIENT, {"db.rows": 1})
+    child.record_exception(ValueError("boom"))
+    child.end()
+    root.end()
+
+    deadline = time.monotonic() + 5
+    exported = []
+    while len(exported) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+        if target.exists():
+            lines = [json.loads(line) for line in target.read_text().splitlines()]
+            exported = [
+                span
+                for line in lines
+                for resource in line["resourceSpans"]
+                for scope in resource["scopeSpans"]
+                for span in scope["spans"]
+            ]
+    assert [span["name"] for span in exported] == ["db.query", "GET /items"]
+
+    resource = lines[0]["resourceSpans"][0]["resource"]["attributes"]
+    assert {"key": "service.name", "value": {"stringValue": tracing.settings.TRACING_SERVICE_NAME}} in resource
+    db_span, http_span = exported
+    assert db_span["traceId"] == http_span["traceId"] == TRACE_ID
+    assert db_span["parentSpanId"] == http_span["spanId"]
+    assert http_span["parentSpanId"] == PARENT_ID
+    assert db_span["kind"] == KIND_CLIENT
+    assert db_span["status"] == {"code": tracing.STATUS_ERROR, "message": "ValueError: boom"}
+    assert db_span["attributes"] == [{"key": "db.rows", "value": {"intValue": "1"}}]
+    assert http_span["status"] == {"code": tracing.STATUS_UNSET}
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in http_span["attributes"]
+    assert int(http_span["startTimeUnixNano"]) <= int(http_span["endTimeUnixNano"])